@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,12 +53,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.PrecompressedStaticMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'NayxusStock.urls'
@@ -66,14 +70,20 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.stock_alerts',
                 'core.context_processors.store_info',
+                'core.context_processors.fragment_cache',
             ],
         },
     },
@@ -85,13 +95,107 @@ WSGI_APPLICATION = 'NayxusStock.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# Fichier de la base : variable d'environnement NAYXUS_DB_PATH pour une installation,
+# sinon la base de développement db.sqlite3 du dépôt.
+# Transactions IMMEDIATE : SQLite ignore select_for_update, le verrou d'écriture est
+# pris dès l'ouverture de la transaction (attente de 'timeout' secondes au plus)
+# et deux ventes ne peuvent plus vérifier le même stock en parallèle.
+# Journal WAL : les lecteurs (rapports compris) ne bloquent plus la validation des
+# écritures (factures, mouvements de stock), et inversement. Le mode est inscrit dans
+# l'en-tête du fichier : il n'est activé que hors de la base versionnée, que la
+# moindre commande manage.py modifierait sinon.
+
+DEV_DATABASE_PATH = BASE_DIR / 'db.sqlite3'
+DATABASE_PATH = Path(os.environ.get('NAYXUS_DB_PATH', DEV_DATABASE_PATH))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': DATABASE_PATH,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+if DATABASE_PATH.resolve() != DEV_DATABASE_PATH.resolve():
+    DATABASES['default']['OPTIONS']['init_command'] = 'PRAGMA journal_mode=WAL'
+
+# Base des rapports (alias 'reporting', voir core.reporting) sélectionnable via la
+# variable d'environnement NAYXUS_REPORTING_DB : 'readonly' (même fichier ouvert en
+# lecture seule), 'replica' (copie rafraîchie par sync_reporting_db ou runworker :
+# les rapports ont alors jusqu'à REPORTING_REPLICA_SYNC_SECONDS de retard ; la créer
+# avec sync_reporting_db avant le premier rapport) ou 'none' (tout sur 'default').
+
+REPORTING_DB = os.environ.get('NAYXUS_REPORTING_DB', 'readonly')
+
+REPORTING_REPLICA_PATH = BASE_DIR / 'db_reporting.sqlite3'
+REPORTING_REPLICA_SYNC_SECONDS = 300
+
+REPORTING_DATABASES = {
+    'readonly': f"file:{DATABASE_PATH}?mode=ro",
+    'replica': f"file:{REPORTING_REPLICA_PATH}?mode=ro",
+}
+
+if REPORTING_DB in REPORTING_DATABASES:
+    DATABASES['reporting'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': REPORTING_DATABASES[REPORTING_DB],
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.reporting.ReportingRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Backend sélectionnable via la variable d'environnement NAYXUS_CACHE_BACKEND :
+# 'file' (partagé entre les workers et les commandes d'un même serveur) ou 'locmem'
+# (par processus, pour un seul worker : les invalidations faites par un autre
+# processus n'y arrivent pas), backends Django comptant les lectures trouvées ou non
+# (voir core.cache).
+
+CACHE_BACKEND = os.environ.get('NAYXUS_CACHE_BACKEND', 'file')
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'core.cache.LocMemCache',
+        'LOCATION': 'nayxus',
+    },
+    'file': {
+        'BACKEND': 'core.cache.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[CACHE_BACKEND],
+}
+
+# `manage.py test` remplace ce cache par un cache en mémoire (voir core.test_runner)
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Durée de vie (secondes) des fragments de templates mis en cache
+FRAGMENT_CACHE_TIMEOUT = 600
+
+# Sessions et utilisateur de la session (avec ses permissions, voir users.backends)
+# lus en cache, invalidés à toute modification. Réservé à un cache partagé : en
+# 'locmem', chaque worker garderait sa copie et une déconnexion, un changement de mot
+# de passe ou une désactivation ne seraient vus que par un seul processus. Sessions
+# en base et ModelBackend dans ce cas.
+SHARED_CACHE = CACHE_BACKEND != 'locmem'
+
+if SHARED_CACHE:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+
+AUTH_USER_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -131,10 +235,83 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# collectstatic écrit des noms hachés (manifeste) et des variantes .gz/.br
+# (brotli si le paquet est installé), servis par core.middleware.PrecompressedStaticMiddleware
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'},
+}
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Méthode de valorisation des sorties de stock : 'FIFO' ou 'WAVG' (coût moyen pondéré)
+STOCK_COST_METHOD = 'FIFO'
+
+# Fréquence par défaut des instantanés de stock (commande snapshot_stock) : 'daily' ou 'monthly'
+STOCK_SNAPSHOT_INTERVAL = 'daily'
+
+# Nombre de jours de mouvements conservés dans la table chaude (commande archive_movements)
+STOCK_LEDGER_HOT_DAYS = 365
+
+# Prévisions de réapprovisionnement (commande forecast_replenishment) :
+# historique analysé, délai fournisseur et période entre deux commandes (jours), taux de service visé
+STOCK_FORECAST_WINDOW_DAYS = 90
+STOCK_LEAD_TIME_DAYS = 7
+STOCK_REVIEW_DAYS = 14
+STOCK_SERVICE_LEVEL = 0.95
+
+# Classification ABC (commande classify_abc) : historique de ventes analysé (jours)
+# et parts cumulées du chiffre d'affaires couvertes par les classes A et A + B
+STOCK_ABC_WINDOW_DAYS = 365
+STOCK_ABC_THRESHOLDS = (0.80, 0.95)
+
+# Durée de validité d'une réservation de stock pendant la saisie d'une vente (minutes),
+# les réservations échues sont purgées par la commande expire_reservations
+STOCK_RESERVATION_TTL_MINUTES = 15
+
+# File de tâches en base (commande runworker). Les tâches ne passent par la file que
+# si un worker est déclaré (variable d'environnement NAYXUS_JOBS_WORKER=1) : sinon
+# elles sont exécutées aussitôt dans la requête, sans rester en attente. Fichiers
+# produits hors de MEDIA_ROOT (téléchargés par leur demandeur seulement), durée de
+# conservation des résultats (jours), intervalle des signes de vie d'un worker pour
+# ses tâches en cours (secondes) et délai sans signe de vie après lequel une tâche
+# est relancée (minutes, worker arrêté)
+JOBS_RUN_INLINE = os.environ.get('NAYXUS_JOBS_WORKER', '') != '1'
+JOBS_RESULT_DIR = BASE_DIR / 'job_results'
+JOBS_RESULT_RETENTION_DAYS = 7
+JOBS_HEARTBEAT_SECONDS = 30
+JOBS_STALE_MINUTES = 5
+
+# Flux temps réel (SSE, servi par l'application ASGI) : intervalle de lecture des
+# nouveaux événements par processus et durée de conservation pour les reprises
+LIVE_EVENTS_POLL_SECONDS = 1
+LIVE_EVENTS_RETENTION_MINUTES = 10
+
+# Métriques Prometheus (vue /metrics, voir core.metrics) : dossier partagé où chaque
+# processus (workers gunicorn, runworker) écrit son état toutes les
+# METRICS_FLUSH_SECONDS, via NAYXUS_METRICS_DIR (sans dossier : processus courant
+# seul). La vue est réservée au personnel et aux adresses de METRICS_ALLOWED_IPS.
+METRICS_DIR = os.environ.get('NAYXUS_METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Profilage à la demande (personnel, en-tête X-Profile: 1 ou ?_profile=1, voir
+# core.profiling) : statistiques cProfile et requêtes SQL écrites hors de MEDIA_ROOT,
+# purgées par runworker après PROFILING_RETENTION_HOURS heures
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_RETENTION_HOURS = 24
+
+# Miniatures générées après l'envoi d'une image (voir core.thumbnails), en WebP et
+# JPEG : nom -> (largeur, hauteur) maximales, environ deux fois la taille affichée
+THUMBNAIL_SIZES = {
+    'card': (400, 400),   # grille des produits
+    'row': (96, 96),      # liste des produits
+    'logo': (480, 160),   # logo des factures PDF et des rapports
+}
+THUMBNAIL_QUALITY = 82
+
 # Custom User Model
 AUTH_USER_MODEL = 'users.User'
 
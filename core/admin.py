@@ -1,3 +1,66 @@
 from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
 
-# Register your models here.
+from .models import Job, RequestProfile
+from .profiling import slowest_queries, top_functions
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'user', 'created_at', 'started_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('kind', 'user__username')
+    readonly_fields = ('kind', 'params', 'user', 'created_at', 'started_at', 'finished_at', 'result', 'error')
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Profils capturés (voir core.profiling) : résumé pstats, requêtes SQL les plus lentes et téléchargements"""
+    list_display = ('created_at', 'method', 'path', 'view', 'user', 'status_code', 'duration_ms', 'query_count', 'query_time_ms')
+    list_filter = ('view', 'method', 'status_code')
+    search_fields = ('path', 'view', 'user__username')
+    date_hierarchy = 'created_at'
+    fields = (
+        'created_at', 'method', 'path', 'view', 'user', 'status_code', 'duration_ms', 'query_count', 'query_time_ms',
+        'downloads', 'functions', 'sql',
+    )
+    readonly_fields = fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/', self.admin_site.admin_view(self.download), name='core_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if kind not in ('stats', 'queries') or not self.has_view_permission(request, profile):
+            raise Http404
+        field_file = getattr(profile, kind)
+        return FileResponse(field_file.open('rb'), as_attachment=True, filename=f"profile-{profile.pk}-{field_file.name.rsplit('/', 1)[-1]}")
+
+    @admin.display(description="Fichiers")
+    def downloads(self, obj):
+        return format_html_join(' · ', '<a href="{}">{}</a>', [
+            (reverse('admin:core_requestprofile_download', args=[obj.pk, 'stats']), "Statistiques (.pstats, snakeviz / pstats)"),
+            (reverse('admin:core_requestprofile_download', args=[obj.pk, 'queries']), "Requêtes SQL (.json)"),
+        ])
+
+    @admin.display(description="Fonctions (temps cumulé)")
+    def functions(self, obj):
+        return format_html('<pre style="font-size: 11px; white-space: pre;">{}</pre>', top_functions(obj))
+
+    @admin.display(description="Requêtes SQL les plus lentes")
+    def sql(self, obj):
+        return format_html_join('', '<p><strong>{} ms</strong> ({})<br><code>{}</code><br><small>{}</small></p>', (
+            (query['duration_ms'], query['db'], query['sql'], query['params'])
+            for query in slowest_queries(obj)
+        ))
@@ -0,0 +1,61 @@
+import time
+
+from django.core.cache import cache
+from django.core.cache.backends import filebased, locmem
+
+from . import metrics
+
+# Espaces de versions utilisés pour invalider les fragments de templates et les
+# entrées en cache (utilisateurs, permissions, contexte commun des pages).
+# Chaque entrée inclut la version de ses données dans sa clé : incrémenter
+# la version suffit à rendre obsolètes toutes les entrées concernées.
+NAMESPACES = ('inventory', 'sales', 'store', 'auth')
+VERSION_KEY = 'fragment-version:{}'
+
+
+def _initial_version():
+    # Valeur initiale basée sur l'horloge : après une éviction de la clé,
+    # on ne retombe jamais sur une version déjà utilisée par un fragment en cache.
+    return int(time.time() * 1000)
+
+
+def get_versions():
+    """Retourne la version courante de chaque espace (une seule lecture du cache)"""
+    keys = {namespace: VERSION_KEY.format(namespace) for namespace in NAMESPACES}
+    found = cache.get_many(keys.values())
+    missing = {key: _initial_version() for key in keys.values() if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {namespace: found[key] for namespace, key in keys.items()}
+
+
+def bump_version(namespace):
+    """Invalide tous les fragments dépendant de l'espace donné"""
+    key = VERSION_KEY.format(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), None)
+
+
+# Backends de CACHE_BACKENDS : ceux de Django, avec le décompte des lectures
+# trouvées ou non (taux de succès exposé par /metrics). get_many() et get_or_set()
+# passent par get().
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        metrics.CACHE_REQUESTS.inc(result='miss' if value is _MISSING else 'hit')
+        return default if value is _MISSING else value
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class FileBasedCache(CacheMetricsMixin, filebased.FileBasedCache):
+    pass
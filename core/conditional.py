@@ -0,0 +1,27 @@
+"""
+GET conditionnels : les vues calculent un ETag à partir d'agrégats indexés
+(nombre de lignes, dernier identifiant, dernière modification) et des versions
+de core.cache, puis répondent 304 avant d'exécuter leurs requêtes coûteuses.
+Les agrégats, lus en base, sont la source de vérité d'un processus à l'autre :
+les écritures en masse (update_by_value, bulk_update des commandes) mettent donc
+aussi à jour updated_at. Les versions de cache ne font qu'ajouter des
+invalidations (un cache par processus ne les partage pas).
+"""
+import hashlib
+
+from django.db.models import Count, Max
+
+from .cache import get_versions
+
+
+def table_state(queryset, *timestamp_fields):
+    """Nombre de lignes, dernier identifiant et dernières dates des champs donnés"""
+    aggregates = {'count': Count('pk'), 'last_id': Max('pk')}
+    for field in timestamp_fields:
+        aggregates[field] = Max(field)
+    return tuple(queryset.order_by().aggregate(**aggregates).values())
+
+
+def make_etag(*parts):
+    """ETag (sans guillemets) des éléments donnés et des versions de données courantes"""
+    return hashlib.md5(repr((parts, sorted(get_versions().items()))).encode()).hexdigest()
@@ -1,16 +1,39 @@
-from django.db.models import F
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from .cache import get_versions
 from .models import StoreSettings
 from inventory.models import Product
 
 def store_info(request):
-    """Fournit les informations du magasin à tous les templates"""
+    """Fournit les informations du magasin à tous les templates (en cache jusqu'à leur modification)"""
+    def get_settings():
+        key = f"store-settings:{get_versions()['store']}"
+        return cache.get_or_set(key, StoreSettings.get_settings, settings.FRAGMENT_CACHE_TIMEOUT)
     return {
-        'store': StoreSettings.get_settings()
+        'store': SimpleLazyObject(get_settings)
     }
 
 def stock_alerts(request):
-    """Compte le nombre de produits en alerte de stock"""
-    count = Product.objects.filter(quantity__lte=F('alert_threshold')).count()
+    """
+    Compte le nombre de produits en alerte de stock, à l'emplacement de l'utilisateur
+    s'il en a un (en cache jusqu'au prochain changement de stock)
+    """
+    location_id = getattr(request.user, 'location_id', None)
+    key = f"low-stock-count:{get_versions()['inventory']}:{location_id}"
+    count = cache.get_or_set(
+        key,
+        lambda: Product.low_stock(location_id).count(),
+        settings.FRAGMENT_CACHE_TIMEOUT,
+    )
     return {
-        'low_stock_alert_count': count
+        'low_stock_alert_count': count,
+        'low_stock_location': location_id,
+    }
+
+def fragment_cache(request):
+    """Versions des données et durée de vie utilisées par les balises {% cache %}"""
+    return {
+        'cache_versions': get_versions(),
+        'fragment_timeout': settings.FRAGMENT_CACHE_TIMEOUT,
     }
@@ -0,0 +1,138 @@
+import asyncio
+import datetime
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LiveEvent
+
+logger = logging.getLogger(__name__)
+
+# Silence après lequel un commentaire est envoyé pour garder la connexion ouverte (secondes)
+KEEPALIVE_SECONDS = 15
+# Délai de reconnexion indiqué au navigateur (millisecondes)
+RETRY_MILLISECONDS = 3000
+# Lots d'événements en attente par client avant de le déconnecter (il reprendra via Last-Event-ID)
+SUBSCRIBER_BACKLOG = 100
+# Événements relus au plus par requête
+READ_BATCH = 500
+
+
+def publish_many(events):
+    """
+    Enregistre des événements [(type, données)] à la validation de la transaction
+    en cours : une écriture annulée n'est jamais annoncée.
+    """
+    if events:
+        transaction.on_commit(lambda: LiveEvent.objects.bulk_create([
+            LiveEvent(kind=kind, data=data) for kind, data in events
+        ]))
+
+
+def publish(kind, **data):
+    publish_many([(kind, data)])
+
+
+def events_after(last_id):
+    return list(LiveEvent.objects.filter(pk__gt=last_id).order_by('pk')[:READ_BATCH])
+
+
+def purge_events(minutes=None):
+    """Supprime les événements trop anciens pour une reprise de connexion"""
+    minutes = minutes or settings.LIVE_EVENTS_RETENTION_MINUTES
+    cutoff = timezone.now() - datetime.timedelta(minutes=minutes)
+    return LiveEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+def format_event(event):
+    return f"id: {event.pk}\nevent: {event.kind}\ndata: {json.dumps(event.data)}\n\n"
+
+
+class Broadcaster:
+    """
+    Diffusion dans un processus : une seule boucle lit les nouveaux événements
+    (une requête par intervalle quel que soit le nombre de clients) et les
+    distribue aux files des flux connectés. Elle s'arrête avec le dernier client ;
+    une lecture en erreur est journalisée puis retentée à l'intervalle suivant.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        self.subscribers.add(queue)
+        self.ensure_polling()
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    def ensure_polling(self):
+        """Relance la boucle de lecture si elle est arrêtée (pas encore de client, ou arrêt imprévu)"""
+        if self.task is None or self.task.done():
+            if self.task is not None and not self.task.cancelled() and self.task.exception() is not None:
+                logger.error("Live events polling stopped, restarting", exc_info=self.task.exception())
+            self.task = asyncio.get_running_loop().create_task(self.poll())
+
+    async def poll(self):
+        last_id = None
+        while self.subscribers:
+            try:
+                if last_id is None:
+                    last_id = await sync_to_async(
+                        lambda: LiveEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+                    )()
+                await asyncio.sleep(settings.LIVE_EVENTS_POLL_SECONDS)
+                events = await sync_to_async(events_after)(last_id)
+            except Exception:
+                logger.exception("Live events polling failed, retrying")
+                await asyncio.sleep(settings.LIVE_EVENTS_POLL_SECONDS)
+                continue
+            if not events:
+                continue
+            last_id = events[-1].pk
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait(events)
+                except asyncio.QueueFull:
+                    # Client trop lent : retiré, son flux se termine au prochain keepalive
+                    self.subscribers.discard(queue)
+
+
+broadcaster = Broadcaster()
+
+
+async def event_stream(last_id=None):
+    """
+    Flux SSE : événements manqués depuis `last_id` (reconnexion du navigateur)
+    puis événements diffusés au fil de l'eau, sans doublon.
+    """
+    queue = broadcaster.subscribe()
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        sent = last_id
+        if last_id is not None:
+            for event in await sync_to_async(events_after)(last_id):
+                yield format_event(event)
+                sent = event.pk
+        while True:
+            try:
+                events = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+            except TimeoutError:
+                if queue not in broadcaster.subscribers:
+                    return
+                broadcaster.ensure_polling()
+                yield ": keepalive\n\n"
+                continue
+            for event in events:
+                if sent is None or event.pk > sent:
+                    yield format_event(event)
+                    sent = event.pk
+    finally:
+        broadcaster.unsubscribe(queue)
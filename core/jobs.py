@@ -0,0 +1,126 @@
+import datetime
+import logging
+import traceback
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Tâches disponibles, {type: (libellé, fonction)} : chaque application enregistre
+# les siennes dans son module jobs (importé au démarrage par son AppConfig)
+HANDLERS = {}
+
+
+def register(kind, label):
+    """
+    Décorateur enregistrant une tâche : la fonction reçoit le Job (paramètres dans
+    job.params, demandeur dans job.user) et retourne (nom de fichier, contenu),
+    ou None si la tâche ne produit pas de fichier.
+    """
+    def decorator(func):
+        HANDLERS[kind] = (label, func)
+        return func
+    return decorator
+
+
+def job_label(kind):
+    return HANDLERS.get(kind, (kind, None))[0]
+
+
+def enqueue(kind, user=None, version=None, **params):
+    """
+    Met une tâche en file d'attente (exécutée aussitôt si JOBS_RUN_INLINE).
+    Avec `version` (jeton des données, voir core.conditional), la dernière tâche
+    du demandeur de même type et mêmes paramètres est réutilisée si elle porte la
+    même version et n'a pas échoué : le fichier n'est pas régénéré.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Tâche inconnue : {kind}")
+    if version is not None:
+        params['version'] = version
+        previous = Job.objects.filter(kind=kind, user=user).order_by('-created_at', '-pk').first()
+        if previous is not None and previous.status != Job.Status.FAILED and previous.params == params:
+            return previous
+    job = Job.objects.create(kind=kind, params=params, user=user)
+    if settings.JOBS_RUN_INLINE and claim(job.pk):
+        job.refresh_from_db()
+        run(job)
+    return job
+
+
+def claim(pk):
+    """Passe une tâche en cours si elle est encore en attente (un seul worker l'obtient)"""
+    now = timezone.now()
+    return Job.objects.filter(pk=pk, status=Job.Status.PENDING).update(
+        status=Job.Status.RUNNING, started_at=now, heartbeat_at=now,
+    ) == 1
+
+
+def heartbeat(pks):
+    """Signe de vie des tâches en cours données : leur worker les exécute toujours"""
+    if not pks:
+        return 0
+    return Job.objects.filter(pk__in=pks, status=Job.Status.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def claim_next():
+    """Réserve la plus ancienne tâche en attente, ou retourne None si la file est vide"""
+    while True:
+        pk = (
+            Job.objects.filter(status=Job.Status.PENDING)
+            .order_by('created_at', 'pk').values_list('pk', flat=True).first()
+        )
+        if pk is None:
+            return None
+        if claim(pk):
+            return Job.objects.select_related('user').get(pk=pk)
+        # Prise entre-temps par un autre worker : on passe à la suivante
+
+
+def run(job):
+    """Exécute une tâche réservée et enregistre son fichier résultat ou son erreur"""
+    try:
+        label, handler = HANDLERS[job.kind]
+        result = handler(job)
+        if result is not None:
+            filename, content = result
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            job.result.save(filename, ContentFile(content), save=False)
+        job.status = Job.Status.DONE
+    except Exception:
+        logger.exception("Job %s (%s) failed", job.pk, job.kind)
+        job.status = Job.Status.FAILED
+        job.error = traceback.format_exc()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+    return job
+
+
+def requeue_stale(minutes=None):
+    """
+    Remet en attente les tâches en cours sans signe de vie depuis `minutes` (worker
+    arrêté en cours de route). Une tâche longue reste à son worker tant qu'il la
+    signale (heartbeat), quelle que soit sa durée.
+    """
+    minutes = minutes or settings.JOBS_STALE_MINUTES
+    cutoff = timezone.now() - datetime.timedelta(minutes=minutes)
+    silent = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at=None, started_at__lt=cutoff)
+    return Job.objects.filter(silent, status=Job.Status.RUNNING).update(
+        status=Job.Status.PENDING, started_at=None, heartbeat_at=None,
+    )
+
+
+def purge_finished(days=None):
+    """Supprime les tâches terminées depuis plus de `days` jours et leurs fichiers"""
+    days = days or settings.JOBS_RESULT_RETENTION_DAYS
+    cutoff = timezone.now() - datetime.timedelta(days=days)
+    jobs = Job.objects.filter(status__in=[Job.Status.DONE, Job.Status.FAILED], finished_at__lt=cutoff)
+    for job in jobs.exclude(result='').iterator():
+        job.result.delete(save=False)
+    return jobs.delete()[0]
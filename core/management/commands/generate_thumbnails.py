@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.cache import bump_version
+from core.thumbnails import UPLOAD_FIELDS, generate_thumbnails, has_thumbnails
+
+
+def _generate(field_file, sizes, force):
+    """Retourne True si des miniatures ont été écrites, False si elles existaient, l'erreur sinon"""
+    try:
+        if not force and has_thumbnails(field_file, sizes):
+            return False
+        generate_thumbnails(field_file, sizes)
+        return True
+    except Exception as error:  # Original manquant ou illisible : signalé, les autres continuent
+        return error
+
+
+class Command(BaseCommand):
+    help = 'Generates missing thumbnails for existing images (product photos, store logo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate thumbnails that already exist (e.g. after changing THUMBNAIL_SIZES)')
+        parser.add_argument('--threads', type=int, default=4, help='Images processed concurrently (default: 4)')
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            for model, field, sizes, namespace in UPLOAD_FIELDS:
+                instances = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).only('pk', field)
+                files = [getattr(instance, field) for instance in instances]
+                results = list(pool.map(lambda field_file: _generate(field_file, sizes, options['force']), files))
+                generated = sum(result is True for result in results)
+                for field_file, result in zip(files, results):
+                    if isinstance(result, Exception):
+                        self.stderr.write(f'{field_file.name}: {result}')
+                if generated:
+                    bump_version(namespace)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{model._meta.label}.{field}: {generated} generated, '
+                    f'{sum(result is False for result in results)} up to date, '
+                    f'{sum(isinstance(result, Exception) for result in results)} failed'
+                ))
@@ -0,0 +1,62 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.decorators import login_required
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import HttpResponse
+from django.template import engines
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import path
+
+# Contexte commun à toutes les pages (barre latérale de base.html)
+BASE_CONTEXT_TEMPLATE = "{{ store.name }} {{ low_stock_alert_count }} {{ cache_versions.store }} {{ perms.inventory.add_product }}"
+
+
+@login_required
+def noop_view(request):
+    """Vue vide : seuls le middleware, l'authentification et les processeurs de contexte coûtent"""
+    return HttpResponse(engines['django'].from_string(BASE_CONTEXT_TEMPLATE).render(request=request))
+
+
+urlpatterns = [path('', noop_view)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the fixed per-request query overhead (session, user, permissions, base context processors) '
+        'by sending authenticated requests to a no-op view through the full middleware stack'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to log in as (default: first active user)')
+        parser.add_argument('--requests', type=int, default=20, help='Warm requests to average (default: 20)')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(is_active=True)
+        user = users.filter(username=options['username']).first() if options['username'] else users.order_by('pk').first()
+        if user is None:
+            raise CommandError('No matching active user')
+
+        with override_settings(ROOT_URLCONF=__name__, ALLOWED_HOSTS=['testserver'], DEBUG=False):
+            client = Client()
+            client.force_login(user)
+            try:
+                with CaptureQueriesContext(connection) as cold:
+                    client.get('/')
+                counts = []
+                start = time.perf_counter()
+                for _ in range(options['requests']):
+                    with CaptureQueriesContext(connection) as warm:
+                        client.get('/')
+                    counts.append(len(warm))
+                elapsed = (time.perf_counter() - start) / options['requests']
+            finally:
+                client.logout()
+
+        self.stdout.write(f'User: {user.username}')
+        self.stdout.write(f'Cold request: {len(cold)} queries')
+        for query in cold.captured_queries:
+            self.stdout.write(f'  {query["sql"][:120]}')
+        self.stdout.write(f'Warm requests: {sum(counts) / len(counts):.1f} queries, {elapsed * 1000:.2f} ms on average')
@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from core.events import purge_events
+from core.jobs import claim_next, heartbeat, purge_finished, requeue_stale, run
+from core.metrics import maybe_flush
+from core.profiling import purge_profiles
+from core.reporting import sync_replica
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de purge des événements temps réel et des profils expirés (secondes)
+EVENT_PURGE_INTERVAL = 60
+
+
+class Heartbeat(threading.Thread):
+    """
+    Thread de fond : toutes les JOBS_HEARTBEAT_SECONDS, signe de vie des tâches en
+    cours de ce worker puis remise en file de celles des workers arrêtés (sans
+    signe de vie depuis JOBS_STALE_MINUTES), même pendant une tâche longue.
+    """
+
+    def __init__(self):
+        super().__init__(name='runworker-heartbeat', daemon=True)
+        self.running = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+
+    @contextmanager
+    def tracking(self, job):
+        with self.lock:
+            self.running.add(job.pk)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.running.discard(job.pk)
+
+    def beat(self):
+        with self.lock:
+            running = list(self.running)
+        heartbeat(running)
+        return requeue_stale()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOBS_HEARTBEAT_SECONDS):
+                try:
+                    requeued = self.beat()
+                except Exception:
+                    # Base momentanément verrouillée : nouvel essai au prochain battement
+                    logger.exception("Job heartbeat failed")
+                    continue
+                if requeued:
+                    logger.warning("Requeued %s stale job(s)", requeued)
+        finally:
+            connections.close_all()
+
+
+def _work(heartbeat):
+    """Boucle d'un thread : exécute les tâches en attente jusqu'à ce que la file soit vide"""
+    done = 0
+    try:
+        while (job := claim_next()) is not None:
+            with heartbeat.tracking(job):
+                run(job)
+            done += 1
+    finally:
+        # Connexion principale et, pour les rapports, celle de la base des rapports
+        connections.close_all()
+    return done
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background jobs (reports, exports) with a pool of worker threads, keeps their lease alive with a heartbeat '
+        'and requeues jobs of stopped workers, purges expired live events and request profiles '
+        'and refreshes the reporting replica (NAYXUS_REPORTING_DB=replica). '
+        'Set NAYXUS_JOBS_WORKER=1 in the web processes so that they queue jobs for it instead of running them inline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=2, help='Number of jobs run concurrently (default: 2)')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the queue is empty (default: 2)')
+        parser.add_argument('--once', action='store_true', help='Drain the queue then exit (e.g. from cron)')
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        purged = purge_finished()
+        self.stdout.write(f'Requeued {requeued} stale job(s), purged {purged} finished job(s)')
+
+        next_purge = next_sync = 0
+        sync = settings.REPORTING_DB == 'replica'
+        heartbeat = Heartbeat()
+        heartbeat.start()
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                while True:
+                    if time.monotonic() >= next_purge:
+                        purge_events()
+                        purge_profiles()
+                        next_purge = time.monotonic() + EVENT_PURGE_INTERVAL
+                    if sync and time.monotonic() >= next_sync:
+                        sync_replica()
+                        next_sync = time.monotonic() + settings.REPORTING_REPLICA_SYNC_SECONDS
+                    done = sum(pool.map(lambda _: _work(heartbeat), range(options['threads'])))
+                    maybe_flush()
+                    if done:
+                        self.stdout.write(self.style.SUCCESS(f'Ran {done} job(s)'))
+                    if options['once']:
+                        break
+                    if not done:
+                        close_old_connections()
+                        time.sleep(options['poll_interval'])
+        finally:
+            heartbeat.stopped.set()
+            heartbeat.join()
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.reporting import sync_replica
+
+
+class Command(BaseCommand):
+    help = (
+        'Copies the main database into the reporting replica (REPORTING_REPLICA_PATH) read by the reports '
+        'when NAYXUS_REPORTING_DB=replica; runworker also does it every REPORTING_REPLICA_SYNC_SECONDS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='Replica file to write (default: REPORTING_REPLICA_PATH)')
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.REPORTING_REPLICA_PATH
+        start = time.perf_counter()
+        size = sync_replica(path)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(f'Synced {path} ({size / 1024:.0f} KiB) in {elapsed:.2f}s'))
@@ -0,0 +1,217 @@
+"""
+Métriques applicatives au format texte de Prometheus (vue /metrics) : compteurs
+et histogrammes en mémoire du processus. Avec plusieurs processus (workers
+gunicorn, runworker), chacun écrit régulièrement son état dans METRICS_DIR et la
+vue additionne les fichiers de tous les processus.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from collections import Counter as _Tally
+
+from django.conf import settings
+from django.db import transaction
+
+REGISTRY = {}
+
+_lock = threading.Lock()
+_last_flush = 0.0
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labelnames)
+
+    def state(self):
+        return {'kind': self.kind, 'samples': [[list(key), value] for key, value in self.samples.items()]}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+
+    def merge(self, totals, value):
+        return (totals or 0) + value
+
+    def lines(self, samples):
+        for key, value in samples.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        """Échantillon stocké comme [effectif par intervalle..., effectif au-delà, somme]"""
+        key = self._key(labels)
+        with _lock:
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [0] * (len(self.buckets) + 1) + [0]
+            sample[bisect.bisect_left(self.buckets, value)] += 1
+            sample[-1] += value
+
+    def merge(self, totals, value):
+        if totals is None:
+            return list(value)
+        return [a + b for a, b in zip(totals, value)]
+
+    def lines(self, samples):
+        bounds = [_number(bound) for bound in self.buckets] + ['+Inf']
+        for key, value in samples.items():
+            cumulative = 0
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (bound,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(value[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def count_on_commit(counter, amount=1, **labels):
+    """Incrémente le compteur une fois la transaction validée (rien en cas d'annulation)"""
+    transaction.on_commit(lambda: counter.inc(amount, **labels))
+
+
+def count_movements(movements):
+    """Compte les mouvements de stock enregistrés (un par ligne, par type) à la validation"""
+    for movement_type, amount in _Tally(movement.movement_type for movement in movements).items():
+        count_on_commit(STOCK_MOVEMENTS_APPLIED, amount, type=movement_type)
+
+
+# Fichiers d'état par processus (METRICS_DIR)
+
+def _state():
+    with _lock:
+        return {name: metric.state() for name, metric in REGISTRY.items()}
+
+
+def flush():
+    """Écrit l'état du processus dans METRICS_DIR (remplacement atomique)"""
+    global _last_flush
+    directory = settings.METRICS_DIR
+    if not directory:
+        return
+    _last_flush = time.monotonic()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    with open(f'{path}.tmp', 'w') as output:
+        json.dump(_state(), output)
+    os.replace(f'{path}.tmp', path)
+
+
+def maybe_flush():
+    """flush() au plus une fois par METRICS_FLUSH_SECONDS"""
+    if settings.METRICS_DIR and time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS:
+        flush()
+
+
+def collect():
+    """
+    États de tous les processus : les fichiers de METRICS_DIR (celui du processus
+    courant réécrit d'abord), ou le seul processus courant sans METRICS_DIR.
+    Les fichiers des processus arrêtés restent comptés : vider le dossier au
+    redémarrage du serveur, comme pour tout compteur Prometheus.
+    """
+    directory = settings.METRICS_DIR
+    if not directory:
+        return [_state()]
+    flush()
+    states = []
+    for filename in os.listdir(directory):
+        if filename.endswith('.json'):
+            try:
+                with open(os.path.join(directory, filename)) as source:
+                    states.append(json.load(source))
+            except (OSError, ValueError):
+                continue
+    return states
+
+
+def render():
+    """Exposition au format texte 0.0.4 de Prometheus, tous processus confondus"""
+    totals = {name: {} for name in REGISTRY}
+    for state in collect():
+        for name, data in state.items():
+            metric = REGISTRY.get(name)
+            if metric is None or data['kind'] != metric.kind:
+                continue
+            samples = totals[name]
+            for key, value in data['samples']:
+                key = tuple(key)
+                samples[key] = metric.merge(samples.get(key), value)
+
+    lines = []
+    for name, metric in REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.lines(totals[name]))
+
+    # Taux de succès du cache, dérivé des lectures pour les tableaux de bord sans PromQL
+    cache = {key[0]: value for key, value in totals[CACHE_REQUESTS.name].items()}
+    reads = cache.get('hit', 0) + cache.get('miss', 0)
+    if reads:
+        lines.append("# HELP nayxus_cache_hit_ratio Part des lectures du cache trouvées depuis le démarrage")
+        lines.append("# TYPE nayxus_cache_hit_ratio gauge")
+        lines.append(f"nayxus_cache_hit_ratio {_number(cache.get('hit', 0) / reads)}")
+    return '\n'.join(lines) + '\n'
+
+
+atexit.register(flush)
+
+
+# Métriques de l'application
+
+REQUEST_LATENCY = Histogram(
+    'nayxus_http_request_duration_seconds', "Durée de traitement des requêtes par vue (nom d'URL)",
+    ['view', 'method'], buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUESTS = Counter(
+    'nayxus_http_requests_total', "Requêtes traitées par vue et code de statut", ['view', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'nayxus_http_request_db_queries', "Requêtes SQL exécutées par requête HTTP, par vue",
+    ['view'], buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200),
+)
+INVOICES_COMMITTED = Counter(
+    'nayxus_invoices_committed_total', "Factures créées (transaction validée)",
+)
+STOCK_MOVEMENTS_APPLIED = Counter(
+    'nayxus_stock_movements_applied_total', "Mouvements de stock enregistrés (transaction validée), par type", ['type'],
+)
+CACHE_REQUESTS = Counter(
+    'nayxus_cache_requests_total', "Lectures de clés du cache, trouvées (hit) ou non (miss)", ['result'],
+)
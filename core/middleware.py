@@ -0,0 +1,196 @@
+import mimetypes
+import os
+import posixpath
+import time
+from contextlib import ExitStack
+from urllib.parse import unquote
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import metrics
+from .profiling import profile_request, profiling_asked, profiling_requested
+
+# Variantes précompressées par ordre de préférence (suffixe, Content-Encoding)
+ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+# Les noms hachés changent avec le contenu : ils peuvent être gardés indéfiniment
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'public, max-age=0, must-revalidate'
+
+
+class PrecompressedStaticMiddleware:
+    """
+    Sert les fichiers collectés dans STATIC_ROOT avant les sessions et
+    l'authentification : variante .br ou .gz (voir core.storage) selon
+    Accept-Encoding, cache d'un an pour les noms hachés du manifeste,
+    revalidation par Last-Modified pour les autres. Synchrone ou asynchrone selon
+    la chaîne (WSGI / ASGI), comme les middlewares de Django.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+        self.root = str(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+        self._hashed_names = None
+
+    @property
+    def hashed_names(self):
+        if self._hashed_names is None:
+            self._hashed_names = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        return self._hashed_names
+
+    def is_static(self, request):
+        return self.root and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.is_static(request):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_static(request):
+            # Accès disque hors de la boucle d'événements
+            response = await sync_to_async(self.serve, thread_sensitive=False)(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return await self.get_response(request)
+
+    def serve(self, request, name):
+        name = posixpath.normpath(unquote(name)).lstrip('/')
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        accepted = {token.split(';')[0].strip() for token in request.headers.get('Accept-Encoding', '').split(',')}
+        encoding = None
+        for suffix, candidate in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                path, encoding = path + suffix, candidate
+                break
+
+        stat = os.stat(path)
+        immutable = name in self.hashed_names
+        if not immutable and not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime):
+            return HttpResponseNotModified()
+
+        content_type, _ = mimetypes.guess_type(name)
+        response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        return response
+
+
+class QueryCounter(ExitStack):
+    """Compte les requêtes SQL (toutes bases) des connexions du thread courant"""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def __enter__(self):
+        for alias in settings.DATABASES:
+            self.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Durée, statut et nombre de requêtes SQL (toutes bases) de chaque requête,
+    par nom d'URL (voir core.metrics). Placé après les fichiers statiques :
+    seules les vues sont mesurées. Synchrone ou asynchrone selon la chaîne.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with QueryCounter() as queries:
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, queries.count)
+        metrics.maybe_flush()
+        return response
+
+    async def __acall__(self, request):
+        # Connexions par thread : le compteur est posé sur celles du thread où
+        # s'exécutent les vues synchrones et l'ORM de cette requête (thread_sensitive)
+        start = time.perf_counter()
+        queries = QueryCounter()
+        await sync_to_async(queries.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(queries.close)()
+        self.record(request, response, time.perf_counter() - start, queries.count)
+        await sync_to_async(metrics.maybe_flush, thread_sensitive=False)()
+        return response
+
+    def record(self, request, response, elapsed, queries):
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.REQUESTS.inc(view=view, status=response.status_code)
+        metrics.REQUEST_QUERIES.observe(queries, view=view)
+
+
+class ProfilingMiddleware:
+    """
+    Profil cProfile et journal SQL de la requête quand un membre du personnel le
+    demande (voir core.profiling). Placé après l'authentification. Synchrone ou
+    asynchrone selon la chaîne.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if profiling_requested(request):
+            return profile_request(request, self.get_response)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if profiling_asked(request) and await sync_to_async(profiling_requested)(request):
+            # cProfile et les connexions sont par thread : la requête profilée est
+            # menée depuis le thread où s'exécutent ses vues synchrones et son ORM
+            return await sync_to_async(profile_request)(request, async_to_sync(self.get_response))
+        return await self.get_response(request)
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LiveEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=50, verbose_name='Type')),
+                ('data', models.JSONField(default=dict, verbose_name='Données')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Créé le')),
+            ],
+            options={
+                'verbose_name': 'Événement temps réel',
+                'verbose_name_plural': 'Événements temps réel',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:47
+
+import core.storage
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_live_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10, verbose_name='Méthode')),
+                ('path', models.CharField(max_length=500, verbose_name='Chemin')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Vue')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Statut HTTP')),
+                ('duration_ms', models.FloatField(verbose_name='Durée (ms)')),
+                ('query_count', models.PositiveIntegerField(verbose_name='Requêtes SQL')),
+                ('query_time_ms', models.FloatField(verbose_name='Temps SQL (ms)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Profilée le')),
+                ('stats', models.FileField(storage=core.storage.profile_storage, upload_to='%Y/%m/%d/', verbose_name='Statistiques (pstats)')),
+                ('queries', models.FileField(storage=core.storage.profile_storage, upload_to='%Y/%m/%d/', verbose_name='Requêtes SQL (JSON)')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Profil de requête',
+                'verbose_name_plural': 'Profils de requêtes',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import core.storage
+from django.conf import settings
+from django.db import migrations, models
+
+OLD_PREFIX = 'jobs/'
+
+
+def move_results(apps, schema_editor):
+    """Déplace les résultats encore présents dans MEDIA_ROOT/jobs/ vers JOBS_RESULT_DIR"""
+    Job = apps.get_model('core', 'Job')
+    storage = core.storage.job_storage()
+    for job in Job.objects.filter(result__startswith=OLD_PREFIX).only('result'):
+        old_path = os.path.join(settings.MEDIA_ROOT, job.result.name)
+        name = job.result.name[len(OLD_PREFIX):]
+        if os.path.exists(old_path):
+            os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+            shutil.move(old_path, storage.path(name))
+            job.result = name
+        else:
+            job.result = ''
+        job.save(update_fields=['result'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='result',
+            field=models.FileField(blank=True, storage=core.storage.job_storage, upload_to='%Y/%m/', verbose_name='Résultat'),
+        ),
+        migrations.RunPython(move_results, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.db import models
 
+from .storage import job_storage, profile_storage
+
 class StoreSettings(models.Model):
     name = models.CharField(max_length=100, default="NayxusStock", verbose_name="Nom du magasin")
     address = models.TextField(blank=True, null=True, verbose_name="Adresse")
@@ -23,3 +26,93 @@ class StoreSettings(models.Model):
     def get_settings(cls):
         obj, created = cls.objects.get_or_create(id=1)
         return obj
+
+
+class Job(models.Model):
+    """
+    Tâche longue (rapport, export) exécutée hors requête par la commande runworker ;
+    le fichier produit est conservé dans JOBS_RESULT_DIR jusqu'à sa purge.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En attente"
+        RUNNING = "RUNNING", "En cours"
+        DONE = "DONE", "Terminée"
+        FAILED = "FAILED", "Échouée"
+
+    kind = models.CharField(max_length=100, verbose_name="Type")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Paramètres")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name="Statut")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, related_name='jobs', verbose_name="Demandée par")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Demandée le")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Démarrée le")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Dernier signe de vie")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Terminée le")
+    result = models.FileField(storage=job_storage, upload_to='%Y/%m/', blank=True, verbose_name="Résultat")
+    error = models.TextField(blank=True, verbose_name="Erreur")
+
+    class Meta:
+        verbose_name = "Tâche"
+        verbose_name_plural = "Tâches"
+        ordering = ['-created_at']
+        indexes = [
+            # File d'attente : plus anciennes tâches en attente d'abord
+            models.Index(fields=['status', 'created_at'], name='job_queue'),
+        ]
+
+    def __str__(self):
+        return f"{self.label} ({self.get_status_display()})"
+
+    @property
+    def label(self):
+        from .jobs import job_label
+        return job_label(self.kind)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Status.DONE, self.Status.FAILED)
+
+
+class LiveEvent(models.Model):
+    """
+    Événement temps réel (stock, ventes) diffusé par le flux SSE : chaque processus
+    ASGI relit la table par identifiant croissant, sans courtier de messages.
+    Conservé quelques minutes pour les reprises de connexion (Last-Event-ID).
+    """
+    kind = models.CharField(max_length=50, verbose_name="Type")
+    data = models.JSONField(default=dict, verbose_name="Données")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Créé le")
+
+    class Meta:
+        verbose_name = "Événement temps réel"
+        verbose_name_plural = "Événements temps réel"
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk}"
+
+
+class RequestProfile(models.Model):
+    """
+    Requête profilée à la demande d'un membre du personnel (voir core.profiling) :
+    statistiques cProfile (pstats) et journal des requêtes SQL, conservés
+    PROFILING_RETENTION_HOURS heures.
+    """
+    method = models.CharField(max_length=10, verbose_name="Méthode")
+    path = models.CharField(max_length=500, verbose_name="Chemin")
+    view = models.CharField(max_length=200, blank=True, verbose_name="Vue")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='request_profiles', verbose_name="Utilisateur")
+    status_code = models.PositiveSmallIntegerField(verbose_name="Statut HTTP")
+    duration_ms = models.FloatField(verbose_name="Durée (ms)")
+    query_count = models.PositiveIntegerField(verbose_name="Requêtes SQL")
+    query_time_ms = models.FloatField(verbose_name="Temps SQL (ms)")
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name="Profilée le")
+    stats = models.FileField(storage=profile_storage, upload_to='%Y/%m/%d/', verbose_name="Statistiques (pstats)")
+    queries = models.FileField(storage=profile_storage, upload_to='%Y/%m/%d/', verbose_name="Requêtes SQL (JSON)")
+
+    class Meta:
+        verbose_name = "Profil de requête"
+        verbose_name_plural = "Profils de requêtes"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
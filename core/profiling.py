@@ -0,0 +1,116 @@
+"""
+Profilage à la demande d'une requête en production, réservé au personnel :
+en-tête X-Profile: 1 ou paramètre ?_profile=1. La requête est exécutée sous
+cProfile avec capture des requêtes SQL (toutes bases), le résultat enregistré
+comme RequestProfile (consultable et téléchargeable dans l'admin) et son
+identifiant renvoyé dans l'en-tête X-Profile-Id.
+"""
+import cProfile
+import datetime
+import io
+import json
+import marshal
+import pstats
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+
+from .models import RequestProfile
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+
+
+def profiling_asked(request):
+    """En-tête ou paramètre de profilage présent (sans charger l'utilisateur)"""
+    return request.headers.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+def profiling_requested(request):
+    if not profiling_asked(request):
+        return False
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+def profile_request(request, get_response):
+    """Exécute la requête sous cProfile et enregistre le profil ; retourne la réponse"""
+    queries = []
+
+    def log_query(execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            queries.append({
+                'db': context['connection'].alias,
+                'sql': sql,
+                'params': repr(params),
+                'many': many,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Un autre profileur est déjà actif (débogueur, autre requête profilée dans ce thread)
+        return get_response(request)
+
+    start = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(log_query))
+            response = get_response(request)
+    finally:
+        profiler.disable()
+    duration = time.perf_counter() - start
+
+    profiler.create_stats()
+    match = request.resolver_match
+    profile = RequestProfile(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view=match.view_name if match else '',
+        user=request.user,
+        status_code=response.status_code,
+        duration_ms=duration * 1000,
+        query_count=len(queries),
+        query_time_ms=sum(query['duration_ms'] for query in queries),
+    )
+    stamp = timezone.now().strftime('%H%M%S%f')
+    profile.stats.save(f'{stamp}.pstats', ContentFile(marshal.dumps(profiler.stats)), save=False)
+    profile.queries.save(f'{stamp}.json', ContentFile(json.dumps(queries, indent=1)), save=False)
+    profile.save()
+    response['X-Profile-Id'] = str(profile.pk)
+    return response
+
+
+def top_functions(profile, limit=40, sort='cumulative'):
+    """Texte pstats des fonctions les plus coûteuses du profil"""
+    output = io.StringIO()
+    pstats.Stats(profile.stats.path, stream=output).strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def slowest_queries(profile, limit=20):
+    """Requêtes SQL du profil, les plus lentes d'abord"""
+    with profile.queries.open('rb') as source:
+        queries = json.load(source)
+    return sorted(queries, key=lambda query: query['duration_ms'], reverse=True)[:limit]
+
+
+def purge_profiles(hours=None):
+    """Supprime les profils de plus de `hours` heures et leurs fichiers"""
+    hours = hours or settings.PROFILING_RETENTION_HOURS
+    cutoff = timezone.now() - datetime.timedelta(hours=hours)
+    profiles = RequestProfile.objects.filter(created_at__lt=cutoff)
+    for profile in profiles.iterator():
+        profile.stats.delete(save=False)
+        profile.queries.delete(save=False)
+    return profiles.delete()[0]
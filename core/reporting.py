@@ -0,0 +1,78 @@
+"""
+Lectures des rapports sur une connexion dédiée (alias 'reporting', voir
+REPORTING_DB dans les réglages) : le même fichier ouvert en lecture seule, ou
+une réplique rafraîchie par sync_reporting_db. Les écritures restent sur
+'default' ; une lecture longue n'y retient aucun verrou.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPORTING_DB = 'reporting'
+
+_reporting = ContextVar('reporting_reads', default=False)
+
+
+@contextmanager
+def reporting_reads():
+    """Bloc (ou vue, en décorateur) dont les lectures passent par la base des rapports"""
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def _is_mirror():
+    # Base des rapports devenue la base principale (TEST MIRROR pendant les tests) :
+    # lue par la connexion principale, qui voit les données de la transaction en cours
+    return connections[REPORTING_DB].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+
+
+class ReportingRouter:
+    """Lectures vers 'reporting' dans un bloc reporting_reads(), tout le reste sur 'default'"""
+
+    def db_for_read(self, model, **hints):
+        if _reporting.get() and REPORTING_DB in settings.DATABASES and not _is_mirror():
+            return REPORTING_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Une instance lue sur la base des rapports s'enregistre sur la base principale
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPORTING_DB}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPORTING_DB:
+            return False
+        return None
+
+
+def sync_replica(path=None):
+    """
+    Copie la base principale dans la réplique des rapports : sauvegarde SQLite
+    dans un fichier temporaire (lecture d'un instantané, sans bloquer les
+    écritures en mode WAL) puis remplacement atomique. Les connexions ouvertes
+    sur l'ancienne copie la lisent jusqu'à leur renouvellement (CONN_MAX_AGE).
+    """
+    path = str(path or settings.REPORTING_REPLICA_PATH)
+    temporary = f'{path}.tmp'
+    source = connections[DEFAULT_DB_ALIAS]
+    source.ensure_connection()
+    target = sqlite3.connect(temporary)
+    try:
+        source.connection.backup(target)
+        # Copie autonome, lisible en lecture seule sans fichiers -wal / -shm
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+    os.replace(temporary, path)
+    return os.path.getsize(path)
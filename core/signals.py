@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from .cache import bump_version
+from .models import StoreSettings
+from .thumbnails import generate_on_upload
+
+
+def invalidate_store_fragments(sender, **kwargs):
+    """Invalide les en-têtes de rapports lorsque les infos du magasin changent"""
+    bump_version('store')
+
+
+post_save.connect(invalidate_store_fragments, sender=StoreSettings)
+
+generate_on_upload(StoreSettings, 'logo', ['logo'], 'store')
@@ -0,0 +1,94 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:  # Dépendance optionnelle : variantes gzip seulement
+    brotli = None
+
+# Formats texte qui gagnent à être compressés (les images et polices woff le sont déjà)
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.xml', '.html', '.ico', '.ttf', '.eot')
+# En dessous, l'en-tête de compression annule le gain
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Noms hachés (manifeste) et, à la fin de collectstatic, variantes .gz et .br
+    écrites à côté de chaque fichier texte, servies par PrecompressedStaticMiddleware.
+    Avant le premier collectstatic (ou pour un fichier ajouté depuis), les pages
+    gardent le nom d'origine au lieu d'échouer, comme avec StaticFilesStorage.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Ni dans le manifeste ni dans STATIC_ROOT : rien à hacher
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            names.add(name)
+            if isinstance(hashed_name, str):
+                names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                for compressed_name in self.write_compressed(name):
+                    yield compressed_name, compressed_name, True
+
+    def write_compressed(self, name):
+        """Écrit les variantes compressées d'un fichier si elles sont plus petites que l'original"""
+        with self.open(name) as source:
+            content = source.read()
+        if len(content) < MIN_COMPRESS_SIZE:
+            return []
+        variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content, quality=11)
+        written = []
+        for suffix, compressed in variants.items():
+            if len(compressed) >= len(content):
+                continue
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            written.append(compressed_name)
+        return written
+
+
+def profile_storage():
+    """Profils de requêtes (voir core.profiling) : hors de MEDIA_ROOT, téléchargés par l'admin seulement"""
+    return FileSystemStorage(location=settings.PROFILING_DIR)
+
+
+class SettingDirectoryStorage(FileSystemStorage):
+    """Stockage local dont le dossier est relu dans un réglage à chaque accès (suit override_settings)"""
+
+    def __init__(self, setting, **kwargs):
+        self.setting = setting
+        super().__init__(**kwargs)
+
+    @property
+    def base_location(self):
+        return getattr(settings, self.setting)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+
+def job_storage():
+    """Fichiers produits par les tâches (voir core.jobs) : hors de MEDIA_ROOT, téléchargés par leur demandeur (job_download)"""
+    return SettingDirectoryStorage('JOBS_RESULT_DIR')
@@ -0,0 +1,36 @@
+from django import template
+from django.utils.html import format_html
+
+from core.thumbnails import thumbnail_name, thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(field_file, size):
+    """URL de la miniature JPEG d'une image : {{ store.logo|thumbnail:'logo' }}"""
+    return thumbnail_url(field_file, size) if field_file else ''
+
+
+@register.simple_tag
+def picture(field_file, size, alt='', css_class=''):
+    """
+    <picture> avec la variante WebP et la miniature JPEG en repli :
+    {% picture product.image 'card' alt=product.name %}
+    """
+    if not field_file:
+        return ''
+    webp_name = thumbnail_name(field_file.name, size, 'webp')
+    img = format_html(
+        '<img src="{}" alt="{}"{} loading="lazy">',
+        thumbnail_url(field_file, size),
+        alt,
+        format_html(' class="{}"', css_class) if css_class else '',
+    )
+    if not field_file.storage.exists(webp_name):
+        return img
+    return format_html(
+        '<picture style="display: contents;"><source type="image/webp" srcset="{}">{}</picture>',
+        field_file.storage.url(webp_name),
+        img,
+    )
@@ -0,0 +1,37 @@
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+# Cache propre à chaque lancement des tests : ni le répertoire cache/ de
+# l'application déployée, ni les versions laissées par un lancement précédent
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.LocMemCache',
+        'LOCATION': 'nayxus-tests',
+    },
+}
+
+# Fichiers statiques sous leur nom d'origine : les pages ne dépendent pas d'un
+# collectstatic fait (ou non) dans STATIC_ROOT
+TEST_STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class TestRunner(DiscoverRunner):
+    """Lanceur de `manage.py test` : isole les tests des fichiers partagés avec l'installation"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # Fichiers produits par les tâches exécutées pendant les tests
+        self.job_results = tempfile.mkdtemp()
+        self.isolated_settings = override_settings(CACHES=TEST_CACHES, STORAGES=TEST_STORAGES, JOBS_RESULT_DIR=self.job_results)
+        self.isolated_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.isolated_settings.disable()
+        shutil.rmtree(self.job_results, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,367 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import io
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from inventory.models import Category, Product
+from inventory.tests import InventoryTestCase
+from .cache import LocMemCache, bump_version, get_versions
+from .events import Broadcaster, broadcaster, event_stream, events_after, purge_events
+from .jobs import claim_next, enqueue, requeue_stale
+from .management.commands.runworker import Heartbeat
+from . import metrics
+from .middleware import MetricsMiddleware, PrecompressedStaticMiddleware, ProfilingMiddleware
+from .models import Job, LiveEvent, RequestProfile
+from .reporting import REPORTING_DB, ReportingRouter, reporting_reads
+from .thumbnails import generate_thumbnails, thumbnail_name, thumbnail_url
+
+
+class ReportingRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReportingRouter()
+        self.name = connections[REPORTING_DB].settings_dict['NAME']
+        connections[REPORTING_DB].settings_dict['NAME'] = 'file:reporting?mode=ro'
+
+    def tearDown(self):
+        connections[REPORTING_DB].settings_dict['NAME'] = self.name
+
+    def test_reads_routed_only_inside_reporting_reads(self):
+        self.assertIsNone(self.router.db_for_read(Product))
+        with reporting_reads():
+            self.assertEqual(self.router.db_for_read(Product), REPORTING_DB)
+            self.assertEqual(self.router.db_for_write(Product), DEFAULT_DB_ALIAS)
+        self.assertIsNone(self.router.db_for_read(Product))
+
+    def test_no_migrations_on_reporting(self):
+        self.assertFalse(self.router.allow_migrate(REPORTING_DB, 'inventory'))
+        self.assertIsNone(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'inventory'))
+
+
+class ReportingMirrorTests(TestCase):
+    def test_mirror_reads_through_default_connection(self):
+        # Pendant les tests, 'reporting' est un miroir de la base de test
+        with reporting_reads():
+            self.assertEqual(Product.objects.all().db, DEFAULT_DB_ALIAS)
+
+
+class CacheVersionTests(TestCase):
+    def test_bump_changes_only_its_namespace(self):
+        before = get_versions()
+        bump_version('inventory')
+        after = get_versions()
+        self.assertNotEqual(after['inventory'], before['inventory'])
+        self.assertEqual(after['sales'], before['sales'])
+
+    def test_inventory_writes_bump_version(self):
+        version = get_versions()['inventory']
+        Category.objects.create(name="Boissons")
+        self.assertNotEqual(get_versions()['inventory'], version)
+
+    def test_tests_do_not_share_the_installed_cache(self):
+        self.assertIsInstance(caches['default'], LocMemCache)
+
+    def test_unknown_view_mode_falls_back_to_list(self):
+        self.client.force_login(get_user_model().objects.create_user('vendeur', password='pw'))
+        for view_mode, expected in (('grid', 'grid'), ('list', 'list'), ('x' * 200, 'list')):
+            response = self.client.get(reverse('product_list'), {'view': view_mode})
+            self.assertEqual(response.context['view_mode'], expected)
+
+
+def view(request):
+    return HttpResponse("vue")
+
+
+async def async_view(request):
+    return HttpResponse("vue")
+
+
+class PrecompressedStaticMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        with open(f'{root}/app.css', 'wb') as file:
+            file.write(b'body {}')
+        with gzip.open(f'{root}/app.css.gz', 'wb') as file:
+            file.write(b'body {}')
+        override = self.settings(STATIC_ROOT=root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_serves_precompressed_variant(self):
+        middleware = PrecompressedStaticMiddleware(view)
+        response = middleware(RequestFactory().get('/static/app.css', headers={'accept-encoding': 'gzip'}))
+        response.close()
+        self.assertEqual((response['Content-Encoding'], response['Content-Type']), ('gzip', 'text/css'))
+        self.assertEqual(middleware(RequestFactory().get('/static/absent.css')).content, b"vue")
+
+    async def test_async_chain_stays_async(self):
+        middleware = PrecompressedStaticMiddleware(async_view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get('/static/app.css'))
+        response.close()
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual((await middleware(AsyncRequestFactory().get('/'))).content, b"vue")
+
+
+def query_view(request):
+    list(Product.objects.all())
+    list(Category.objects.all())
+    return HttpResponse("vue")
+
+
+class ManifestStorageTests(TestCase):
+    """Stockage des réglages de production (les tests utilisent StaticFilesStorage, voir core.test_runner)"""
+
+    def setUp(self):
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        storages = {
+            'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+            'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'},
+        }
+        settings = self.settings(STORAGES=storages, STATIC_ROOT=static_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client.force_login(get_user_model().objects.create_user('vendeur', password='pw'))
+
+    def test_pages_render_before_collectstatic(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/static/css/style.css')
+
+    def test_pages_use_hashed_names_after_collectstatic(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        url = staticfiles_storage.url('css/style.css')
+        self.assertRegex(url, r'^/static/css/style\.[0-9a-f]{12}\.css$')
+        self.assertContains(self.client.get(reverse('dashboard')), url)
+
+
+class MetricsMiddlewareTests(TestCase):
+    def counted_queries(self):
+        # Somme de l'histogramme des requêtes SQL des vues sans nom d'URL
+        return metrics.REQUEST_QUERIES.samples.get(('unmatched',), [0])[-1]
+
+    def test_sync_chain_counts_queries(self):
+        before = self.counted_queries()
+        MetricsMiddleware(query_view)(RequestFactory().get('/'))
+        self.assertEqual(self.counted_queries() - before, 2)
+
+    async def test_async_chain_counts_queries(self):
+        middleware = MetricsMiddleware(sync_to_async(query_view))
+        self.assertTrue(iscoroutinefunction(middleware))
+        before = self.counted_queries()
+        response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertEqual(response.content, b"vue")
+        self.assertEqual(self.counted_queries() - before, 2)
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user('gerant', password='pw', is_staff=True)
+        cls.seller = get_user_model().objects.create_user('vendeur', password='pw')
+
+    def request(self, user, factory=RequestFactory):
+        request = factory().get('/', headers={'x-profile': '1'})
+        request.user = user
+        return request
+
+    def saved_profile(self, response):
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.addCleanup(profile.queries.delete, save=False)
+        self.addCleanup(profile.stats.delete, save=False)
+        return profile
+
+    def test_staff_only(self):
+        response = ProfilingMiddleware(query_view)(self.request(self.seller))
+        self.assertNotIn('X-Profile-Id', response)
+        response = ProfilingMiddleware(query_view)(self.request(self.staff))
+        self.assertEqual(self.saved_profile(response).query_count, 2)
+
+    async def test_async_chain_profiles_sync_view(self):
+        middleware = ProfilingMiddleware(sync_to_async(query_view))
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(self.request(self.staff, AsyncRequestFactory))
+        profile = await sync_to_async(self.saved_profile)(response)
+        self.assertEqual(profile.query_count, 2)
+
+
+class JobLeaseTests(TestCase):
+    def setUp(self):
+        Job.objects.create(kind='inventory.products_csv')
+        self.job = claim_next()
+        # Tâche démarrée il y a une heure
+        Job.objects.filter(pk=self.job.pk).update(started_at=timezone.now() - datetime.timedelta(hours=1))
+
+    def age_heartbeat(self, minutes):
+        Job.objects.filter(pk=self.job.pk).update(heartbeat_at=timezone.now() - datetime.timedelta(minutes=minutes))
+
+    def test_long_job_with_heartbeat_is_kept(self):
+        self.assertEqual(requeue_stale(), 0)
+        self.assertEqual(Job.objects.get(pk=self.job.pk).status, Job.Status.RUNNING)
+
+    def test_silent_job_is_requeued(self):
+        self.age_heartbeat(10)
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Job.objects.get(pk=self.job.pk).status, Job.Status.PENDING)
+
+    def test_heartbeat_refreshes_running_jobs(self):
+        self.age_heartbeat(10)
+        heartbeat = Heartbeat()
+        with heartbeat.tracking(self.job):
+            self.assertEqual(heartbeat.beat(), 0)
+        self.assertEqual(Job.objects.get(pk=self.job.pk).status, Job.Status.RUNNING)
+        self.age_heartbeat(10)
+        self.assertEqual(heartbeat.beat(), 1)
+
+
+class JobResultTests(TestCase):
+    def setUp(self):
+        self.owner = get_user_model().objects.create_user('vendeur', password='pw')
+        self.client.force_login(self.owner)
+
+    def test_result_is_private_to_its_requester(self):
+        with self.settings(JOBS_RUN_INLINE=True):
+            job = enqueue('inventory.products_csv', self.owner)
+        self.assertEqual(job.status, Job.Status.DONE)
+        self.assertTrue(job.result.path.startswith(str(settings.JOBS_RESULT_DIR)))
+        self.assertFalse(job.result.path.startswith(str(settings.MEDIA_ROOT)))
+        response = self.client.get(reverse('job_download', args=[job.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Seuil Alerte', b''.join(response.streaming_content))
+
+        self.client.force_login(get_user_model().objects.create_user('autre', password='pw'))
+        self.assertEqual(self.client.get(reverse('job_download', args=[job.pk])).status_code, 404)
+
+    def test_pending_job_page_mentions_the_worker(self):
+        with self.settings(JOBS_RUN_INLINE=False):
+            job = enqueue('inventory.products_csv', self.owner)
+        self.assertContains(self.client.get(reverse('job_detail', args=[job.pk])), 'runworker')
+
+
+class LiveEventTests(InventoryTestCase):
+    def test_stock_events_published_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.move('ENTRY', 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.move('EXIT', 6)
+        # Sortie de la zone d'alerte (0 -> 10) puis retour (10 -> 4)
+        self.assertEqual(list(LiveEvent.objects.order_by('pk').values_list('kind', flat=True)), ['stock', 'low_stock', 'stock', 'low_stock'])
+        self.assertTrue(LiveEvent.objects.last().data['low_stock'])
+
+    def test_rolled_back_write_is_not_published(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.move('ENTRY', 10)
+                raise ValueError
+        self.assertEqual(callbacks, [])
+
+    def test_purge_keeps_recent_events(self):
+        old = LiveEvent.objects.create(kind='stock')
+        LiveEvent.objects.filter(pk=old.pk).update(created_at=timezone.now() - datetime.timedelta(hours=1))
+        LiveEvent.objects.create(kind='stock')
+        self.assertEqual(purge_events(minutes=10), 1)
+        self.assertEqual(LiveEvent.objects.count(), 1)
+
+    async def test_stream_replays_missed_events(self):
+        first = await LiveEvent.objects.acreate(kind='stock', data={'quantity': 1})
+        await LiveEvent.objects.acreate(kind='sale', data={'number': 'F-1'})
+        with self.settings(LIVE_EVENTS_POLL_SECONDS=0.01):
+            stream = event_stream(last_id=first.pk)
+            self.assertTrue((await anext(stream)).startswith('retry:'))
+            self.assertEqual(await anext(stream), f'id: {first.pk + 1}\nevent: sale\ndata: {{"number": "F-1"}}\n\n')
+            await stream.aclose()
+            await broadcaster.task
+        self.assertFalse(broadcaster.subscribers)
+
+    async def test_polling_survives_read_errors(self):
+        failures = [RuntimeError("base indisponible")]
+
+        def flaky_events_after(last_id):
+            if failures:
+                raise failures.pop()
+            return events_after(last_id)
+
+        local = Broadcaster()
+        with self.settings(LIVE_EVENTS_POLL_SECONDS=0.01), \
+                mock.patch('core.events.events_after', flaky_events_after), \
+                self.assertLogs('core.events', 'ERROR'):
+            queue = local.subscribe()
+            await asyncio.sleep(0.05)
+            event = await LiveEvent.objects.acreate(kind='stock', data={'quantity': 3})
+            self.assertEqual(await asyncio.wait_for(queue.get(), 2), [event])
+            local.unsubscribe(queue)
+            await local.task
+
+
+class ThumbnailTests(InventoryTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = self.settings(MEDIA_ROOT=media_root, JOBS_RUN_INLINE=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, mode='RGB', size=(1200, 800)):
+        output = io.BytesIO()
+        Image.new(mode, size).save(output, 'PNG')
+        return SimpleUploadedFile('photo.png', output.getvalue(), content_type='image/png')
+
+    def create_product(self, **kwargs):
+        return Product.objects.create(category=self.category, name="Coca", purchase_price=100, selling_price=150, **kwargs)
+
+    def test_upload_generates_thumbnails_after_commit(self):
+        version = get_versions()['inventory']
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(image=self.upload())
+        job = Job.objects.get(kind='core.thumbnails')
+        self.assertEqual(job.status, Job.Status.DONE)
+        storage = product.image.storage
+        for extension in ('webp', 'jpg'):
+            self.assertTrue(storage.exists(thumbnail_name(product.image.name, 'card', extension)))
+            self.assertTrue(storage.exists(thumbnail_name(product.image.name, 'row', extension)))
+        with storage.open(thumbnail_name(product.image.name, 'card', 'jpg')) as thumbnail:
+            self.assertEqual(Image.open(thumbnail).size, (400, 267))
+        self.assertGreater(get_versions()['inventory'], version)
+
+    def test_saves_without_upload_enqueue_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = self.upload()
+            product.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = "Coca 33cl"
+            product.save()
+        self.assertEqual(Job.objects.filter(kind='core.thumbnails').count(), 1)
+
+    def test_url_falls_back_to_original(self):
+        product = self.create_product(image=self.upload())
+        self.assertEqual(thumbnail_url(product.image, 'card'), product.image.url)
+        generate_thumbnails(product.image, ['card'])
+        self.assertTrue(thumbnail_url(product.image, 'card').endswith('.card.jpg'))
+
+    def test_transparent_image_gets_white_jpeg_background(self):
+        product = self.create_product(image=self.upload(mode='RGBA', size=(100, 100)))
+        generate_thumbnails(product.image, ['row'])
+        with product.image.storage.open(thumbnail_name(product.image.name, 'row', 'jpg')) as thumbnail:
+            image = Image.open(thumbnail)
+            self.assertEqual(image.mode, 'RGB')
+            self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
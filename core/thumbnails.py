@@ -0,0 +1,125 @@
+"""
+Miniatures des images envoyées (photos produit, logo) : variantes WebP et JPEG
+de taille fixe, écrites à côté de l'original (produits/photo.card.webp) par le
+worker (tâche 'core.thumbnails') ou par la commande generate_thumbnails.
+"""
+import io
+import posixpath
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps
+
+from .cache import bump_version
+from .jobs import enqueue, register
+
+# Champs image suivis [(modèle, champ, tailles, espace de version)], voir generate_on_upload
+UPLOAD_FIELDS = []
+
+FORMATS = {
+    'webp': ('WEBP', {'method': 6}),
+    'jpg': ('JPEG', {'optimize': True, 'progressive': True}),
+}
+
+
+def thumbnail_name(name, size, extension):
+    root, _ = posixpath.splitext(name)
+    return f"{root}.{size}.{extension}"
+
+
+def _encode(image, extension):
+    image_format, options = FORMATS[extension]
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        # Pas de transparence en JPEG : fond blanc, comme sur une facture imprimée
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    output = io.BytesIO()
+    image.save(output, image_format, quality=settings.THUMBNAIL_QUALITY, **options)
+    return output.getvalue()
+
+
+def generate_thumbnails(field_file, sizes):
+    """
+    Écrit les variantes des tailles données (noms de THUMBNAIL_SIZES) d'une image,
+    en remplaçant les précédentes. L'original n'est décodé qu'une fois.
+    Retourne les noms écrits.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info or 'A' in original.getbands() else 'RGB')
+
+    written = []
+    for size in sizes:
+        image = original.copy()
+        image.thumbnail(settings.THUMBNAIL_SIZES[size], Image.Resampling.LANCZOS)
+        for extension in FORMATS:
+            name = thumbnail_name(field_file.name, size, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            written.append(storage.save(name, ContentFile(_encode(image, extension))))
+    return written
+
+
+def has_thumbnails(field_file, sizes):
+    return all(
+        field_file.storage.exists(thumbnail_name(field_file.name, size, extension))
+        for size in sizes for extension in FORMATS
+    )
+
+
+def thumbnail_url(field_file, size, extension='jpg'):
+    """URL de la miniature, ou de l'original tant qu'elle n'est pas générée"""
+    name = thumbnail_name(field_file.name, size, extension)
+    if field_file.storage.exists(name):
+        return field_file.storage.url(name)
+    return field_file.url
+
+
+def thumbnail_path(field_file, size, extension='jpg'):
+    """Chemin local de la miniature (ou de l'original), pour reportlab"""
+    name = thumbnail_name(field_file.name, size, extension)
+    return field_file.storage.path(name if field_file.storage.exists(name) else field_file.name)
+
+
+def generate_on_upload(model, field, sizes, namespace):
+    """
+    Demande au worker les miniatures `sizes` de chaque nouvelle image envoyée dans
+    `field` (fichier pas encore écrit au pre_save), une fois la transaction validée.
+    Les autres enregistrements du modèle (mouvements de stock...) ne coûtent rien.
+    La version `namespace` est incrémentée après génération : les fragments en
+    cache pointant vers l'original sont alors régénérés.
+    """
+    UPLOAD_FIELDS.append((model, field, sizes, namespace))
+    uploaded = f'_{field}_uploaded'
+
+    def mark_upload(sender, instance, **kwargs):
+        field_file = getattr(instance, field)
+        setattr(instance, uploaded, bool(field_file) and not field_file._committed)
+
+    def schedule(sender, instance, **kwargs):
+        if getattr(instance, uploaded, False):
+            setattr(instance, uploaded, False)
+            params = {
+                'model': instance._meta.label_lower, 'pk': instance.pk, 'field': field,
+                'sizes': list(sizes), 'namespace': namespace,
+            }
+            transaction.on_commit(lambda: enqueue('core.thumbnails', **params))
+
+    pre_save.connect(mark_upload, sender=model, weak=False, dispatch_uid=f'thumbnails-mark-{model._meta.label}-{field}')
+    post_save.connect(schedule, sender=model, weak=False, dispatch_uid=f'thumbnails-schedule-{model._meta.label}-{field}')
+
+
+@register('core.thumbnails', "Génération de miniatures")
+def thumbnails_job(job):
+    instance = apps.get_model(job.params['model']).objects.filter(pk=job.params['pk']).first()
+    field_file = getattr(instance, job.params['field'], None) if instance is not None else None
+    if field_file:
+        generate_thumbnails(field_file, job.params['sizes'])
+        bump_version(job.params['namespace'])
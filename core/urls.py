@@ -5,4 +5,10 @@ urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('products/', views.product_list, name='product_list'),
     path('settings/', views.StoreSettingsUpdateView.as_view(), name='store_settings'),
+    path('events/', views.live_events, name='live_events'),
+    path('jobs/', views.job_list, name='job_list'),
+    path('jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:pk>/status/', views.job_status, name='job_status'),
+    path('jobs/<int:pk>/download/', views.job_download, name='job_download'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
@@ -1,13 +1,20 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.db.models import Sum, F
 from django.utils import timezone
 from datetime import timedelta
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.views.decorators.http import last_modified
 from django.views.generic import UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from .models import StoreSettings
-from inventory.models import Product, Category, StockMovement
+from . import metrics
+from .events import event_stream
+from .models import Job, StoreSettings
+from inventory.models import Product, Category, Location, StockMovement, StockValuation
 from sales.models import Invoice, Customer
 
 class StoreSettingsUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
@@ -46,23 +53,40 @@ def product_list(request):
         products = products.filter(category_id=category_filter)
     
     # Filtre par statut (Optimisé pour rester un QuerySet)
+    # Filtre par emplacement : stock et statut deviennent ceux de l'emplacement
+    location = Location.selected(request.GET.get('location'))
+    if location:
+        products = Product.with_location_stock(location, products)
+    stock_field = 'location_quantity' if location else 'quantity'
+
     status_filter = request.GET.get('status', '')
     if status_filter == 'low_stock':
-        products = products.filter(quantity__lte=F('alert_threshold'))
+        products = products.filter(**{f'{stock_field}__lte': F('alert_threshold')})
     elif status_filter == 'active':
-        products = products.filter(quantity__gt=F('alert_threshold'))
+        products = products.filter(**{f'{stock_field}__gt': F('alert_threshold')})
     
-    # Mode d'affichage (liste ou grille)
+    # Filtre par classe ABC (précalculée, colonne indexée)
+    abc_filter = request.GET.get('abc', '')
+    if abc_filter in Product.AbcClass.values:
+        products = products.filter(abc_class=abc_filter)
+
+    # Mode d'affichage (liste ou grille), dans la clé du fragment en cache des filtres :
+    # toute autre valeur retombe sur la liste
     view_mode = request.GET.get('view', 'list')
+    if view_mode not in ('list', 'grid'):
+        view_mode = 'list'
     
     categories = Category.objects.all()
     
     context = {
         'products': products,
         'categories': categories,
+        'locations': Location.objects.filter(is_active=True),
+        'location': location,
         'search_query': search_query,
         'category_filter': category_filter,
         'status_filter': status_filter,
+        'abc_filter': abc_filter,
         'view_mode': view_mode,
     }
     
@@ -77,27 +101,109 @@ def dashboard(request):
     this_month_start = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
     # Statistiques Clés
-    total_revenue_month = Invoice.objects.filter(user=request.user, date__gte=this_month_start).aggregate(total=Sum('total_amount'))['total'] or 0
-    total_stock_value = Product.objects.all().aggregate(total=Sum(F('purchase_price') * F('quantity')))['total'] or 0
-    low_stock_count = Product.objects.filter(quantity__lte=F('alert_threshold')).count()
-    total_customers = Customer.objects.count()
+    # Les indicateurs sont passés sous forme de callables : le template ne les
+    # évalue que si le fragment mis en cache est absent ou invalidé.
+    def total_revenue_month():
+        return Invoice.objects.filter(user=request.user, date__gte=this_month_start).aggregate(total=Sum('total_amount'))['total'] or 0
+
+    def total_stock_value():
+        return StockValuation.total().purchase_value
+
+    # Alertes de stock à l'emplacement de l'utilisateur (toutes si aucun)
+    location_id = request.user.location_id
+
+    def low_stock_count():
+        return Product.low_stock(location_id).count()
     
     # Activités récentes
     recent_sales = Invoice.objects.filter(user=request.user).select_related('customer').order_by('-date')[:5]
     recent_movements = StockMovement.objects.select_related('product', 'user').order_by('-date')[:5]
     
     # Alertes de stock
-    low_stock_products = Product.objects.filter(quantity__lte=F('alert_threshold')).select_related('category')[:5]
+    low_stock_products = Product.low_stock(location_id).select_related('category')[:5]
     
     context = {
         'revenue': total_revenue_month,
         'stock_value': total_stock_value,
         'low_stock_count': low_stock_count,
-        'customer_count': total_customers,
+        'customer_count': Customer.objects.count,
         'recent_sales': recent_sales,
         'recent_movements': recent_movements,
         'low_stock_products': low_stock_products,
+        'low_stock_location': location_id,
         'title': 'Tableau de Bord'
     }
     
     return render(request, 'core/dashboard.html', context)
+
+
+# Nombre de tâches récentes listées
+JOB_LIST_MAX_ROWS = 50
+
+
+@login_required
+def job_list(request):
+    """Tâches en arrière-plan demandées par l'utilisateur"""
+    jobs = Job.objects.filter(user=request.user)[:JOB_LIST_MAX_ROWS]
+    return render(request, 'core/job_list.html', {'jobs': jobs, 'title': 'Mes tâches'})
+
+
+@login_required
+def job_detail(request, pk):
+    """Suivi d'une tâche : la page interroge job_status jusqu'à la fin puis propose le fichier"""
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    return render(request, 'core/job_detail.html', {'job': job, 'title': job.label})
+
+
+@login_required
+def job_status(request, pk):
+    job = get_object_or_404(Job, pk=pk, user=request.user)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'download_url': reverse('job_download', args=[job.pk]) if job.result else None,
+    })
+
+
+def _job_finished_at(request, pk):
+    # Fichier immuable une fois la tâche terminée
+    return Job.objects.filter(pk=pk, user=request.user).values_list('finished_at', flat=True).first()
+
+
+@login_required
+@last_modified(_job_finished_at)
+def job_download(request, pk):
+    job = get_object_or_404(Job, pk=pk, user=request.user, status=Job.Status.DONE)
+    if not job.result:
+        raise Http404
+    return FileResponse(job.result.open('rb'), as_attachment=True, filename=job.result.name.rsplit('/', 1)[-1])
+
+
+@login_required
+async def live_events(request):
+    """
+    Flux SSE des mouvements de stock, alertes et ventes. Servi uniquement par
+    l'application ASGI : sous WSGI, un flux infini bloquerait un worker, la
+    réponse 204 indique alors au navigateur de ne pas se reconnecter.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    last_id = request.headers.get('Last-Event-ID', '')
+    response = StreamingHttpResponse(
+        event_stream(int(last_id) if last_id.isdigit() else None),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Pas de mise en tampon par un proxy nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def metrics_view(request):
+    """Métriques au format texte de Prometheus, pour le collecteur (METRICS_ALLOWED_IPS) ou le personnel"""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        raise PermissionDenied
+    response = HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    response['Cache-Control'] = 'no-cache'
+    return response
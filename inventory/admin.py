@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Product, StockMovement
+from .models import Category, Location, Product, StockBalance, StockMovement, StockValuation, CostLayer, StockSnapshot, ArchivedStockMovement, StockSession, StockSessionLine, ReplenishmentForecast, StockReservation
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -7,20 +7,103 @@ class CategoryAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ('name',)
 
+@admin.register(Location)
+class LocationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'address', 'is_default', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'address')
+
+class StockBalanceInline(admin.TabularInline):
+    model = StockBalance
+    extra = 0
+    fields = ('location', 'quantity')
+    readonly_fields = ('location', 'quantity')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'category', 'purchase_price', 'selling_price', 'quantity', 'alert_threshold', 'is_low_stock')
-    list_filter = ('category', 'created_at')
+    list_filter = ('category', 'abc_class', 'created_at')
     search_fields = ('name', 'barcode', 'description')
     list_editable = ('selling_price', 'alert_threshold')
     # quantity is editable here but ideally should be read-only to force using movements. 
     # For simplicity, let's keep it editable but warn user or make read-only.
     # To secure stock, make quantity read-only and force usage of StockMovements via inlines or separate admin.
     readonly_fields = ('created_at', 'updated_at')
+    inlines = [StockBalanceInline]
 
 @admin.register(StockMovement)
 class StockMovementAdmin(admin.ModelAdmin):
-    list_display = ('product', 'movement_type', 'quantity', 'date', 'user')
-    list_filter = ('movement_type', 'date', 'user')
+    list_display = ('product', 'movement_type', 'quantity', 'location', 'destination', 'unit_cost', 'total_cost', 'date', 'user')
+    list_filter = ('movement_type', 'location', 'date', 'user')
     search_fields = ('product__name', 'reason')
     date_hierarchy = 'date'
+
+@admin.register(ArchivedStockMovement)
+class ArchivedStockMovementAdmin(admin.ModelAdmin):
+    list_display = ('original_id', 'product', 'movement_type', 'quantity', 'location', 'unit_cost', 'total_cost', 'date', 'user')
+    list_filter = ('movement_type', 'location', 'date')
+    search_fields = ('product__name', 'reason')
+    date_hierarchy = 'date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ('product', 'location', 'quantity')
+    list_filter = ('location',)
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'location', 'quantity')
+
+@admin.register(StockValuation)
+class StockValuationAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'quantity', 'purchase_value', 'selling_value', 'updated_at')
+    readonly_fields = ('category', 'quantity', 'purchase_value', 'selling_value', 'updated_at')
+
+@admin.register(CostLayer)
+class CostLayerAdmin(admin.ModelAdmin):
+    list_display = ('product', 'date', 'unit_cost', 'quantity', 'remaining')
+    list_filter = ('date',)
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'movement', 'date', 'unit_cost', 'quantity', 'remaining')
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'product', 'quantity')
+    list_filter = ('date',)
+    search_fields = ('product__name',)
+    date_hierarchy = 'date'
+
+class StockSessionLineInline(admin.TabularInline):
+    model = StockSessionLine
+    extra = 0
+    raw_id_fields = ('product',)
+    readonly_fields = ('expected', 'difference')
+
+@admin.register(StockSession)
+class StockSessionAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'kind', 'location', 'status', 'created_by', 'created_at', 'committed_at')
+    list_filter = ('kind', 'status', 'location')
+    search_fields = ('reference',)
+    readonly_fields = ('status', 'committed_at')
+    inlines = [StockSessionLineInline]
+
+@admin.register(ReplenishmentForecast)
+class ReplenishmentForecastAdmin(admin.ModelAdmin):
+    list_display = ('product', 'daily_demand', 'demand_deviation', 'days_of_cover', 'reorder_point', 'reorder_quantity', 'computed_at')
+    search_fields = ('product__name',)
+    readonly_fields = ('product', 'daily_demand', 'demand_deviation', 'days_of_cover', 'reorder_point', 'reorder_quantity', 'computed_at')
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('product', 'quantity', 'token', 'user', 'created_at', 'expires_at')
+    search_fields = ('product__name', 'token')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models import Max
+
+from .models import ArchivedStockMovement, StockMovement
+
+ARCHIVED_FIELDS = ('product_id', 'movement_type', 'quantity', 'location_id', 'destination_id', 'reason', 'user_id', 'date', 'unit_cost', 'total_cost')
+
+
+def archived_until():
+    """Date du mouvement archivé le plus récent (None si l'archive est vide)"""
+    return ArchivedStockMovement.objects.aggregate(latest=Max('date'))['latest']
+
+
+def movement_querysets(start=None, end=None):
+    """
+    Mouvements de la période [start, end[ : la table chaude, plus l'archive
+    uniquement si la période commence avant la fin de la partie archivée.
+    """
+    querysets = [StockMovement.objects.all()]
+    boundary = archived_until()
+    if boundary is not None and (start is None or start <= boundary):
+        querysets.append(ArchivedStockMovement.objects.all())
+
+    filtered = []
+    for queryset in querysets:
+        if start is not None:
+            queryset = queryset.filter(date__gte=start)
+        if end is not None:
+            queryset = queryset.filter(date__lt=end)
+        filtered.append(queryset)
+    return filtered
+
+
+def archive_movements(before, batch_size=1000):
+    """
+    Déplace les mouvements antérieurs à `before` vers l'archive, par lots transactionnels.
+    Le report des soldes (StockSnapshot) doit avoir été enregistré au préalable.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                StockMovement.objects.filter(date__lt=before)
+                .order_by('id')
+                .values('id', *ARCHIVED_FIELDS)[:batch_size]
+            )
+            if not batch:
+                return moved
+            ids = [row.pop('id') for row in batch]
+            ArchivedStockMovement.objects.bulk_create([
+                ArchivedStockMovement(original_id=movement_id, **row) for movement_id, row in zip(ids, batch)
+            ])
+            StockMovement.objects.filter(pk__in=ids).delete()
+            moved += len(batch)
@@ -0,0 +1,133 @@
+import datetime
+import math
+from decimal import Decimal
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archive import movement_querysets
+from .models import Product, ReplenishmentForecast, StockMovement, update_by_value
+
+
+# Couverture au-delà de laquelle la valeur n'a plus de sens (et déborderait la colonne)
+MAX_DAYS_OF_COVER = 99999
+
+
+def daily_exits(start, end):
+    """
+    Sorties agrégées par produit et par jour sur [start, end[ (une requête groupée par table).
+    Retourne deux tableaux alignés : identifiants produit et quantités journalières.
+    """
+    product_ids, quantities = [], []
+    for movements in movement_querysets(start, end):
+        rows = (
+            movements.filter(movement_type=StockMovement.MovementType.EXIT)
+            .values('product_id', day=TruncDate('date'))
+            .annotate(total=Sum('quantity'))
+            .values_list('product_id', 'total')
+            .order_by()
+        )
+        for product_id, total in rows:
+            product_ids.append(product_id)
+            quantities.append(total)
+    return np.array(product_ids, dtype=np.int64), np.array(quantities, dtype=np.float64)
+
+
+def _decimal(value, places):
+    return Decimal(f'{value:.{places}f}')
+
+
+def compute_forecasts(window_days=None, lead_time=None, review_days=None, service_level=None):
+    """
+    Calcule en une passe vectorisée, pour chaque produit, la demande journalière
+    moyenne et son écart-type sur la fenêtre, la couverture en jours, le point de
+    commande (demande pendant le délai + stock de sécurité) et la quantité à
+    commander pour remonter au stock cible (point de commande + demande d'une période).
+    Retourne un dict de tableaux NumPy alignés sur `product_ids`.
+    """
+    window_days = window_days or settings.STOCK_FORECAST_WINDOW_DAYS
+    lead_time = lead_time or settings.STOCK_LEAD_TIME_DAYS
+    review_days = review_days or settings.STOCK_REVIEW_DAYS
+    service_level = service_level or settings.STOCK_SERVICE_LEVEL
+
+    now = timezone.now()
+    start = now - datetime.timedelta(days=window_days)
+    products = Product.objects.order_by('pk').values_list('pk', 'quantity', 'created_at')
+    product_ids, quantities, created = zip(*products) if products else ((), (), ())
+    product_ids = np.array(product_ids, dtype=np.int64)
+    quantities = np.array(quantities, dtype=np.float64)
+
+    # Jours d'historique : la fenêtre, ou l'ancienneté des produits plus récents
+    age = (now.timestamp() - np.array([c.timestamp() for c in created], dtype=np.float64)) / 86400
+    days = np.clip(np.ceil(age), 1, window_days)
+
+    exit_ids, exit_quantities = daily_exits(start, now)
+    index = np.searchsorted(product_ids, exit_ids)
+    totals = np.bincount(index, weights=exit_quantities, minlength=len(product_ids))
+    squares = np.bincount(index, weights=exit_quantities ** 2, minlength=len(product_ids))
+
+    # Les jours sans vente comptent pour une demande nulle
+    daily_demand = totals / days
+    deviation = np.sqrt(np.maximum(squares / days - daily_demand ** 2, 0))
+
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * deviation * np.sqrt(lead_time)
+    reorder_point = np.ceil(np.round(daily_demand * lead_time + safety_stock, 6))
+    order_up_to = reorder_point + daily_demand * review_days
+    reorder_quantity = np.where(quantities <= reorder_point, np.ceil(np.round(order_up_to - quantities, 6)), 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(daily_demand > 0, np.maximum(quantities, 0) / daily_demand, np.nan)
+    days_of_cover = np.minimum(days_of_cover, MAX_DAYS_OF_COVER)
+
+    return {
+        'product_ids': product_ids,
+        'daily_demand': daily_demand,
+        'deviation': deviation,
+        'days_of_cover': days_of_cover,
+        'reorder_point': reorder_point.astype(np.int64),
+        'reorder_quantity': np.maximum(reorder_quantity, 0).astype(np.int64),
+    }
+
+
+def save_forecasts(forecasts, apply_thresholds=False):
+    """
+    Remplace les prévisions enregistrées (suppression puis insertion en masse des produits vendus).
+    Avec `apply_thresholds`, le point de commande devient le seuil d'alerte des
+    produits vendus sur la fenêtre (une requête par valeur distincte).
+    """
+    computed_at = timezone.now()
+    # Sans vente sur la fenêtre, la prévision est nulle : seuls les produits vendus sont enregistrés
+    sold = forecasts['daily_demand'] > 0
+    rows = zip(*(forecasts[key][sold].tolist() for key in (
+        'product_ids', 'daily_demand', 'deviation', 'days_of_cover', 'reorder_point', 'reorder_quantity',
+    )))
+    with transaction.atomic():
+        ReplenishmentForecast.objects.all().delete()
+        ReplenishmentForecast.objects.bulk_create([
+            ReplenishmentForecast(
+                product_id=product_id,
+                daily_demand=_decimal(demand, 3),
+                demand_deviation=_decimal(deviation, 3),
+                days_of_cover=None if math.isnan(cover) else _decimal(cover, 1),
+                reorder_point=reorder_point,
+                reorder_quantity=reorder_quantity,
+                computed_at=computed_at,
+            )
+            for product_id, demand, deviation, cover, reorder_point, reorder_quantity in rows
+        ], batch_size=2000)
+
+        if not apply_thresholds:
+            return 0
+        current = dict(Product.objects.values_list('pk', 'alert_threshold'))
+        thresholds = {
+            product_id: reorder_point
+            for product_id, reorder_point in zip(forecasts['product_ids'][sold].tolist(), forecasts['reorder_point'][sold].tolist())
+            if current.get(product_id) != reorder_point
+        }
+        update_by_value(Product.objects.all(), 'alert_threshold', thresholds)
+    return len(thresholds)
@@ -0,0 +1,40 @@
+from django import forms
+
+from .models import Product, StockSession
+
+
+class ProductImportForm(forms.Form):
+    file = forms.FileField(label="Fichier", help_text="CSV (séparateur ; ou ,) ou XLSX, avec une ligne d'en-têtes")
+
+
+class ProductImportRowForm(forms.Form):
+    """Validation d'une ligne d'import (sans requête : catégories et doublons sont résolus par lot)"""
+    barcode = forms.CharField(max_length=100, label="Code-barre")
+    name = forms.CharField(max_length=200, label="Nom")
+    category = forms.CharField(max_length=100, label="Catégorie")
+    description = forms.CharField(required=False, label="Description")
+    purchase_price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, label="Prix d'achat")
+    selling_price = forms.DecimalField(max_digits=10, decimal_places=2, min_value=0, label="Prix de vente")
+    quantity = forms.IntegerField(required=False, min_value=0, label="Stock initial")
+    alert_threshold = forms.IntegerField(required=False, min_value=0, label="Seuil d'alerte")
+
+
+class StockSessionForm(forms.ModelForm):
+    class Meta:
+        model = StockSession
+        fields = ['kind', 'location', 'reference']
+
+
+class StockScanForm(forms.Form):
+    """Saisie d'une ligne de session : code-barre scanné et quantité (1 par défaut)"""
+    barcode = forms.CharField(max_length=100, label="Code-barre", widget=forms.TextInput(attrs={'autofocus': True}))
+    quantity = forms.IntegerField(min_value=0, initial=1, label="Quantité")
+    unit_cost = forms.DecimalField(max_digits=12, decimal_places=4, min_value=0, required=False, label="Coût unitaire",
+                                   help_text="Réception uniquement ; prix d'achat du produit si vide")
+
+    def clean_barcode(self):
+        barcode = self.cleaned_data['barcode'].strip()
+        self.product = Product.objects.filter(barcode=barcode).first()
+        if self.product is None:
+            raise forms.ValidationError("Aucun produit avec ce code-barre.")
+        return barcode
@@ -0,0 +1,198 @@
+import csv
+import io
+import itertools
+import time
+
+from django.db import transaction
+from django.utils.text import slugify
+
+from core.cache import bump_version
+from core.metrics import count_movements
+from .forms import ProductImportRowForm
+from .models import Category, CostLayer, Location, Product, StockBalance, StockMovement, StockValuation, CENTS, batched
+
+# En-têtes acceptés (après slugify) : noms des champs, libellés français et ceux de l'export CSV
+HEADER_ALIASES = {
+    'barcode': 'barcode', 'code-barre': 'barcode', 'code-barres': 'barcode', 'ean': 'barcode',
+    'name': 'name', 'nom': 'name',
+    'category': 'category', 'categorie': 'category',
+    'description': 'description',
+    'purchase_price': 'purchase_price', 'prix-achat': 'purchase_price', 'prix-dachat': 'purchase_price',
+    'selling_price': 'selling_price', 'prix-vente': 'selling_price', 'prix-de-vente': 'selling_price',
+    'quantity': 'quantity', 'quantite': 'quantity', 'stock': 'quantity', 'stock-initial': 'quantity',
+    'alert_threshold': 'alert_threshold', 'seuil-alerte': 'alert_threshold', 'seuil-dalerte': 'alert_threshold',
+}
+REQUIRED_COLUMNS = ('barcode', 'name', 'category', 'purchase_price', 'selling_price')
+DECIMAL_COLUMNS = ('purchase_price', 'selling_price')
+
+# Champs écrasés lorsqu'un code-barre existe déjà, s'ils ont une colonne dans le fichier
+# (le stock n'est modifié que par des mouvements)
+UPSERT_FIELDS = ['name', 'category', 'description', 'purchase_price', 'selling_price', 'alert_threshold']
+DEFAULT_ALERT_THRESHOLD = Product._meta.get_field('alert_threshold').default
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    first_line = text.readline()
+    delimiter = ';' if first_line.count(';') > first_line.count(',') else ','
+    yield from csv.reader(itertools.chain([first_line], text), delimiter=delimiter)
+
+
+def _xlsx_rows(file):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("L'import XLSX nécessite le paquet openpyxl")
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def _cell(value):
+    return '' if value is None else str(value).strip()
+
+
+def read_rows(file, filename):
+    """
+    Parcourt le fichier (CSV ou XLSX) sans le charger en mémoire.
+    Produit des couples (numéro de ligne, {champ: valeur}), chaque ligne ayant toutes les
+    colonnes reconnues de l'en-tête ; lève ValueError si les en-têtes sont invalides.
+    """
+    rows = _xlsx_rows(file) if filename.lower().endswith('.xlsx') else _csv_rows(file)
+    header = next(rows, None)
+    if header is None:
+        raise ValueError("Le fichier est vide")
+    columns = [HEADER_ALIASES.get(slugify(_cell(title))) for title in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+
+    for line, values in enumerate(rows, start=2):
+        row = {column: _cell(value) for column, value in itertools.zip_longest(columns, values) if column}
+        if not any(row.values()):
+            continue
+        for column in DECIMAL_COLUMNS:
+            row[column] = row.get(column, '').replace(',', '.')
+        yield line, row
+
+
+def import_products(file, filename, user=None, chunk_size=500):
+    """
+    Importe un catalogue produit : validation par lots, catégories résolues par slug
+    en une requête par lot, insertion ou mise à jour par code-barre (bulk_create
+    avec update_conflicts) et mouvements de stock initial écrits en masse.
+    Retourne un dict (rows, created, updated, errors, elapsed, rate).
+    """
+    started = time.monotonic()
+    result = {'rows': 0, 'created': 0, 'updated': 0, 'errors': []}
+    seen = set()
+
+    for chunk in batched(read_rows(file, filename), chunk_size):
+        result['rows'] += len(chunk)
+        with transaction.atomic():
+            created, updated = _import_chunk(chunk, user, seen, result['errors'])
+        result['created'] += created
+        result['updated'] += updated
+
+    result['errors'].sort()
+    if result['created'] or result['updated']:
+        bump_version('inventory')
+
+    result['elapsed'] = time.monotonic() - started
+    result['rate'] = result['rows'] / result['elapsed'] if result['elapsed'] else 0
+    return result
+
+
+def _import_chunk(chunk, user, seen, errors):
+    valid = []
+    for line, row in chunk:
+        form = ProductImportRowForm(row)
+        if not form.is_valid():
+            errors.append((line, '; '.join(
+                f"{form.fields[name].label if name in form.fields else name} : {' '.join(messages)}"
+                for name, messages in form.errors.items()
+            )))
+            continue
+        data = form.cleaned_data
+        if data['barcode'] in seen:
+            errors.append((line, f"Code-barre {data['barcode']} déjà présent plus haut dans le fichier"))
+            continue
+        seen.add(data['barcode'])
+        valid.append((line, data))
+
+    # Une requête pour les catégories du lot (slug ou nom, normalisé en slug)
+    categories = dict(Category.objects.filter(
+        slug__in={slugify(data['category']) for _, data in valid}
+    ).values_list('slug', 'pk'))
+
+    products = []
+    for line, data in valid:
+        category_id = categories.get(slugify(data['category']))
+        if category_id is None:
+            errors.append((line, f"Catégorie inconnue : {data['category']}"))
+            continue
+        threshold = data['alert_threshold']
+        products.append(Product(
+            barcode=data['barcode'],
+            name=data['name'],
+            category_id=category_id,
+            description=data['description'],
+            purchase_price=data['purchase_price'],
+            selling_price=data['selling_price'],
+            alert_threshold=DEFAULT_ALERT_THRESHOLD if threshold is None else threshold,
+            quantity=data['quantity'] or 0,
+        ))
+    if not products:
+        return 0, 0
+
+    # État avant écriture, pour la valorisation et pour distinguer créations et mises à jour
+    existing = {
+        row[0]: row[1:] for row in Product.objects.filter(barcode__in=[p.barcode for p in products])
+        .values_list('barcode', 'pk', *Product.VALUATION_FIELDS)
+    }
+    for product in products:
+        if product.barcode in existing:
+            product.quantity = existing[product.barcode][2]
+
+    # Colonnes absentes du fichier (mise à jour des prix seuls...) : valeurs existantes conservées
+    columns = chunk[0][1].keys()
+    Product.objects.bulk_create(
+        products, batch_size=500,
+        update_conflicts=True, unique_fields=['barcode'],
+        update_fields=[field for field in UPSERT_FIELDS if field in columns] + ['updated_at'],
+    )
+    ids = dict(Product.objects.filter(barcode__in=[p.barcode for p in products]).values_list('barcode', 'pk'))
+
+    # Écritures en masse : ni Product.save() ni StockMovement.save() ne sont appelés,
+    # valorisation, coûts et couches FIFO sont donc tenus ici.
+    changes = []
+    movements = []
+    location = Location.default()
+    for product in products:
+        product.pk = ids[product.barcode]
+        previous = existing.get(product.barcode)
+        changes.append((previous[1:] if previous else None, product.valuation_state()))
+        if previous is None and product.quantity > 0:
+            product.average_cost = product.purchase_price
+            movements.append(StockMovement(
+                product=product,
+                movement_type=StockMovement.MovementType.ENTRY,
+                quantity=product.quantity,
+                location=location,
+                reason="Stock initial (import catalogue)",
+                user=user,
+                unit_cost=product.purchase_price,
+                total_cost=(product.quantity * product.purchase_price).quantize(CENTS),
+            ))
+    StockValuation.apply_changes(changes)
+
+    StockMovement.objects.bulk_create(movements, batch_size=500)
+    count_movements(movements)
+    CostLayer.open_for_many(movements)
+    StockBalance.adjust_many(location.pk, {movement.product_id: movement.quantity for movement in movements})
+    Product.objects.bulk_update([movement.product for movement in movements], ['average_cost'], batch_size=500)
+
+    created = len(products) - sum(1 for product in products if product.barcode in existing)
+    return created, len(products) - created
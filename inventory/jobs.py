@@ -0,0 +1,41 @@
+import csv
+import io
+
+from django.template.loader import render_to_string
+from django.utils.dateparse import parse_date
+
+from core.jobs import register
+from core.reporting import reporting_reads
+from core.context_processors import fragment_cache, store_info
+from .models import Product
+from .reports import inventory_report_context, stock_entry_report_context
+
+
+def render_report(template, context, job):
+    """Rapport HTML autonome et imprimable, rendu hors requête avec le contexte des processeurs de la page"""
+    return render_to_string(template, {**context, **store_info(None), **fragment_cache(None), 'user': job.user})
+
+
+@register('inventory.products_csv', "Export des produits (CSV)")
+@reporting_reads()
+def products_csv(job):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Nom', 'Catégorie', 'Prix Achat', 'Prix Vente', 'Stock', 'Seuil Alerte'])
+    for p in Product.objects.select_related('category').order_by('pk').iterator(chunk_size=2000):
+        writer.writerow([p.name, p.category.name, p.purchase_price, p.selling_price, p.quantity, p.alert_threshold])
+    return 'produits.csv', output.getvalue()
+
+
+@register('inventory.stock_entry_report', "Rapport des entrées de stock")
+@reporting_reads()
+def stock_entry_report(job):
+    context = stock_entry_report_context(job.params.get('start_date', ''), job.params.get('end_date', ''))
+    return 'entrees_stock.html', render_report('inventory/stock_entry_report.html', context, job)
+
+
+@register('inventory.inventory_report', "État de l'inventaire")
+@reporting_reads()
+def inventory_report(job):
+    context = inventory_report_context(job.params.get('abc', ''), parse_date(job.params.get('date') or ''), job.params.get('location'))
+    return 'inventaire.html', render_report('inventory/inventory_report.html', context, job)
@@ -0,0 +1,48 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from core.cache import bump_version
+from inventory.archive import archive_movements
+from inventory.snapshots import end_of_day, take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves stock movements older than a cutoff date into the archive table. '
+        'Carry-forward balances are first stored as a stock snapshot at the close of the day before the cutoff.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Cutoff date (YYYY-MM-DD): movements dated before this day are archived')
+        parser.add_argument(
+            '--keep-days', type=int, default=getattr(settings, 'STOCK_LEDGER_HOT_DAYS', 365),
+            help='Cutoff expressed as a number of days kept in the hot table (ignored with --before)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of movements moved per transaction')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = parse_date(options['before'])
+            except ValueError:
+                # Format valide mais date inexistante (2024-13-45)
+                cutoff = None
+            if cutoff is None:
+                raise CommandError(f"Invalid date: {options['before']}")
+        else:
+            cutoff = timezone.localdate() - datetime.timedelta(days=options['keep_days'])
+        if cutoff > timezone.localdate():
+            raise CommandError('The cutoff date cannot be in the future')
+
+        close_day = cutoff - datetime.timedelta(days=1)
+        with transaction.atomic():
+            count = take_snapshot(close_day)
+        self.stdout.write(f'Carry-forward snapshot of {close_day:%Y-%m-%d}: {count} product balance(s)')
+
+        moved = archive_movements(end_of_day(close_day), batch_size=options['batch_size'])
+        bump_version('inventory')
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} movement(s) dated before {cutoff:%Y-%m-%d}'))
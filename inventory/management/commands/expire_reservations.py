@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from inventory.models import StockReservation
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired stock reservations held by abandoned sales (run periodically, e.g. every minute from cron)'
+
+    def handle(self, *args, **options):
+        expired = StockReservation.expire()
+        self.stdout.write(self.style.SUCCESS(f'Expired {expired} reservation(s)'))
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from core.cache import bump_version
+from inventory.forecasting import compute_forecasts, save_forecasts
+
+
+class Command(BaseCommand):
+    help = (
+        'Forecasts per-product demand from EXIT movement history and stores suggested '
+        'reorder points and order quantities (replenishment report)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, help='Days of history analysed (default STOCK_FORECAST_WINDOW_DAYS)')
+        parser.add_argument('--lead-time', type=int, help='Supplier lead time in days (default STOCK_LEAD_TIME_DAYS)')
+        parser.add_argument('--review-days', type=int, help='Days between two orders (default STOCK_REVIEW_DAYS)')
+        parser.add_argument('--service-level', type=float, help='Target service level, e.g. 0.95 (default STOCK_SERVICE_LEVEL)')
+        parser.add_argument(
+            '--apply-thresholds', action='store_true',
+            help='Also replace the alert threshold of products sold in the window by their reorder point',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        forecasts = compute_forecasts(
+            window_days=options['window_days'],
+            lead_time=options['lead_time'],
+            review_days=options['review_days'],
+            service_level=options['service_level'],
+        )
+        computed = time.monotonic()
+        updated = save_forecasts(forecasts, apply_thresholds=options['apply_thresholds'])
+        bump_version('inventory')
+
+        products = len(forecasts['product_ids'])
+        to_reorder = int((forecasts['reorder_quantity'] > 0).sum())
+        self.stdout.write(self.style.SUCCESS(
+            f'Forecast {products} product(s), {to_reorder} to reorder'
+            f'{f", {updated} alert threshold(s) updated" if options["apply_thresholds"] else ""} '
+            f'(computed in {computed - started:.1f}s, saved in {time.monotonic() - computed:.1f}s)'
+        ))
@@ -0,0 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from inventory.imports import import_products
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports a product catalog from a CSV or XLSX file, upserting products by barcode '
+        'and recording initial stock for new products'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import')
+        parser.add_argument('--user', help='Username recorded on the initial-stock movements')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of rows validated and written per transaction')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Unknown user "{options["user"]}"')
+
+        try:
+            with open(options['path'], 'rb') as file:
+                result = import_products(file, options['path'], user=user, chunk_size=options['chunk_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        for line, message in result['errors']:
+            self.stderr.write(f'Line {line}: {message}')
+        style = self.style.WARNING if result['errors'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{result["rows"]} row(s): {result["created"]} created, {result["updated"]} updated, '
+            f'{len(result["errors"])} error(s) in {result["elapsed"]:.1f}s ({result["rate"]:.0f} rows/s)'
+        ))
@@ -0,0 +1,201 @@
+import time
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import ArchivedStockMovement, CostLayer, Product, StockMovement
+
+
+def to_decimal(value, places):
+    # NaN : mouvement sans effet sur le stock total (transfert), non valorisé
+    return None if np.isnan(value) else Decimal(f'{value:.{places}f}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds movement costs, FIFO cost layers and weighted-average costs from the stock ledger '
+        '(hot and archived movements). '
+        'Used to backfill history; new movements are costed incrementally.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', nargs='+', type=int, help='Only recompute these product ids')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Number of products recomputed per transaction')
+
+    def handle(self, *args, **options):
+        self.method = CostLayer.method()
+        product_ids = options['products'] or list(Product.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+
+        started = time.monotonic()
+        total = 0
+        for start in range(0, len(product_ids), chunk_size):
+            with transaction.atomic():
+                total += self.recompute(product_ids[start:start + chunk_size])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomputed {total} movement(s) for {len(product_ids)} product(s) '
+            f'in {elapsed:.1f}s ({self.method})'
+        ))
+
+    def recompute(self, product_ids):
+        prices = dict(Product.objects.filter(pk__in=product_ids).values_list('pk', 'purchase_price'))
+        fields = ('id', 'product_id', 'movement_type', 'quantity', 'unit_cost', 'date')
+        archived_rows = [
+            (*row, True) for row in ArchivedStockMovement.objects.filter(product_id__in=product_ids)
+            .order_by('product_id', 'date', 'id').values_list(*fields)
+        ]
+        hot_rows = [
+            (*row, False) for row in StockMovement.objects.filter(product_id__in=product_ids)
+            .order_by('product_id', 'date', 'id').values_list(*fields)
+        ]
+        # Tri stable par produit : l'archive (plus ancienne) précède la table chaude
+        rows = sorted(archived_rows + hot_rows, key=lambda row: row[1])
+
+        movements, archived, layers, products = [], [], [], []
+        now = timezone.now()
+        if rows:
+            ids, product_col, types, quantities, recorded, dates, is_archived = zip(*rows)
+            product_col = np.array(product_col)
+            types = np.array(types)
+            quantities = np.array(quantities, dtype=np.int64)
+            # Même variation que StockMovement.signed_quantity : un transfert ne change pas le stock total
+            signed = np.select(
+                [types == StockMovement.MovementType.EXIT, types == StockMovement.MovementType.TRANSFER],
+                [-quantities, 0],
+                default=quantities,
+            )
+            recorded = np.array([np.nan if c is None else float(c) for c in recorded])
+
+            # Les lignes sont triées par produit : un segment contigu par produit
+            starts = np.flatnonzero(np.r_[True, product_col[1:] != product_col[:-1]])
+            for seg_start, seg_end in zip(starts, np.r_[starts[1:], len(rows)]):
+                segment = slice(seg_start, seg_end)
+                product_id = int(product_col[seg_start])
+                unit_costs, total_costs, remaining, average_cost = self.cost_segment(
+                    signed[segment],
+                    recorded[segment],
+                    types[segment] == StockMovement.MovementType.ADJUSTMENT,
+                    float(prices[product_id]),
+                )
+                layer_remaining = iter(remaining)
+                for offset, movement_id in enumerate(ids[segment]):
+                    model, target = (ArchivedStockMovement, archived) if is_archived[seg_start + offset] else (StockMovement, movements)
+                    target.append(model(
+                        pk=movement_id,
+                        unit_cost=to_decimal(unit_costs[offset], 4),
+                        total_cost=to_decimal(total_costs[offset], 2),
+                    ))
+                    if signed[seg_start + offset] > 0:
+                        layers.append(CostLayer(
+                            product_id=product_id,
+                            movement_id=None if is_archived[seg_start + offset] else movement_id,
+                            date=dates[seg_start + offset],
+                            unit_cost=to_decimal(unit_costs[offset], 4),
+                            quantity=int(signed[seg_start + offset]),
+                            remaining=int(next(layer_remaining)),
+                        ))
+                products.append(Product(pk=product_id, average_cost=to_decimal(average_cost, 4), updated_at=now))
+
+        CostLayer.objects.filter(product_id__in=product_ids).delete()
+        CostLayer.objects.bulk_create(layers, batch_size=1000)
+        StockMovement.objects.bulk_update(movements, ['unit_cost', 'total_cost'], batch_size=1000)
+        ArchivedStockMovement.objects.bulk_update(archived, ['unit_cost', 'total_cost'], batch_size=1000)
+        # updated_at : les jetons de version (core.conditional) voient les coûts recalculés
+        Product.objects.bulk_update(products, ['average_cost', 'updated_at'], batch_size=1000)
+        return len(movements) + len(archived)
+
+    def cost_segment(self, signed, recorded, is_adjustment, purchase_price):
+        """
+        Calcule les coûts d'un produit sur tout son historique.
+        Retourne (coûts unitaires, coûts totaux, restant par couche entrante, coût moyen final).
+        """
+        if (np.cumsum(signed) < 0).any():
+            return self.cost_sequential(signed, recorded, is_adjustment, purchase_price)
+
+        inbound = signed > 0
+        in_qty = np.where(inbound, signed, 0)
+        out_qty = np.where(signed < 0, -signed, 0)
+        on_hand_before = np.cumsum(signed) - signed
+
+        # Coût moyen pondéré : récurrence sur les seules entrées, qui complète aussi
+        # le coût des ajustements positifs non valorisés (au coût moyen du moment).
+        costs = recorded.copy()
+        average_after = np.full(len(signed), np.nan)
+        average = 0.0
+        for i in np.flatnonzero(inbound):
+            if np.isnan(costs[i]):
+                costs[i] = average if is_adjustment[i] and average else purchase_price
+            on_hand = max(on_hand_before[i], 0)
+            average = (on_hand * average + in_qty[i] * costs[i]) / (on_hand + in_qty[i])
+            average_after[i] = average
+        last_inbound = np.maximum.accumulate(np.where(inbound, np.arange(len(signed)), -1))
+        average_at = np.where(last_inbound >= 0, average_after[np.maximum(last_inbound, 0)], purchase_price)
+        average_at = np.where(average_at > 0, average_at, purchase_price)
+
+        # FIFO : la valeur des x premières unités entrées est une interpolation linéaire
+        # des cumuls (quantité, valeur) des couches ; une sortie coûte la différence
+        # entre les cumuls de consommation avant et après elle. Le stock ne passant
+        # jamais sous zéro ici, une sortie ne consomme que des entrées antérieures.
+        layer_qty = in_qty[inbound]
+        cum_qty = np.r_[0, np.cumsum(layer_qty)]
+        cum_value = np.r_[0.0, np.cumsum(layer_qty * costs[inbound])]
+        fallback = costs[inbound][-1] if len(layer_qty) else purchase_price
+
+        def consumed_value(units):
+            return np.interp(units, cum_qty, cum_value) + np.maximum(units - cum_qty[-1], 0) * fallback
+
+        cum_out = np.cumsum(out_qty)
+        fifo_cost = consumed_value(cum_out) - consumed_value(cum_out - out_qty)
+        remaining = np.clip(cum_qty[1:] - cum_out[-1], 0, layer_qty)
+
+        exit_cost = fifo_cost if self.method == 'FIFO' else out_qty * average_at
+        total_costs = np.where(inbound, in_qty * np.nan_to_num(costs), exit_cost)
+        moved = np.maximum(in_qty + out_qty, 1)
+        unit_costs = np.where(inbound, np.nan_to_num(costs), exit_cost / moved)
+        unchanged = signed == 0
+        return np.where(unchanged, np.nan, unit_costs), np.where(unchanged, np.nan, total_costs), remaining, average
+
+    def cost_sequential(self, signed, recorded, is_adjustment, purchase_price):
+        """
+        Rejeu mouvement par mouvement de CostLayer.value_movement, pour les produits
+        passés en stock négatif : les unités sorties sans couche sont valorisées au
+        coût moyen du moment (ou au prix d'achat), sans consommer les entrées
+        ultérieures. Même retour que cost_segment.
+        """
+        unit_costs = np.full(len(signed), np.nan)
+        total_costs = np.full(len(signed), np.nan)
+        layers = []  # [restant, coût unitaire] par entrée, dans l'ordre
+        open_from = 0
+        average = 0.0
+        on_hand = 0
+        for i, delta in enumerate(signed.tolist()):
+            if delta > 0:
+                cost = recorded[i]
+                if np.isnan(cost):
+                    cost = average if is_adjustment[i] and average else purchase_price
+                unit_costs[i], total_costs[i] = cost, delta * cost
+                stocked = max(on_hand, 0)
+                average = (stocked * average + delta * cost) / (stocked + delta)
+                layers.append([delta, cost])
+            elif delta < 0:
+                wanted = -delta
+                fifo_cost = 0.0
+                while wanted and open_from < len(layers):
+                    layer = layers[open_from]
+                    taken = min(layer[0], wanted)
+                    layer[0] -= taken
+                    fifo_cost += taken * layer[1]
+                    wanted -= taken
+                    if not layer[0]:
+                        open_from += 1
+                fallback = average or purchase_price
+                fifo_cost += wanted * fallback
+                total_costs[i] = fifo_cost if self.method == 'FIFO' else -delta * fallback
+                unit_costs[i] = total_costs[i] / -delta
+            on_hand += delta
+        remaining = np.array([layer[0] for layer in layers], dtype=np.int64)
+        return unit_costs, total_costs, remaining, average
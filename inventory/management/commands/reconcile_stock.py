@@ -0,0 +1,118 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+from core.cache import bump_version
+from core.metrics import count_movements
+from inventory.models import Location, Product, StockBalance, StockMovement
+from inventory.snapshots import stock_as_of
+
+
+def ledger_balances(product_ids):
+    """Solde de chaque produit selon le registre : dernier instantané (report de l'archive) plus mouvements depuis"""
+    return stock_as_of(timezone.localdate(), product_ids)
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares Product.quantity with the balance of the StockMovement ledger (including archived movements '
+        'through their carry-forward snapshot) and optionally repairs drift, '
+        'either with compensating ADJUSTMENT movements or by resetting quantities to the ledger balance. '
+        'Per-location balances that no longer add up to Product.quantity are reported too, '
+        'and repaired on the default location'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Repair drift (default is to report only)')
+        parser.add_argument(
+            '--trust', choices=['quantity', 'ledger'], default='quantity',
+            help='Source of truth: keep product quantities and write ADJUSTMENT movements (quantity), '
+                 'or reset quantities to the ledger balance (ledger)',
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Number of products checked per query')
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        drifted = []
+        unbalanced = 0
+        self.location = Location.default()
+
+        for start in range(0, len(product_ids), chunk_size):
+            chunk = product_ids[start:start + chunk_size]
+            with transaction.atomic():
+                fixed = self.reconcile_chunk(chunk, options)
+                unbalanced += self.reconcile_balances(chunk, options)
+            drifted.extend(fixed)
+
+        if unbalanced:
+            state = 'repaired' if options['repair'] else 'report only'
+            self.stdout.write(self.style.WARNING(f'{unbalanced} product(s) with location balances not matching their quantity ({state})'))
+            if options['repair'] and not drifted:
+                bump_version('inventory')
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'No ledger drift found on {len(product_ids)} product(s)'))
+            return
+        if not options['repair']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} product(s) drifted from the ledger (report only)'))
+            return
+
+        # Les écritures en masse contournent Product.save() / StockMovement.save() :
+        # on resynchronise les agrégats dérivés.
+        if options['trust'] == 'quantity':
+            call_command('recompute_costs', products=drifted, stdout=self.stdout)
+        call_command('reconcile_valuation', stdout=self.stdout)
+        bump_version('inventory')
+        self.stdout.write(self.style.SUCCESS(f'Repaired {len(drifted)} product(s) (trusting {options["trust"]})'))
+
+    def reconcile_chunk(self, product_ids, options):
+        balances = ledger_balances(product_ids)
+        products = Product.objects.filter(pk__in=product_ids).only('pk', 'name', 'quantity').order_by('pk')
+
+        drifted = []
+        for product in products:
+            balance = balances.get(product.pk, 0)
+            if product.quantity == balance:
+                continue
+            self.stdout.write(f'{product.name} (#{product.pk}): stored {product.quantity}, ledger {balance}, drift {product.quantity - balance:+d}')
+            drifted.append((product, balance))
+
+        if options['repair'] and drifted:
+            if options['trust'] == 'quantity':
+                count_movements(StockMovement.objects.bulk_create([
+                    StockMovement(
+                        product=product,
+                        movement_type=StockMovement.MovementType.ADJUSTMENT,
+                        quantity=product.quantity - balance,
+                        location=self.location,
+                        reason="Régularisation écart stock / mouvements",
+                    )
+                    for product, balance in drifted
+                ], batch_size=1000))
+            else:
+                # bulk_update ne passe pas par save() : updated_at est tenu ici (jetons de version)
+                now = timezone.now()
+                for product, balance in drifted:
+                    product.quantity = balance
+                    product.updated_at = now
+                Product.objects.bulk_update([product for product, _ in drifted], ['quantity', 'updated_at'], batch_size=1000)
+
+        return [product.pk for product, _ in drifted]
+
+    def reconcile_balances(self, product_ids, options):
+        """Compare la somme des soldes par emplacement à Product.quantity ; l'écart est reporté sur l'emplacement par défaut"""
+        totals = dict(
+            StockBalance.objects.filter(product_id__in=product_ids)
+            .values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total').order_by()
+        )
+        gaps = {}
+        for pk, name, quantity in Product.objects.filter(pk__in=product_ids).values_list('pk', 'name', 'quantity').order_by('pk'):
+            gap = quantity - totals.get(pk, 0)
+            if gap:
+                self.stdout.write(f'{name} (#{pk}): stored {quantity}, location balances {totals.get(pk, 0)}, drift {gap:+d}')
+                gaps[pk] = gap
+        if options['repair'] and gaps:
+            StockBalance.adjust_many(self.location.pk, gaps)
+            Product.objects.filter(pk__in=gaps).update(updated_at=timezone.now())
+        return len(gaps)
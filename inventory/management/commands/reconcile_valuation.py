@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.models import StockValuation
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored stock valuation from products and repairs any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without repairing it')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = StockValuation.expected()
+            stored = {v.category_id: v for v in StockValuation.objects.select_for_update()}
+
+            to_update, to_create = [], []
+            for category_id in expected.keys() | stored.keys():
+                qty, purchase, selling = expected.get(category_id, (0, 0, 0))
+                valuation = stored.get(category_id)
+                if valuation is None:
+                    valuation = StockValuation(category_id=category_id)
+                    to_create.append(valuation)
+                elif (valuation.quantity, valuation.purchase_value, valuation.selling_value) == (qty, Decimal(purchase), Decimal(selling)):
+                    continue
+                else:
+                    to_update.append(valuation)
+
+                self.stdout.write(
+                    f'{valuation}: quantity {valuation.quantity} -> {qty}, '
+                    f'purchase {valuation.purchase_value} -> {purchase}, selling {valuation.selling_value} -> {selling}'
+                )
+                valuation.quantity, valuation.purchase_value, valuation.selling_value = qty, purchase, selling
+
+            if not (to_update or to_create):
+                self.stdout.write(self.style.SUCCESS('Stock valuation is consistent'))
+                return
+            if options['dry_run']:
+                self.stdout.write(self.style.WARNING(f'{len(to_update) + len(to_create)} valuation row(s) drifted (dry run)'))
+                return
+
+            StockValuation.objects.bulk_create(to_create)
+            StockValuation.objects.bulk_update(to_update, ['quantity', 'purchase_value', 'selling_value'])
+            self.stdout.write(self.style.SUCCESS(f'Repaired {len(to_update) + len(to_create)} valuation row(s)'))
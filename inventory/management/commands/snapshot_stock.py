@@ -0,0 +1,45 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from inventory.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        'Stores per-product stock balances at a daily or monthly close. '
+        'Meant to run from cron shortly after midnight; defaults to the last completed period.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Close date (YYYY-MM-DD) to snapshot instead of the last completed period')
+        parser.add_argument(
+            '--interval', choices=['daily', 'monthly'], default=getattr(settings, 'STOCK_SNAPSHOT_INTERVAL', 'daily'),
+            help='daily: close of yesterday; monthly: close of the last day of the previous month',
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = parse_date(options['date'])
+            except ValueError:
+                # Format valide mais date inexistante (2024-13-45)
+                day = None
+            if day is None:
+                raise CommandError(f"Invalid date: {options['date']}")
+        else:
+            today = timezone.localdate()
+            if options['interval'] == 'monthly':
+                day = today.replace(day=1) - datetime.timedelta(days=1)
+            else:
+                day = today - datetime.timedelta(days=1)
+
+        if day >= timezone.localdate():
+            raise CommandError('Only closed days can be snapshotted (the date must be in the past)')
+
+        with transaction.atomic():
+            count = take_snapshot(day)
+        self.stdout.write(self.style.SUCCESS(f'Snapshot of {day:%Y-%m-%d}: {count} product balance(s) stored'))
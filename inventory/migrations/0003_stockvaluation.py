@@ -0,0 +1,54 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def populate_valuation(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    StockValuation = apps.get_model('inventory', 'StockValuation')
+    rows = Product.objects.values('category_id').annotate(
+        qty=Sum('quantity'),
+        purchase=Sum(F('quantity') * F('purchase_price')),
+        selling=Sum(F('quantity') * F('selling_price')),
+    ).order_by()
+    total = StockValuation(category_id=None)
+    valuations = [total]
+    for row in rows:
+        valuations.append(StockValuation(
+            category_id=row['category_id'],
+            quantity=row['qty'] or 0,
+            purchase_value=row['purchase'] or 0,
+            selling_value=row['selling'] or 0,
+        ))
+        total.quantity += row['qty'] or 0
+        total.purchase_value += row['purchase'] or 0
+        total.selling_value += row['selling'] or 0
+    StockValuation.objects.bulk_create(valuations)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockValuation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.BigIntegerField(default=0, verbose_name='Quantité en stock')),
+                ('purchase_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valeur (achat)')),
+                ('selling_value', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Valeur (vente)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='valuation', to='inventory.category', verbose_name='Catégorie')),
+            ],
+            options={
+                'verbose_name': 'Valorisation du stock',
+                'verbose_name_plural': 'Valorisations du stock',
+            },
+        ),
+        migrations.RunPython(populate_valuation, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stockvaluation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='average_cost',
+            field=models.DecimalField(decimal_places=4, default=0, editable=False, max_digits=12, verbose_name='Coût moyen pondéré'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='total_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=14, null=True, verbose_name='Coût total'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, help_text="Pour une entrée, laisser vide pour utiliser le prix d'achat du produit.", max_digits=12, null=True, verbose_name='Coût unitaire'),
+        ),
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(verbose_name='Date')),
+                ('unit_cost', models.DecimalField(decimal_places=4, max_digits=12, verbose_name='Coût unitaire')),
+                ('quantity', models.IntegerField(verbose_name='Quantité entrée')),
+                ('remaining', models.IntegerField(verbose_name='Quantité restante')),
+                ('movement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layer', to='inventory.stockmovement', verbose_name="Mouvement d'entrée")),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='inventory.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Couche de coût',
+                'verbose_name_plural': 'Couches de coût',
+                'ordering': ['date', 'id'],
+                'indexes': [models.Index(condition=models.Q(('remaining__gt', 0)), fields=['product', 'date', 'id'], name='costlayer_open_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_snapshots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='costlayer',
+            name='movement',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cost_layer', to='inventory.stockmovement', verbose_name="Mouvement d'entrée"),
+        ),
+        migrations.CreateModel(
+            name='ArchivedStockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name="Identifiant d'origine")),
+                ('movement_type', models.CharField(choices=[('ENTRY', 'Entrée'), ('EXIT', 'Sortie'), ('ADJUSTMENT', 'Ajustement')], max_length=20, verbose_name='Type de mouvement')),
+                ('quantity', models.IntegerField(verbose_name='Quantité')),
+                ('reason', models.CharField(blank=True, max_length=255, verbose_name='Motif')),
+                ('date', models.DateTimeField(verbose_name='Date')),
+                ('unit_cost', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True, verbose_name='Coût unitaire')),
+                ('total_cost', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='Coût total')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_movements', to='inventory.product', verbose_name='Produit')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Mouvement archivé',
+                'verbose_name_plural': 'Mouvements archivés',
+                'indexes': [models.Index(fields=['date'], name='archivedmovement_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_movement_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('RECEIVING', 'Réception'), ('COUNT', 'Inventaire physique')], max_length=20, verbose_name='Type')),
+                ('status', models.CharField(choices=[('DRAFT', 'Brouillon'), ('COMMITTED', 'Validée')], default='DRAFT', max_length=20, verbose_name='Statut')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Référence')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('committed_at', models.DateTimeField(blank=True, null=True, verbose_name='Validée le')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Créée par')),
+            ],
+            options={
+                'verbose_name': 'Session de stock',
+                'verbose_name_plural': 'Sessions de stock',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSessionLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='Quantité reçue / comptée')),
+                ('unit_cost', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True, verbose_name='Coût unitaire')),
+                ('expected', models.IntegerField(blank=True, null=True, verbose_name='Stock avant validation')),
+                ('difference', models.IntegerField(blank=True, null=True, verbose_name='Écart')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.product', verbose_name='Produit')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.stocksession', verbose_name='Session')),
+            ],
+            options={
+                'verbose_name': 'Ligne de session de stock',
+                'verbose_name_plural': 'Lignes de session de stock',
+                'constraints': [models.UniqueConstraint(fields=('session', 'product'), name='unique_product_per_stock_session')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplenishmentForecast',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='inventory.product', verbose_name='Produit')),
+                ('daily_demand', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='Demande moyenne / jour')),
+                ('demand_deviation', models.DecimalField(decimal_places=3, max_digits=12, verbose_name='Écart-type journalier')),
+                ('days_of_cover', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True, verbose_name='Jours de couverture')),
+                ('reorder_point', models.IntegerField(verbose_name='Point de commande')),
+                ('reorder_quantity', models.IntegerField(verbose_name='Quantité à commander')),
+                ('computed_at', models.DateTimeField(verbose_name='Calculée le')),
+            ],
+            options={
+                'verbose_name': 'Prévision de réapprovisionnement',
+                'verbose_name_plural': 'Prévisions de réapprovisionnement',
+            },
+        ),
+    ]
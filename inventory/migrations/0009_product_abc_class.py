@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_replenishment_forecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='abc_class',
+            field=models.CharField(blank=True, choices=[('A', 'Classe A'), ('B', 'Classe B'), ('C', 'Classe C')], db_index=True, editable=False, max_length=1, verbose_name='Classe ABC'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_product_abc_class'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64, verbose_name='Jeton de vente')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Quantité réservée')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('expires_at', models.DateTimeField(verbose_name='Expire le')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='inventory.product', verbose_name='Produit')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Vendeur')),
+            ],
+            options={
+                'verbose_name': 'Réservation de stock',
+                'verbose_name_plural': 'Réservations de stock',
+                'indexes': [models.Index(fields=['product', 'expires_at'], name='reservation_product_expiry')],
+                'constraints': [models.UniqueConstraint(fields=('token', 'product'), name='unique_reservation_per_sale')],
+            },
+        ),
+    ]
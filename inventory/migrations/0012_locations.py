@@ -0,0 +1,111 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_locations(apps, schema_editor):
+    """Rattache le stock et l'historique existants à un emplacement par défaut"""
+    Location = apps.get_model('inventory', 'Location')
+    Product = apps.get_model('inventory', 'Product')
+    StockBalance = apps.get_model('inventory', 'StockBalance')
+    location = Location.objects.create(name="Magasin principal", is_default=True)
+    for model_name in ('StockMovement', 'ArchivedStockMovement', 'StockSession'):
+        apps.get_model('inventory', model_name).objects.update(location=location)
+    StockBalance.objects.bulk_create([
+        StockBalance(product_id=product_id, location=location, quantity=quantity)
+        for product_id, quantity in Product.objects.exclude(quantity=0).values_list('pk', 'quantity').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_product_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(default=0, verbose_name='Quantité en stock')),
+            ],
+            options={
+                'verbose_name': 'Stock par emplacement',
+                'verbose_name_plural': 'Stocks par emplacement',
+            },
+        ),
+        migrations.AlterField(
+            model_name='archivedstockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('ENTRY', 'Entrée'), ('EXIT', 'Sortie'), ('ADJUSTMENT', 'Ajustement'), ('TRANSFER', 'Transfert')], max_length=20, verbose_name='Type de mouvement'),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='movement_type',
+            field=models.CharField(choices=[('ENTRY', 'Entrée'), ('EXIT', 'Sortie'), ('ADJUSTMENT', 'Ajustement'), ('TRANSFER', 'Transfert')], max_length=20, verbose_name='Type de mouvement'),
+        ),
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Nom')),
+                ('address', models.CharField(blank=True, max_length=255, verbose_name='Adresse')),
+                ('is_default', models.BooleanField(default=False, help_text='Reçoit les mouvements sans emplacement précisé (création de produit, import, régularisations).', verbose_name='Emplacement par défaut')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Actif')),
+            ],
+            options={
+                'verbose_name': 'Emplacement',
+                'verbose_name_plural': 'Emplacements',
+                'ordering': ['name'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('is_default', True)), fields=('is_default',), name='unique_default_location')],
+            },
+        ),
+        migrations.AddField(
+            model_name='archivedstockmovement',
+            name='destination',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inventory.location', verbose_name="Emplacement d'arrivée"),
+        ),
+        migrations.AddField(
+            model_name='archivedstockmovement',
+            name='location',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inventory.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='destination',
+            field=models.ForeignKey(blank=True, help_text='Transferts uniquement.', limit_choices_to={'is_active': True}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='incoming_transfers', to='inventory.location', verbose_name="Emplacement d'arrivée"),
+        ),
+        migrations.AddField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(blank=True, help_text="Emplacement par défaut si vide ; emplacement de départ d'un transfert.", limit_choices_to={'is_active': True}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='inventory.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddField(
+            model_name='stocksession',
+            name='location',
+            field=models.ForeignKey(limit_choices_to={'is_active': True}, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inventory.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['location', 'date'], name='stockmovement_location_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockbalance',
+            name='location',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='balances', to='inventory.location', verbose_name='Emplacement'),
+        ),
+        migrations.AddField(
+            model_name='stockbalance',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='inventory.product', verbose_name='Produit'),
+        ),
+        migrations.AddConstraint(
+            model_name='stockbalance',
+            constraint=models.UniqueConstraint(fields=('location', 'product'), name='unique_balance_per_location'),
+        ),
+        migrations.RunPython(populate_locations, migrations.RunPython.noop),
+    ]
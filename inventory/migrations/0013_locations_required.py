@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_locations'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='location',
+            field=models.ForeignKey(blank=True, help_text="Emplacement par défaut si vide ; emplacement de départ d'un transfert.", limit_choices_to={'is_active': True}, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='inventory.location', verbose_name='Emplacement'),
+        ),
+        migrations.AlterField(
+            model_name='stocksession',
+            name='location',
+            field=models.ForeignKey(limit_choices_to={'is_active': True}, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='inventory.location', verbose_name='Emplacement'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+
+def open_cost_layers(apps, schema_editor):
+    """
+    Stock antérieur au suivi des coûts (0004_cost_layers) : coût moyen initialisé au
+    prix d'achat et une couche d'ouverture sans mouvement, datée de la création du
+    produit (consommée en premier), pour chaque produit en stock sans couche.
+    """
+    Product = apps.get_model('inventory', 'Product')
+    CostLayer = apps.get_model('inventory', 'CostLayer')
+    products = Product.objects.filter(quantity__gt=0, cost_layers__isnull=True)
+    layers = []
+    for product in products.iterator(chunk_size=2000):
+        product.average_cost = product.purchase_price
+        layers.append(CostLayer(
+            product=product,
+            date=product.created_at,
+            unit_cost=product.purchase_price,
+            quantity=product.quantity,
+            remaining=product.quantity,
+        ))
+    Product.objects.bulk_update([layer.product for layer in layers], ['average_cost'], batch_size=1000)
+    CostLayer.objects.bulk_create(layers, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_locations_required'),
+    ]
+
+    operations = [
+        migrations.RunPython(open_cost_layers, migrations.RunPython.noop),
+    ]
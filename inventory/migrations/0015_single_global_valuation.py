@@ -0,0 +1,31 @@
+import django.db.models.functions.comparison
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def merge_global_rows(apps, schema_editor):
+    """Remplace les lignes globales en double par une seule, somme des lignes par catégorie"""
+    StockValuation = apps.get_model('inventory', 'StockValuation')
+    global_rows = StockValuation.objects.filter(category=None)
+    if global_rows.count() < 2:
+        return
+    totals = StockValuation.objects.exclude(category=None).aggregate(
+        quantity=Sum('quantity'), purchase_value=Sum('purchase_value'), selling_value=Sum('selling_value'),
+    )
+    global_rows.delete()
+    StockValuation.objects.create(category=None, **{field: value or 0 for field, value in totals.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_opening_cost_layers'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_global_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='stockvaluation',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('category', 0), condition=models.Q(('category__isnull', True)), name='unique_global_valuation'),
+        ),
+    ]
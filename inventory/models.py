@@ -1,8 +1,50 @@
-from django.db import models
+import itertools
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, OperationalError, models, transaction
+from django.db.models import F, Max, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.text import slugify
 
+from core.conditional import table_state
+from core.events import publish_many
+from core.metrics import count_movements
+
+CENTS = Decimal('0.01')
+UNIT_COST_PRECISION = Decimal('0.0001')
+DEFAULT_LOCATION_NAME = "Magasin principal"
+STOCK_BUSY_MESSAGE = "Stock en cours de modification par une autre vente, réessayez."
+
+
+def batched(iterable, size):
+    """Lots de `size` éléments (tuples) d'un itérable, comme itertools.batched de Python 3.12"""
+    iterator = iter(iterable)
+    while chunk := tuple(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def update_by_value(queryset, field, values, batch_size=5000):
+    """
+    Enregistre {pk: valeur} pour un champ avec une requête UPDATE par valeur distincte
+    (les valeurs se répètent souvent, contrairement aux CASE de bulk_update).
+    Les champs auto_now sont mis à jour comme par save() : les jetons de version
+    (voir core.conditional) voient la modification.
+    """
+    now = timezone.now()
+    touched = {f.name: now for f in queryset.model._meta.concrete_fields if getattr(f, 'auto_now', False)}
+    pks_by_value = {}
+    for pk, value in values.items():
+        pks_by_value.setdefault(value, []).append(pk)
+    for value, pks in pks_by_value.items():
+        for start in range(0, len(pks), batch_size):
+            queryset.filter(pk__in=pks[start:start + batch_size]).update(**{field: value, **touched})
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name="Nom")
     slug = models.SlugField(max_length=100, unique=True)
@@ -35,7 +77,52 @@ class Category(models.Model):
             
         super().save(*args, **kwargs)
 
+class Location(models.Model):
+    """
+    Emplacement de stock (boutique, réserve...). Le stock de chaque produit y est
+    tenu par StockBalance ; Product.quantity reste le total tous emplacements.
+    """
+    name = models.CharField(max_length=100, unique=True, verbose_name="Nom")
+    address = models.CharField(max_length=255, blank=True, verbose_name="Adresse")
+    is_default = models.BooleanField(default=False, verbose_name="Emplacement par défaut",
+                                     help_text="Reçoit les mouvements sans emplacement précisé (création de produit, import, régularisations).")
+    is_active = models.BooleanField(default=True, verbose_name="Actif")
+
+    class Meta:
+        verbose_name = "Emplacement"
+        verbose_name_plural = "Emplacements"
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['is_default'], condition=Q(is_default=True), name='unique_default_location'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.is_default:
+                Location.objects.filter(is_default=True).exclude(pk=self.pk).update(is_default=False)
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def default(cls):
+        return cls.objects.get_or_create(is_default=True, defaults={'name': DEFAULT_LOCATION_NAME})[0]
+
+    @classmethod
+    def selected(cls, value):
+        """Emplacement actif désigné par un paramètre de requête (identifiant), None sinon"""
+        if not str(value or '').isdigit():
+            return None
+        return cls.objects.filter(pk=value, is_active=True).first()
+
+
 class Product(models.Model):
+    class AbcClass(models.TextChoices):
+        A = "A", "Classe A"
+        B = "B", "Classe B"
+        C = "C", "Classe C"
+
     category = models.ForeignKey(Category, on_delete=models.RESTRICT, related_name='products', verbose_name="Catégorie")
     name = models.CharField(max_length=200, verbose_name="Nom")
     description = models.TextField(blank=True, null=True, verbose_name="Description")
@@ -43,17 +130,98 @@ class Product(models.Model):
     selling_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prix de vente")
     quantity = models.IntegerField(default=0, verbose_name="Quantité en stock")
     alert_threshold = models.IntegerField(default=10, verbose_name="Seuil d'alerte")
+    average_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0, editable=False, verbose_name="Coût moyen pondéré")
     image = models.ImageField(upload_to='products/', blank=True, null=True, verbose_name="Image")
     barcode = models.CharField(max_length=100, unique=True, blank=True, null=True, verbose_name="Code-barre")
+    # Recalculée en masse par la commande classify_abc (part du chiffre d'affaires)
+    abc_class = models.CharField(max_length=1, choices=AbcClass.choices, blank=True, db_index=True, editable=False, verbose_name="Classe ABC")
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    # Champs dont dépend la valorisation du stock (voir StockValuation)
+    VALUATION_FIELDS = ('category_id', 'quantity', 'purchase_price', 'selling_price')
 
     class Meta:
         verbose_name = "Produit"
         verbose_name_plural = "Produits"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémorise l'état chargé pour calculer l'écart de valorisation au save()
+        if not instance.get_deferred_fields().intersection(cls.VALUATION_FIELDS):
+            instance._valuation_state = instance.valuation_state()
+        return instance
+
+    def valuation_state(self):
+        return tuple(getattr(self, field) for field in self.VALUATION_FIELDS)
+
+    def save(self, *args, **kwargs):
+        previous = getattr(self, '_valuation_state', None)
+        with transaction.atomic():
+            if previous is None and self.pk:
+                previous = Product.objects.filter(pk=self.pk).values_list(*self.VALUATION_FIELDS).first()
+            super().save(*args, **kwargs)
+            current = self.valuation_state()
+            if previous != current:
+                StockValuation.apply_change(previous, current)
+        self._valuation_state = current
+
+    @property
+    def stock(self):
+        """Stock affiché : celui de l'emplacement filtré (voir with_location_stock), sinon le total"""
+        return getattr(self, 'location_quantity', self.quantity)
+
     def is_low_stock(self):
-        return self.quantity <= self.alert_threshold
+        return self.stock <= self.alert_threshold
+
+    @classmethod
+    def data_version(cls):
+        """Jeton de version du catalogue et du stock : produits, catégories et dernier mouvement"""
+        return (
+            table_state(cls.objects.all(), 'updated_at'),
+            table_state(Category.objects.all()),
+            StockMovement.objects.aggregate(last_id=Max('pk'))['last_id'],
+        )
+
+    def stock_events(self, previous_quantity):
+        """Événements temps réel d'un changement de stock : niveau, et alerte si le seuil est franchi"""
+        data = {
+            'product_id': self.pk,
+            'name': self.name,
+            'quantity': self.quantity,
+            'alert_threshold': self.alert_threshold,
+            'low_stock': self.is_low_stock(),
+        }
+        events = [('stock', data)]
+        if (previous_quantity <= self.alert_threshold) != data['low_stock']:
+            events.append(('low_stock', data))
+        return events
+
+    @classmethod
+    def with_location_stock(cls, location, queryset=None):
+        """Annote `location_quantity` : solde de l'emplacement, 0 sans ligne (index emplacement + produit)"""
+        balance = StockBalance.objects.filter(location=location, product_id=OuterRef('pk')).values('quantity')
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.annotate(location_quantity=Coalesce(Subquery(balance), 0))
+
+    @classmethod
+    def low_stock(cls, location=None, queryset=None):
+        """Produits dont le stock (total, ou de l'emplacement donné) a atteint le seuil d'alerte"""
+        if location is None:
+            queryset = cls.objects.all() if queryset is None else queryset
+            return queryset.filter(quantity__lte=F('alert_threshold'))
+        return cls.with_location_stock(location, queryset).filter(location_quantity__lte=F('alert_threshold'))
+
+    @classmethod
+    def with_available(cls, queryset=None):
+        """Annote `available` : stock moins les réservations actives (index produit + expiration)"""
+        reserved = (
+            StockReservation.active().filter(product_id=OuterRef('pk'))
+            .values('product_id').annotate(total=Sum('quantity')).values('total')
+        )
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.annotate(available=F('quantity') - Coalesce(Subquery(reserved), 0))
 
     def __str__(self):
         return self.name
@@ -63,20 +231,73 @@ class StockMovement(models.Model):
         ENTRY = "ENTRY", "Entrée"
         EXIT = "EXIT", "Sortie"
         ADJUSTMENT = "ADJUSTMENT", "Ajustement"
+        TRANSFER = "TRANSFER", "Transfert"
     
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='movements', verbose_name="Produit")
     movement_type = models.CharField(max_length=20, choices=MovementType.choices, verbose_name="Type de mouvement")
     quantity = models.IntegerField(verbose_name="Quantité")
+    # Renseigné à l'enregistrement (emplacement par défaut si vide)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, blank=True, related_name='movements', limit_choices_to={'is_active': True},
+                                 verbose_name="Emplacement", help_text="Emplacement par défaut si vide ; emplacement de départ d'un transfert.")
+    destination = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, blank=True, related_name='incoming_transfers', limit_choices_to={'is_active': True},
+                                    verbose_name="Emplacement d'arrivée", help_text="Transferts uniquement.")
     reason = models.CharField(max_length=255, blank=True, verbose_name="Motif")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Utilisateur")
     date = models.DateTimeField(auto_now_add=True, verbose_name="Date")
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True, verbose_name="Coût unitaire", help_text="Pour une entrée, laisser vide pour utiliser le prix d'achat du produit.")
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, editable=False, verbose_name="Coût total")
+
+    archived = False
 
     class Meta:
         verbose_name = "Mouvement de stock"
         verbose_name_plural = "Mouvements de stock"
+        indexes = [
+            models.Index(fields=['date'], name='stockmovement_date_idx'),
+            models.Index(fields=['location', 'date'], name='stockmovement_location_idx'),
+        ]
+
+    @property
+    def signed_quantity(self):
+        """Variation du stock total induite par le mouvement (nulle pour un transfert)"""
+        if self.movement_type == self.MovementType.EXIT:
+            return -self.quantity
+        if self.movement_type == self.MovementType.TRANSFER:
+            return 0
+        return self.quantity
+
+    def location_deltas(self):
+        """Variations des soldes par emplacement : [(emplacement, variation)]"""
+        if self.movement_type == self.MovementType.TRANSFER:
+            return [(self.location_id, -self.quantity), (self.destination_id, self.quantity)]
+        return [(self.location_id, self.signed_quantity)]
+
+    def clean(self):
+        if self.movement_type != self.MovementType.TRANSFER:
+            if self.destination_id:
+                raise ValidationError({'destination': "Seuls les transferts ont un emplacement d'arrivée."})
+            return
+        if self.location_id is None:
+            self.location = Location.default()
+        if self.destination_id is None:
+            raise ValidationError({'destination': "Précisez l'emplacement d'arrivée du transfert."})
+        if self.destination_id == self.location_id:
+            raise ValidationError({'destination': "L'emplacement d'arrivée doit différer de l'emplacement de départ."})
+        if self.quantity is None or self.quantity <= 0:
+            raise ValidationError({'quantity': "La quantité transférée doit être positive."})
+        if self.product_id:
+            available = StockBalance.objects.filter(product_id=self.product_id, location_id=self.location_id).values_list('quantity', flat=True).first() or 0
+            if self.quantity > available:
+                raise ValidationError({'quantity': f"Stock insuffisant à {self.location} : {max(available, 0)} disponible(s)."})
 
     def save(self, *args, **kwargs):
-        if not self.pk:  # Only on creation
+        if self.pk:
+            super().save(*args, **kwargs)
+            return
+        with transaction.atomic():  # Only on creation
+            if self.location_id is None:
+                self.location = Location.default()
+            CostLayer.value_movement(self)
             if self.movement_type == self.MovementType.ENTRY:
                 self.product.quantity += self.quantity
             elif self.movement_type == self.MovementType.EXIT:
@@ -92,8 +313,639 @@ class StockMovement(models.Model):
                 # To simplify: Entry/Exit use positive quantity. Adjustment can use positive/negative.
                 self.product.quantity += self.quantity
 
-            self.product.save()
-        super().save(*args, **kwargs)
+            # Un transfert ne change que la répartition entre emplacements
+            if self.movement_type != self.MovementType.TRANSFER:
+                self.product.save()
+            super().save(*args, **kwargs)
+            for location_id, delta in self.location_deltas():
+                StockBalance.adjust(self.product_id, location_id, delta)
+            CostLayer.open_for(self)
 
     def __str__(self):
         return f"{self.get_movement_type_display()} {self.quantity} - {self.product.name}"
+
+
+class ArchivedStockMovement(models.Model):
+    """
+    Mouvement de stock archivé (partie froide du registre). Les soldes à la date
+    d'archivage sont reportés dans un StockSnapshot ; les vues et rapports ne
+    consultent cette table que si la période demandée la couvre.
+    """
+    original_id = models.BigIntegerField(unique=True, verbose_name="Identifiant d'origine")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='archived_movements', verbose_name="Produit")
+    movement_type = models.CharField(max_length=20, choices=StockMovement.MovementType.choices, verbose_name="Type de mouvement")
+    quantity = models.IntegerField(verbose_name="Quantité")
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, related_name='+', verbose_name="Emplacement")
+    destination = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, related_name='+', verbose_name="Emplacement d'arrivée")
+    reason = models.CharField(max_length=255, blank=True, verbose_name="Motif")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name="Utilisateur")
+    date = models.DateTimeField(verbose_name="Date")
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True, verbose_name="Coût unitaire")
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True, verbose_name="Coût total")
+
+    archived = True
+
+    class Meta:
+        verbose_name = "Mouvement archivé"
+        verbose_name_plural = "Mouvements archivés"
+        indexes = [
+            models.Index(fields=['date'], name='archivedmovement_date_idx'),
+        ]
+
+    def get_movement_type_display(self):
+        return StockMovement.MovementType(self.movement_type).label
+
+    @property
+    def signed_quantity(self):
+        if self.movement_type == StockMovement.MovementType.EXIT:
+            return -self.quantity
+        if self.movement_type == StockMovement.MovementType.TRANSFER:
+            return 0
+        return self.quantity
+
+    def __str__(self):
+        return f"{self.get_movement_type_display()} {self.quantity} - {self.product.name} (archivé)"
+
+
+class StockSnapshot(models.Model):
+    """
+    Solde d'un produit à la clôture d'une journée. Un instantané couvre tous les
+    produits : un produit absent d'un instantané avait un stock nul à cette date.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='snapshots', verbose_name="Produit")
+    date = models.DateField(verbose_name="Date de clôture")
+    quantity = models.IntegerField(verbose_name="Quantité en stock")
+
+    class Meta:
+        verbose_name = "Instantané de stock"
+        verbose_name_plural = "Instantanés de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_snapshot_per_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} au {self.date:%d/%m/%Y} : {self.quantity}"
+
+
+class StockBalance(models.Model):
+    """
+    Stock d'un produit dans un emplacement, tenu par des mises à jour atomiques à
+    chaque mouvement. La somme des emplacements d'un produit vaut Product.quantity.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='balances', verbose_name="Produit")
+    # Index couvert par la contrainte d'unicité (emplacement, produit)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, db_index=False, related_name='balances', verbose_name="Emplacement")
+    quantity = models.IntegerField(default=0, verbose_name="Quantité en stock")
+
+    class Meta:
+        verbose_name = "Stock par emplacement"
+        verbose_name_plural = "Stocks par emplacement"
+        constraints = [
+            models.UniqueConstraint(fields=['location', 'product'], name='unique_balance_per_location'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} à {self.location} : {self.quantity}"
+
+    @classmethod
+    def adjust(cls, product_id, location_id, quantity):
+        """Ajoute `quantity` au solde (UPDATE ... SET quantity = quantity + n), ligne créée au premier mouvement"""
+        if not quantity:
+            return
+        balance = cls.objects.filter(product_id=product_id, location_id=location_id)
+        if balance.update(quantity=F('quantity') + quantity):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(product_id=product_id, location_id=location_id, quantity=quantity)
+        except IntegrityError:
+            # Ligne créée entre-temps par un mouvement concurrent
+            balance.update(quantity=F('quantity') + quantity)
+
+    @classmethod
+    def adjust_many(cls, location_id, deltas):
+        """
+        Équivalent en masse de adjust pour un emplacement, {product_id: variation} :
+        une requête UPDATE par variation distincte, puis insertion des lignes manquantes.
+        """
+        deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+        balances = cls.objects.filter(location_id=location_id)
+        existing = set(balances.filter(product_id__in=list(deltas)).values_list('product_id', flat=True))
+        products_by_delta = {}
+        for product_id in existing:
+            products_by_delta.setdefault(deltas[product_id], []).append(product_id)
+        for delta, product_ids in products_by_delta.items():
+            balances.filter(product_id__in=product_ids).update(quantity=F('quantity') + delta)
+        cls.objects.bulk_create([
+            cls(product_id=product_id, location_id=location_id, quantity=delta)
+            for product_id, delta in deltas.items()
+            if product_id not in existing
+        ], batch_size=1000)
+
+
+class StockValuation(models.Model):
+    """
+    Valorisation courante du stock, tenue à jour de façon incrémentale.
+    Une ligne par catégorie, plus une ligne globale (category=None).
+    """
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='valuation', verbose_name="Catégorie")
+    quantity = models.BigIntegerField(default=0, verbose_name="Quantité en stock")
+    purchase_value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Valeur (achat)")
+    selling_value = models.DecimalField(max_digits=16, decimal_places=2, default=0, verbose_name="Valeur (vente)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Valorisation du stock"
+        verbose_name_plural = "Valorisations du stock"
+        constraints = [
+            # Les NULL ne se heurtent pas à l'unicité de `category` : une seule ligne globale
+            models.UniqueConstraint(Coalesce('category', 0), condition=Q(category__isnull=True), name='unique_global_valuation'),
+        ]
+
+    def __str__(self):
+        return f"Valorisation {self.category or 'globale'}"
+
+    @classmethod
+    def total(cls):
+        obj, created = cls.objects.get_or_create(category=None)
+        return obj
+
+    @classmethod
+    def expected(cls):
+        """
+        Recalcule la valorisation depuis la table Product en une requête groupée.
+        Retourne {category_id: (quantité, valeur achat, valeur vente)}, clé None pour le total.
+        """
+        rows = Product.objects.values('category_id').annotate(
+            qty=models.Sum('quantity'),
+            purchase=models.Sum(F('quantity') * F('purchase_price')),
+            selling=models.Sum(F('quantity') * F('selling_price')),
+        ).order_by()
+        result = {None: (0, 0, 0)}
+        for row in rows:
+            values = (row['qty'] or 0, row['purchase'] or 0, row['selling'] or 0)
+            result[row['category_id']] = values
+            result[None] = tuple(total + value for total, value in zip(result[None], values))
+        return result
+
+    @classmethod
+    def adjust(cls, category_id, quantity, purchase_value, selling_value):
+        """Ajoute un écart à la ligne de la catégorie et à la ligne globale"""
+        if not (quantity or purchase_value or selling_value):
+            return
+        for cat_id in (category_id, None):
+            row = cls.objects.filter(category_id=cat_id)
+            changes = {
+                'quantity': F('quantity') + quantity,
+                'purchase_value': F('purchase_value') + purchase_value,
+                'selling_value': F('selling_value') + selling_value,
+            }
+            if row.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        category_id=cat_id,
+                        quantity=quantity,
+                        purchase_value=purchase_value,
+                        selling_value=selling_value,
+                    )
+            except IntegrityError:
+                # Ligne créée entre-temps par une écriture concurrente
+                row.update(**changes)
+
+    @classmethod
+    def apply_change(cls, previous, current):
+        """
+        Répercute le passage d'un produit de l'état `previous` à l'état `current`
+        (tuples Product.VALUATION_FIELDS, None pour un produit inexistant).
+        """
+        cls.apply_changes([(previous, current)])
+
+    @classmethod
+    def apply_changes(cls, changes):
+        """Répercute une série de couples (previous, current), cumulés par catégorie (écritures en masse)"""
+        deltas = {}
+        for previous, current in changes:
+            for state, sign in ((previous, -1), (current, 1)):
+                if state is None:
+                    continue
+                category_id, qty, purchase_price, selling_price = state
+                delta = deltas.setdefault(category_id, [0, 0, 0])
+                delta[0] += sign * qty
+                delta[1] += sign * qty * purchase_price
+                delta[2] += sign * qty * selling_price
+        for category_id, (qty, purchase_value, selling_value) in deltas.items():
+            cls.adjust(category_id, qty, purchase_value, selling_value)
+
+
+class CostLayer(models.Model):
+    """
+    Couche de coût ouverte par chaque mouvement entrant, consommée par les sorties
+    dans l'ordre d'arrivée (FIFO). Le coût moyen pondéré est tenu sur Product.average_cost.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='cost_layers', verbose_name="Produit")
+    # Conservée (mouvement à NULL) lorsque le mouvement d'entrée est archivé
+    movement = models.OneToOneField(StockMovement, on_delete=models.SET_NULL, null=True, blank=True, related_name='cost_layer', verbose_name="Mouvement d'entrée")
+    date = models.DateTimeField(verbose_name="Date")
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, verbose_name="Coût unitaire")
+    quantity = models.IntegerField(verbose_name="Quantité entrée")
+    remaining = models.IntegerField(verbose_name="Quantité restante")
+
+    class Meta:
+        verbose_name = "Couche de coût"
+        verbose_name_plural = "Couches de coût"
+        ordering = ['date', 'id']
+        indexes = [
+            models.Index(fields=['product', 'date', 'id'], condition=models.Q(remaining__gt=0), name='costlayer_open_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.remaining}/{self.quantity} x {self.unit_cost} - {self.product}"
+
+    @staticmethod
+    def method():
+        """Méthode de valorisation des sorties : 'FIFO' ou 'WAVG' (coût moyen pondéré)"""
+        return getattr(settings, 'STOCK_COST_METHOD', 'FIFO')
+
+    @classmethod
+    def stock_value(cls):
+        """Valeur du stock au coût selon la méthode configurée (une requête agrégée)"""
+        if cls.method() == 'FIFO':
+            value = cls.objects.filter(remaining__gt=0).aggregate(total=models.Sum(F('remaining') * F('unit_cost')))['total']
+        else:
+            value = Product.objects.filter(quantity__gt=0).aggregate(total=models.Sum(F('quantity') * F('average_cost')))['total']
+        return value or 0
+
+    @classmethod
+    def value_movement(cls, movement, layers=None):
+        """
+        Renseigne le coût d'un nouveau mouvement (avant son insertion) et met à jour
+        le coût moyen du produit. Les sorties consomment les couches FIFO ouvertes.
+        """
+        product = movement.product
+        delta = movement.signed_quantity
+        if delta > 0:
+            if movement.unit_cost is None:
+                if movement.movement_type == StockMovement.MovementType.ADJUSTMENT and product.average_cost:
+                    movement.unit_cost = product.average_cost
+                else:
+                    movement.unit_cost = product.purchase_price
+            movement.total_cost = (delta * Decimal(movement.unit_cost)).quantize(CENTS)
+            on_hand = max(product.quantity, 0)
+            average_cost = (on_hand * product.average_cost + delta * Decimal(movement.unit_cost)) / (on_hand + delta)
+            product.average_cost = average_cost.quantize(UNIT_COST_PRECISION)
+        elif delta < 0:
+            fifo_cost = cls.consume(product, -delta, layers)
+            average_cost = -delta * (product.average_cost or product.purchase_price)
+            total_cost = fifo_cost if cls.method() == 'FIFO' else average_cost
+            movement.total_cost = total_cost.quantize(CENTS)
+            movement.unit_cost = (total_cost / -delta).quantize(UNIT_COST_PRECISION)
+
+    @classmethod
+    def consume(cls, product, quantity, layers=None):
+        """
+        Consomme `quantity` unités des couches les plus anciennes et retourne leur coût.
+        `layers` : couches ouvertes déjà chargées, enregistrées ensuite par l'appelant.
+        """
+        preloaded = layers is not None
+        if not preloaded:
+            layers = cls.objects.select_for_update().filter(product=product, remaining__gt=0).order_by('date', 'id').iterator(chunk_size=50)
+        cost = Decimal(0)
+        consumed = []
+        for layer in layers:
+            taken = min(layer.remaining, quantity)
+            layer.remaining -= taken
+            cost += taken * layer.unit_cost
+            quantity -= taken
+            consumed.append(layer)
+            if not quantity:
+                break
+        if not preloaded:
+            cls.objects.bulk_update(consumed, ['remaining'])
+        if quantity:
+            # Stock négatif : les unités sans couche sont valorisées au coût moyen
+            cost += quantity * (product.average_cost or product.purchase_price)
+        return cost
+
+    @classmethod
+    def value_movements(cls, movements):
+        """
+        Équivalent en masse de value_movement (un mouvement par produit) : les couches
+        ouvertes des produits en sortie sont chargées en une requête.
+        """
+        outgoing = {movement.product_id for movement in movements if movement.signed_quantity < 0}
+        open_layers = {}
+        for layer in cls.objects.select_for_update().filter(product_id__in=outgoing, remaining__gt=0).order_by('product_id', 'date', 'id'):
+            open_layers.setdefault(layer.product_id, []).append(layer)
+        loaded = {layer.pk: layer.remaining for layers in open_layers.values() for layer in layers}
+        for movement in movements:
+            cls.value_movement(movement, open_layers.get(movement.product_id, []))
+        update_by_value(cls.objects.all(), 'remaining', {
+            layer.pk: layer.remaining
+            for layers in open_layers.values() for layer in layers
+            if layer.remaining != loaded[layer.pk]
+        })
+
+    @classmethod
+    def open_for_many(cls, movements):
+        """Ouvre en une requête les couches de coût de mouvements entrants insérés en masse"""
+        cls.objects.bulk_create([
+            cls(
+                product=movement.product,
+                movement=movement,
+                date=movement.date,
+                unit_cost=movement.unit_cost,
+                quantity=movement.signed_quantity,
+                remaining=movement.signed_quantity,
+            )
+            for movement in movements
+            if movement.signed_quantity > 0
+        ], batch_size=1000)
+
+    @classmethod
+    def open_for(cls, movement):
+        """Ouvre la couche de coût d'un mouvement entrant déjà enregistré"""
+        delta = movement.signed_quantity
+        if delta > 0:
+            cls.objects.create(
+                product=movement.product,
+                movement=movement,
+                date=movement.date,
+                unit_cost=movement.unit_cost,
+                quantity=delta,
+                remaining=delta,
+            )
+
+
+class StockSession(models.Model):
+    """
+    Réception de livraison ou inventaire physique : les lignes sont saisies (scannées)
+    en brouillon, puis validées en une transaction qui écrit tous les mouvements en masse.
+    """
+    class Kind(models.TextChoices):
+        RECEIVING = "RECEIVING", "Réception"
+        COUNT = "COUNT", "Inventaire physique"
+
+    class Status(models.TextChoices):
+        DRAFT = "DRAFT", "Brouillon"
+        COMMITTED = "COMMITTED", "Validée"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices, verbose_name="Type")
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='+', limit_choices_to={'is_active': True}, verbose_name="Emplacement")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.DRAFT, verbose_name="Statut")
+    reference = models.CharField(max_length=100, blank=True, verbose_name="Référence")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name="Créée par")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+    committed_at = models.DateTimeField(null=True, blank=True, verbose_name="Validée le")
+
+    class Meta:
+        verbose_name = "Session de stock"
+        verbose_name_plural = "Sessions de stock"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk}{f' - {self.reference}' if self.reference else ''}"
+
+    @property
+    def is_draft(self):
+        return self.status == self.Status.DRAFT
+
+    def scan(self, product, quantity, unit_cost=None):
+        """Ajoute une quantité scannée à la ligne du produit (créée au premier scan)"""
+        updated = self.lines.filter(product=product).update(quantity=F('quantity') + quantity)
+        if not updated:
+            self.lines.create(product=product, quantity=quantity, unit_cost=unit_cost)
+        elif unit_cost is not None:
+            self.lines.filter(product=product).update(unit_cost=unit_cost)
+
+    def commit(self, user=None):
+        """
+        Valide la session : réception (ENTRY de la quantité reçue) ou inventaire
+        (ADJUSTMENT de l'écart entre quantité comptée et stock de l'emplacement).
+        Mouvements, couches de coût, quantités, soldes et valorisation sont écrits en masse.
+        Retourne le nombre de mouvements créés.
+        """
+        with transaction.atomic():
+            session = StockSession.objects.select_for_update().get(pk=self.pk)
+            if not session.is_draft:
+                raise ValidationError("Cette session est déjà validée.")
+
+            lines = self.lines.all()
+            products = Product.objects.select_for_update().in_bulk(lines.values_list('product_id', flat=True))
+            # Stock de l'emplacement avant validation, relevé sous verrou (une requête)
+            balance = StockBalance.objects.filter(location_id=self.location_id, product_id=OuterRef('product_id')).values('quantity')
+            lines.update(expected=Coalesce(Subquery(balance), 0))
+            reason = str(self)
+
+            movements = []
+            for line in lines:
+                product = products[line.product_id]
+                if self.kind == self.Kind.RECEIVING:
+                    movement_type, delta = StockMovement.MovementType.ENTRY, line.quantity
+                else:
+                    movement_type, delta = StockMovement.MovementType.ADJUSTMENT, line.quantity - line.expected
+                if delta:
+                    movements.append(StockMovement(
+                        product=product,
+                        movement_type=movement_type,
+                        quantity=delta,
+                        unit_cost=line.unit_cost,
+                        location_id=self.location_id,
+                        reason=reason,
+                        user=user,
+                    ))
+
+            # Même enchaînement que StockMovement.save(), en requêtes ensemblistes :
+            # bulk_update (CASE ... WHEN par ligne) est trop lent sur quelques milliers de produits.
+            average_costs = {movement.product_id: movement.product.average_cost for movement in movements}
+            CostLayer.value_movements(movements)
+            changes = []
+            for movement in movements:
+                product = movement.product
+                previous = product.valuation_state()
+                product.quantity += movement.quantity
+                changes.append((previous, product.valuation_state()))
+            StockMovement.objects.bulk_create(movements, batch_size=1000)
+            count_movements(movements)
+            CostLayer.open_for_many(movements)
+
+            if self.kind == self.Kind.RECEIVING:
+                lines.update(difference=F('quantity'))
+            else:
+                lines.update(difference=F('quantity') - F('expected'))
+            scanned = Product.objects.filter(pk__in=lines.values('product_id'))
+            scanned.update(quantity=F('quantity') + Subquery(lines.filter(product=OuterRef('pk')).values('difference')))
+            StockBalance.adjust_many(self.location_id, {movement.product_id: movement.quantity for movement in movements})
+            update_by_value(Product.objects.all(), 'average_cost', {
+                movement.product_id: movement.product.average_cost
+                for movement in movements
+                if movement.product.average_cost != average_costs[movement.product_id]
+            })
+            StockValuation.apply_changes(changes)
+            publish_many([
+                event
+                for movement in movements
+                for event in movement.product.stock_events(movement.product.quantity - movement.quantity)
+            ])
+
+            self.status = self.Status.COMMITTED
+            self.committed_at = timezone.now()
+            self.save(update_fields=['status', 'committed_at'])
+        return len(movements)
+
+
+class StockSessionLine(models.Model):
+    session = models.ForeignKey(StockSession, on_delete=models.CASCADE, related_name='lines', verbose_name="Session")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', verbose_name="Produit")
+    quantity = models.IntegerField(verbose_name="Quantité reçue / comptée")
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True, verbose_name="Coût unitaire")
+    expected = models.IntegerField(null=True, blank=True, verbose_name="Stock avant validation")
+    difference = models.IntegerField(null=True, blank=True, verbose_name="Écart")
+
+    class Meta:
+        verbose_name = "Ligne de session de stock"
+        verbose_name_plural = "Lignes de session de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'product'], name='unique_product_per_stock_session'),
+        ]
+
+    def __str__(self):
+        return f"{self.product} : {self.quantity}"
+
+
+class ReplenishmentForecast(models.Model):
+    """
+    Prévision de réapprovisionnement d'un produit, recalculée en masse par la
+    commande forecast_replenishment à partir de l'historique des sorties.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='forecast', verbose_name="Produit")
+    daily_demand = models.DecimalField(max_digits=12, decimal_places=3, verbose_name="Demande moyenne / jour")
+    demand_deviation = models.DecimalField(max_digits=12, decimal_places=3, verbose_name="Écart-type journalier")
+    days_of_cover = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True, verbose_name="Jours de couverture")
+    reorder_point = models.IntegerField(verbose_name="Point de commande")
+    reorder_quantity = models.IntegerField(verbose_name="Quantité à commander")
+    computed_at = models.DateTimeField(verbose_name="Calculée le")
+
+    class Meta:
+        verbose_name = "Prévision de réapprovisionnement"
+        verbose_name_plural = "Prévisions de réapprovisionnement"
+
+    def __str__(self):
+        return f"{self.product} : commander à {self.reorder_point}"
+
+
+class StockReservation(models.Model):
+    """
+    Quantité retenue pour une vente en cours de saisie, identifiée par le jeton du
+    formulaire. Tant qu'elle n'a pas expiré, elle est déduite du stock disponible
+    des autres ventes ; la validation de la vente la remplace par la sortie de stock.
+    """
+    token = models.CharField(max_length=64, db_index=True, verbose_name="Jeton de vente")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations', verbose_name="Produit")
+    quantity = models.PositiveIntegerField(verbose_name="Quantité réservée")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Vendeur")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Créée le")
+    expires_at = models.DateTimeField(verbose_name="Expire le")
+
+    class Meta:
+        verbose_name = "Réservation de stock"
+        verbose_name_plural = "Réservations de stock"
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'product'], name='unique_reservation_per_sale'),
+        ]
+        indexes = [
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_expiry'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product} jusqu'à {self.expires_at:%H:%M}"
+
+    @classmethod
+    def active(cls, now=None):
+        return cls.objects.filter(expires_at__gt=now or timezone.now())
+
+    @classmethod
+    def reserved_quantities(cls, product_ids, exclude_token=None):
+        """Quantités réservées par les ventes en cours, {product_id: quantité} (une requête groupée)"""
+        holds = cls.active().filter(product_id__in=product_ids)
+        if exclude_token:
+            holds = holds.exclude(token=exclude_token)
+        return dict(holds.values('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total').order_by())
+
+    @classmethod
+    @contextmanager
+    def atomic(cls):
+        """
+        Transaction de vérification et de retenue du stock. Le verrou d'écriture
+        est pris à l'ouverture (transaction_mode IMMEDIATE, select_for_update étant
+        sans effet sous SQLite) ; une base encore verrouillée après le délai
+        d'attente lève ValidationError, comme un stock insuffisant.
+        """
+        try:
+            with transaction.atomic():
+                yield
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            raise ValidationError(STOCK_BUSY_MESSAGE)
+
+    @classmethod
+    def hold(cls, token, product_id, quantity, user=None):
+        """
+        Fixe la quantité réservée d'un produit pour la vente `token` (0 la libère) et
+        prolonge toutes les réservations de la vente. Lève ValidationError si le stock
+        disponible ne suffit pas. Retourne le disponible restant pour les autres ventes.
+        """
+        expires_at = timezone.now() + timedelta(minutes=settings.STOCK_RESERVATION_TTL_MINUTES)
+        with cls.atomic():
+            product = Product.objects.select_for_update().get(pk=product_id)
+            available = product.quantity - cls.reserved_quantities([product_id], exclude_token=token).get(product_id, 0)
+            if quantity > available:
+                raise ValidationError(f"Stock insuffisant pour {product.name} : {max(available, 0)} disponible(s).")
+            if quantity > 0:
+                cls.objects.update_or_create(
+                    token=token, product=product,
+                    defaults={'quantity': quantity, 'user': user, 'expires_at': expires_at},
+                )
+            else:
+                cls.objects.filter(token=token, product=product).delete()
+            cls.objects.filter(token=token).update(expires_at=expires_at)
+        return available - quantity
+
+    @classmethod
+    def commit(cls, token, quantities):
+        """
+        Valide une vente : verrouille les produits (par ordre de clé), vérifie que les
+        quantités {product_id: quantité} tiennent dans le stock disponible hors
+        réservations des autres ventes, puis supprime les réservations du jeton.
+        À appeler dans la transaction (StockReservation.atomic) qui crée les sorties de
+        stock ; celles-ci doivent utiliser les produits verrouillés retournés ({pk: produit}).
+        """
+        try:
+            products = Product.objects.select_for_update().order_by('pk').in_bulk(list(quantities))
+        except OperationalError as error:
+            if 'locked' not in str(error):
+                raise
+            raise ValidationError(STOCK_BUSY_MESSAGE)
+        reserved = cls.reserved_quantities(list(quantities), exclude_token=token)
+        shortages = []
+        for product_id, quantity in quantities.items():
+            product = products[product_id]
+            available = product.quantity - reserved.get(product_id, 0)
+            if quantity > 0 and quantity > available:
+                shortages.append(f"Stock insuffisant pour {product.name} : {max(available, 0)} disponible(s).")
+        if shortages:
+            raise ValidationError(shortages)
+        if token:
+            cls.objects.filter(token=token).delete()
+        return products
+
+    @classmethod
+    def release(cls, token):
+        return cls.objects.filter(token=token).delete()[0]
+
+    @classmethod
+    def expire(cls, now=None):
+        """Supprime les réservations échues ; retourne leur nombre"""
+        return cls.objects.filter(expires_at__lte=now or timezone.now()).delete()[0]
@@ -0,0 +1,147 @@
+from itertools import groupby
+
+from django.db.models import DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .archive import movement_querysets
+from .models import Category, CostLayer, Location, Product, StockMovement, StockValuation
+from .snapshots import end_of_day, location_stock_as_of, start_of_day, stock_as_of
+
+
+def movement_period(start_date, end_date):
+    """Bornes [début, fin[ d'une période saisie en dates (None si non renseignées)"""
+    start = parse_date(start_date or '')
+    end = parse_date(end_date or '')
+    return (start_of_day(start) if start else None, end_of_day(end) if end else None)
+
+
+def stock_entry_report_context(start_date='', end_date=''):
+    """Contexte du rapport des entrées de stock sur une période donnée (dates AAAA-MM-JJ)"""
+    # Table chaude, plus l'archive si la période commence avant la fin de celle-ci
+    movements = []
+    total_qty = 0
+    total_value = 0
+    for entries in movement_querysets(*movement_period(start_date, end_date)):
+        entries = entries.filter(movement_type=StockMovement.MovementType.ENTRY).select_related('product__category', 'user').order_by('date')
+
+        # Calcul des totaux au coût enregistré sur chaque entrée
+        # (prix d'achat actuel pour les mouvements antérieurs au suivi des coûts)
+        totals = entries.aggregate(
+            total_qty=Sum('quantity'),
+            total_value=Sum(Coalesce('total_cost', F('quantity') * F('product__purchase_price'), output_field=DecimalField())),
+        )
+        total_qty += totals['total_qty'] or 0
+        total_value += totals['total_value'] or 0
+        movements.extend(entries)
+    movements.sort(key=lambda movement: movement.date)
+
+    context = {
+        'movements': movements,
+        'start_date': start_date,
+        'end_date': end_date,
+        'total_qty': total_qty,
+        'total_value': total_value,
+        'today': timezone.now()
+    }
+    return context
+
+
+def inventory_report_context(abc_filter='', as_of=None, location=None):
+    """
+    Contexte de l'état de l'inventaire à l'instant T regroupé par catégorie,
+    éventuellement limité à une classe ABC, à un emplacement (identifiant) ou à
+    la clôture d'une date passée.
+    """
+    products = Product.objects.all().select_related('category').order_by('category__name', 'name')
+
+    # Une sélection ABC ou un emplacement ne correspondent plus aux sous-totaux tenus par catégorie : ils sont recalculés
+    if abc_filter in Product.AbcClass.values:
+        products = products.filter(abc_class=abc_filter)
+    else:
+        abc_filter = ''
+    location = Location.selected(location)
+
+    if as_of and as_of < timezone.localdate():
+        return _inventory_report_computed(products, abc_filter, as_of, location)
+    if abc_filter or location:
+        return _inventory_report_computed(products, abc_filter, location=location)
+    
+    # Regroupement par catégorie, sous-totaux lus dans la valorisation tenue à jour
+    categories_list = Category.objects.filter(products__isnull=False).distinct().select_related('valuation').order_by('name')
+    report_data = []
+    
+    for cat in categories_list:
+        valuation = getattr(cat, 'valuation', None) or StockValuation(category=cat)
+        report_data.append({
+            'category': cat,
+            'products': products.filter(category=cat),
+            'subtotal_qty': valuation.quantity,
+            'subtotal_purchase_value': valuation.purchase_value,
+            'subtotal_selling_value': valuation.selling_value,
+        })
+
+    # Totaux globaux
+    total_items = products.count()
+    total = StockValuation.total()
+
+    context = {
+        'report_data': report_data,
+        'summary': {
+            'total_items': total_items,
+            'total_qty': total.quantity,
+            'total_purchase_value': total.purchase_value,
+            'total_selling_value': total.selling_value,
+            'total_cost_value': CostLayer.stock_value(),
+            'cost_method': CostLayer.method(),
+        },
+        'abc_filter': abc_filter,
+        'locations': Location.objects.filter(is_active=True),
+        'today': timezone.now()
+    }
+    return context
+
+
+def _inventory_report_computed(products, abc_filter, as_of=None, location=None):
+    """
+    État de l'inventaire d'une sélection de produits, sous-totaux calculés à la volée ;
+    avec `as_of`, à la clôture d'une date passée (instantané + mouvements depuis), valorisé aux prix actuels ;
+    avec `location`, stock de cet emplacement seulement.
+    """
+    if as_of:
+        balances = location_stock_as_of(as_of, location) if location else stock_as_of(as_of)
+        products = products.filter(created_at__lt=end_of_day(as_of))
+    elif location:
+        products = Product.with_location_stock(location, products)
+
+    report_data = []
+    summary = {'total_items': 0, 'total_qty': 0, 'total_purchase_value': 0, 'total_selling_value': 0}
+    for category, cat_products in groupby(products, key=lambda p: p.category):
+        cat_products = list(cat_products)
+        item = {'category': category, 'products': cat_products, 'subtotal_qty': 0, 'subtotal_purchase_value': 0, 'subtotal_selling_value': 0}
+        for p in cat_products:
+            if as_of:
+                p.quantity = balances.get(p.pk, 0)
+            elif location:
+                p.quantity = p.location_quantity
+            item['subtotal_qty'] += p.quantity
+            item['subtotal_purchase_value'] += p.quantity * p.purchase_price
+            item['subtotal_selling_value'] += p.quantity * p.selling_price
+        report_data.append(item)
+
+        summary['total_items'] += len(cat_products)
+        summary['total_qty'] += item['subtotal_qty']
+        summary['total_purchase_value'] += item['subtotal_purchase_value']
+        summary['total_selling_value'] += item['subtotal_selling_value']
+
+    context = {
+        'report_data': report_data,
+        'summary': summary,
+        'as_of': as_of,
+        'abc_filter': abc_filter,
+        'location': location,
+        'locations': Location.objects.filter(is_active=True),
+        'today': timezone.now()
+    }
+    return context
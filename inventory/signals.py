@@ -0,0 +1,46 @@
+from django.db.models.signals import post_save, post_delete
+from core.cache import bump_version
+from core.events import publish_many
+from core.metrics import count_movements
+from core.thumbnails import generate_on_upload
+from .models import Category, Location, Product, StockMovement, StockSession, StockValuation
+
+
+def invalidate_inventory_fragments(sender, **kwargs):
+    """Invalide les fragments de templates dépendant du stock"""
+    bump_version('inventory')
+
+
+for model in (Category, Location, Product, StockMovement, StockSession):
+    post_save.connect(invalidate_inventory_fragments, sender=model)
+    post_delete.connect(invalidate_inventory_fragments, sender=model)
+
+
+def remove_product_valuation(sender, instance, **kwargs):
+    """Retire de la valorisation le stock d'un produit supprimé"""
+    StockValuation.apply_change(instance.valuation_state(), None)
+
+
+post_delete.connect(remove_product_valuation, sender=Product)
+
+
+def publish_stock_movement(sender, instance, created, **kwargs):
+    """Annonce le nouveau niveau de stock du produit au flux temps réel (les transferts ne le changent pas)"""
+    if created and instance.signed_quantity:
+        product = instance.product
+        publish_many(product.stock_events(product.quantity - instance.signed_quantity))
+
+
+post_save.connect(publish_stock_movement, sender=StockMovement)
+
+
+def count_stock_movement(sender, instance, created, **kwargs):
+    """Compte le mouvement pour /metrics une fois la transaction validée"""
+    if created:
+        count_movements([instance])
+
+
+post_save.connect(count_stock_movement, sender=StockMovement)
+
+
+generate_on_upload(Product, 'image', ['card', 'row'], 'inventory')
@@ -0,0 +1,106 @@
+import datetime
+
+from django.db.models import Case, F, Max, Q, Sum, Value, When
+from django.utils import timezone
+
+from .archive import movement_querysets
+from .models import StockBalance, StockMovement, StockSnapshot
+
+
+def start_of_day(day):
+    """Premier instant du jour, dans le fuseau courant"""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def end_of_day(day):
+    """Premier instant du jour suivant, dans le fuseau courant"""
+    return timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+
+
+def movement_deltas(movements):
+    """Variation nette de stock par produit sur un ensemble de mouvements (une requête groupée)"""
+    signed_quantity = Case(
+        When(movement_type=StockMovement.MovementType.EXIT, then=-F('quantity')),
+        When(movement_type=StockMovement.MovementType.TRANSFER, then=Value(0)),
+        default=F('quantity'),
+    )
+    rows = movements.values('product_id').annotate(delta=Sum(signed_quantity)).order_by()
+    return {row['product_id']: row['delta'] or 0 for row in rows}
+
+
+def location_movement_deltas(movements, location):
+    """Variation nette du stock d'un emplacement par produit (départs et arrivées de transferts compris)"""
+    transfer = StockMovement.MovementType.TRANSFER
+    signed_quantity = Case(
+        When(movement_type=transfer, destination=location, then=F('quantity')),
+        When(movement_type__in=[StockMovement.MovementType.EXIT, transfer], then=-F('quantity')),
+        default=F('quantity'),
+    )
+    rows = (
+        movements.filter(Q(location=location) | Q(movement_type=transfer, destination=location))
+        .values('product_id').annotate(delta=Sum(signed_quantity)).order_by()
+    )
+    return {row['product_id']: row['delta'] or 0 for row in rows}
+
+
+def latest_snapshot_date(day):
+    """Date du dernier instantané clôturé au plus tard le jour donné"""
+    return StockSnapshot.objects.filter(date__lte=day).aggregate(latest=Max('date'))['latest']
+
+
+def stock_as_of(day, product_ids=None):
+    """
+    Stock de chaque produit à la clôture du jour donné : instantané le plus proche
+    plus les mouvements survenus depuis (parcours borné par l'index sur la date,
+    l'archive n'étant lue que si la période la recouvre).
+    Retourne {product_id: quantité}, les produits à stock nul pouvant être absents.
+    """
+    snapshot_date = latest_snapshot_date(day)
+
+    balances = {}
+    start = None
+    if snapshot_date is not None:
+        snapshots = StockSnapshot.objects.filter(date=snapshot_date)
+        if product_ids is not None:
+            snapshots = snapshots.filter(product_id__in=product_ids)
+        balances = dict(snapshots.values_list('product_id', 'quantity'))
+        start = end_of_day(snapshot_date)
+
+    for movements in movement_querysets(start, end_of_day(day)):
+        if product_ids is not None:
+            movements = movements.filter(product_id__in=product_ids)
+        for product_id, delta in movement_deltas(movements).items():
+            balances[product_id] = balances.get(product_id, 0) + delta
+    return balances
+
+
+def location_stock_as_of(day, location, product_ids=None):
+    """
+    Stock de chaque produit dans un emplacement à la clôture du jour donné : solde
+    courant moins les mouvements de l'emplacement survenus depuis (les instantanés
+    étant globaux, on remonte depuis aujourd'hui ; l'archive n'est lue que si besoin).
+    Retourne {product_id: quantité}, les produits à stock nul pouvant être absents.
+    """
+    balances = StockBalance.objects.filter(location=location)
+    if product_ids is not None:
+        balances = balances.filter(product_id__in=product_ids)
+    balances = dict(balances.values_list('product_id', 'quantity'))
+
+    for movements in movement_querysets(end_of_day(day)):
+        if product_ids is not None:
+            movements = movements.filter(product_id__in=product_ids)
+        for product_id, delta in location_movement_deltas(movements, location).items():
+            balances[product_id] = balances.get(product_id, 0) - delta
+    return balances
+
+
+def take_snapshot(day):
+    """Enregistre (ou remplace) l'instantané de clôture du jour donné ; retourne le nombre de lignes"""
+    balances = stock_as_of(day)
+    StockSnapshot.objects.filter(date=day).delete()
+    StockSnapshot.objects.bulk_create([
+        StockSnapshot(product_id=product_id, date=day, quantity=quantity)
+        for product_id, quantity in balances.items()
+        if quantity
+    ], batch_size=1000)
+    return sum(1 for quantity in balances.values() if quantity)
@@ -1,3 +1,516 @@
+import datetime
+import importlib
+import io
+from decimal import Decimal
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, transaction
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .forecasting import compute_forecasts, save_forecasts
+from .imports import import_products
+from .models import (
+    ArchivedStockMovement, Category, CostLayer, Location, Product, ReplenishmentForecast, StockBalance, StockMovement,
+    StockReservation, StockSession, StockSnapshot, StockValuation, batched, update_by_value,
+)
+from .snapshots import location_stock_as_of, stock_as_of, take_snapshot
+
+
+class InventoryTestCase(TestCase):
+    """Catégorie « Boissons » et produit « Coca » (achat 100, vente 150, seuil 5) sans stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Boissons")
+        cls.product = Product.objects.create(category=cls.category, name="Coca", purchase_price=100, selling_price=150, alert_threshold=5)
+
+    def move(self, movement_type, quantity, days_ago=None, product=None, **kwargs):
+        movement = StockMovement.objects.create(product=product or self.product, movement_type=movement_type, quantity=quantity, **kwargs)
+        if days_ago is not None:
+            StockMovement.objects.filter(pk=movement.pk).update(date=timezone.now() - datetime.timedelta(days=days_ago))
+        return movement
+
+
+class BatchedTests(TestCase):
+    def test_batched_splits_iterable(self):
+        self.assertEqual(list(batched(range(5), 2)), [(0, 1), (2, 3), (4,)])
+        self.assertEqual(list(batched([], 3)), [])
+
+
+class ImportProductsTests(InventoryTestCase):
+    def run_import(self, text, **kwargs):
+        return import_products(io.BytesIO(text.encode('utf-8')), 'catalogue.csv', **kwargs)
+
+    def test_import_creates_and_updates_by_barcode_across_chunks(self):
+        result = self.run_import(
+            "code-barre;nom;categorie;prix-achat;prix-vente;stock\n"
+            "111;Coca;Boissons;100;150;10\n"
+            "222;Fanta;Boissons;90,5;140;0\n"
+            "333;Sprite;Boissons;95;145;4\n",
+            chunk_size=2,
+        )
+        self.assertEqual((result['rows'], result['created'], result['updated'], result['errors']), (3, 3, 0, []))
+        coca = Product.objects.get(barcode='111')
+        self.assertEqual(coca.quantity, 10)
+        self.assertEqual(coca.average_cost, Decimal('100'))
+        self.assertEqual(StockMovement.objects.filter(product=coca).count(), 1)
+        self.assertEqual(CostLayer.objects.filter(product=coca).get().remaining, 10)
+
+        result = self.run_import(
+            "code-barre;nom;categorie;prix-achat;prix-vente;stock\n"
+            "111;Coca-Cola;Boissons;100;160;99\n",
+        )
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+        coca.refresh_from_db()
+        # Le stock d'un produit existant n'est modifié que par des mouvements
+        self.assertEqual((coca.name, coca.quantity), ("Coca-Cola", 10))
+
+    def test_update_keeps_fields_without_column(self):
+        self.run_import(
+            "code-barre;nom;categorie;description;prix-achat;prix-vente;seuil-alerte\n"
+            "111;Coca;Boissons;Canette 33cl;100;150;25\n"
+        )
+        self.run_import("code-barre;nom;categorie;prix-achat;prix-vente\n111;Coca;Boissons;110;170\n")
+        coca = Product.objects.get(barcode='111')
+        self.assertEqual((coca.selling_price, coca.description, coca.alert_threshold), (Decimal('170'), "Canette 33cl", 25))
+
+    def test_import_reports_row_errors(self):
+        result = self.run_import(
+            "code-barre;nom;categorie;prix-achat;prix-vente\n"
+            "111;Coca;Inconnue;100;150\n"
+            "111;Coca;Boissons;abc;150\n",
+        )
+        self.assertEqual(result['created'], 0)
+        self.assertEqual([line for line, _ in result['errors']], [2, 3])
+
+
+class OpeningCostLayerMigrationTests(InventoryTestCase):
+    def test_stock_without_layers_gets_an_opening_layer(self):
+        empty = Product.objects.create(category=self.category, name="Fanta", purchase_price=90, selling_price=140)
+        # Stock saisi avant le suivi des coûts : ni couche ni coût moyen
+        Product.objects.filter(pk=self.product.pk).update(quantity=147, average_cost=0)
+
+        migration = importlib.import_module('inventory.migrations.0014_opening_cost_layers')
+        migration.open_cost_layers(apps, None)
+        migration.open_cost_layers(apps, None)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.average_cost, Decimal('100'))
+        layer = CostLayer.objects.get(product=self.product)
+        self.assertEqual((layer.remaining, layer.unit_cost, layer.movement), (147, Decimal('100'), None))
+        self.assertFalse(CostLayer.objects.filter(product=empty).exists())
+
+        # Une réception au même prix ne fait plus chuter le coût moyen
+        self.move('ENTRY', 1, unit_cost=100)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.average_cost, Decimal('100'))
+        exit_movement = self.move('EXIT', 5)
+        self.assertEqual(exit_movement.total_cost, Decimal('500.00'))
+
+
+class CostLayerTests(InventoryTestCase):
+    def setUp(self):
+        self.move('ENTRY', 10, unit_cost=100)
+        self.move('ENTRY', 10, unit_cost=130)
+
+    def test_fifo_exit_consumes_oldest_layers(self):
+        exit_movement = self.move('EXIT', 15)
+        self.assertEqual(exit_movement.total_cost, Decimal('1650.00'))
+        self.assertEqual(list(CostLayer.objects.values_list('remaining', flat=True)), [0, 5])
+        self.assertEqual(CostLayer.stock_value(), Decimal('650'))
+
+    def test_weighted_average_exit(self):
+        with self.settings(STOCK_COST_METHOD='WAVG'):
+            exit_movement = self.move('EXIT', 15)
+            self.product.refresh_from_db()
+            self.assertEqual(self.product.average_cost, Decimal('115'))
+            self.assertEqual((exit_movement.unit_cost, exit_movement.total_cost), (Decimal('115'), Decimal('1725.00')))
+            self.assertEqual(CostLayer.stock_value(), Decimal('575'))
+
+    def test_unvalued_adjustment_enters_at_average_cost(self):
+        adjustment = self.move('ADJUSTMENT', 2)
+        self.assertEqual(adjustment.unit_cost, Decimal('115'))
+
+
+class RecomputeCostsTests(InventoryTestCase):
+    def setUp(self):
+        self.annex = Location.objects.create(name="Annexe")
+
+    def ledger(self):
+        self.product.refresh_from_db()
+        return (
+            list(StockMovement.objects.order_by('pk').values_list('movement_type', 'unit_cost', 'total_cost')),
+            list(CostLayer.objects.order_by('date', 'id').values_list('quantity', 'remaining', 'unit_cost')),
+            self.product.average_cost,
+        )
+
+    def test_recompute_matches_incremental_costing(self):
+        self.move('ENTRY', 10, unit_cost=100)
+        self.move('ENTRY', 10, unit_cost=130)
+        self.move('TRANSFER', 5, destination=self.annex)
+        # Stock négatif : les 5 unités sans couche sont valorisées au coût moyen (115)
+        shortage = self.move('EXIT', 25)
+        self.assertEqual(shortage.total_cost, Decimal('2875.00'))
+        self.move('ENTRY', 10, unit_cost=200)
+        self.assertEqual(self.move('EXIT', 3).total_cost, Decimal('600.00'))
+
+        incremental = self.ledger()
+        self.assertEqual(incremental[0][2], ('TRANSFER', None, None))
+        self.assertEqual(len(incremental[1]), 3)
+        call_command('recompute_costs', stdout=io.StringIO())
+        self.assertEqual(self.ledger(), incremental)
+
+    def test_transfer_opens_no_layer(self):
+        self.move('ENTRY', 10, unit_cost=100)
+        self.move('TRANSFER', 4, destination=self.annex)
+        self.move('EXIT', 2)
+        incremental = self.ledger()
+        call_command('recompute_costs', stdout=io.StringIO())
+        self.assertEqual(self.ledger(), incremental)
+        self.assertEqual(CostLayer.objects.get().remaining, 8)
+        self.assertEqual(self.product.average_cost, Decimal('100'))
+
+
+class StockReservationTests(InventoryTestCase):
+    def setUp(self):
+        self.move('ENTRY', 10, unit_cost=100)
+
+    def test_holds_share_available_stock(self):
+        self.assertEqual(StockReservation.hold('vente-a', self.product.pk, 6), 4)
+        with self.assertRaises(ValidationError):
+            StockReservation.hold('vente-b', self.product.pk, 5)
+        # Une vente peut modifier sa propre réservation
+        self.assertEqual(StockReservation.hold('vente-a', self.product.pk, 8), 2)
+        self.assertEqual(StockReservation.hold('vente-a', self.product.pk, 0), 10)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_commit_checks_other_sales_and_releases_token(self):
+        StockReservation.hold('vente-a', self.product.pk, 6)
+        StockReservation.hold('vente-b', self.product.pk, 3)
+        with self.assertRaises(ValidationError):
+            StockReservation.commit('vente-b', {self.product.pk: 5})
+        products = StockReservation.commit('vente-a', {self.product.pk: 6})
+        self.assertEqual(products[self.product.pk].quantity, 10)
+        self.assertEqual(list(StockReservation.objects.values_list('token', flat=True)), ['vente-b'])
+
+    def test_locked_database_is_a_stock_conflict(self):
+        with mock.patch('inventory.models.transaction.atomic', side_effect=OperationalError('database is locked')):
+            with self.assertRaisesMessage(ValidationError, "réessayez"):
+                StockReservation.hold('vente-a', self.product.pk, 1)
+
+
+class InventoryReportViewTests(InventoryTestCase):
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.move('ENTRY', 8, unit_cost=100)
+
+    def test_past_date(self):
+        response = self.client.get(reverse('inventory_report'), {'date': '2020-01-01'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_date_is_a_bad_request(self):
+        response = self.client.get(reverse('inventory_report'), {'date': '2024-13-45'})
+        self.assertEqual(response.status_code, 400)
+
+    def assertEtagChangesAfter(self, write):
+        # Versions de cache figées : comme un worker dont le cache local ne voit pas les commandes
+        with mock.patch('core.conditional.get_versions', return_value={}):
+            etag = self.client.get(reverse('inventory_report'))['ETag']
+            response = self.client.get(reverse('inventory_report'), headers={'if-none-match': etag})
+            self.assertEqual(response.status_code, 304)
+            write()
+            response = self.client.get(reverse('inventory_report'), headers={'if-none-match': etag})
+            self.assertEqual(response.status_code, 200)
+
+    def test_bulk_update_invalidates_etag(self):
+        self.assertEtagChangesAfter(lambda: update_by_value(Product.objects.all(), 'alert_threshold', {self.product.pk: 99}))
+
+    def test_recompute_costs_invalidates_etag(self):
+        self.assertEtagChangesAfter(lambda: call_command('recompute_costs', stdout=io.StringIO()))
+
+
+class StockValuationTests(InventoryTestCase):
+    def setUp(self):
+        self.snacks = Category.objects.create(name="Snacks")
+        self.move('ENTRY', 10, unit_cost=100)
+
+    def stored(self):
+        return {
+            valuation.category_id: (valuation.quantity, valuation.purchase_value, valuation.selling_value)
+            for valuation in StockValuation.objects.all()
+        }
+
+    def assertConsistent(self):
+        stored = self.stored()
+        for category_id, values in StockValuation.expected().items():
+            self.assertEqual(stored.get(category_id, (0, 0, 0)), values)
+
+    def test_counters_follow_products(self):
+        self.assertEqual(StockValuation.total().selling_value, Decimal('1500'))
+        self.product.selling_price = 200
+        self.product.category = self.snacks
+        self.product.save()
+        self.move('EXIT', 4)
+        self.assertConsistent()
+        self.assertEqual(self.stored()[self.category.pk][0], 0)
+        self.assertEqual(self.stored()[self.snacks.pk], (6, Decimal('600'), Decimal('1200')))
+
+        self.product.delete()
+        self.assertEqual(StockValuation.total().quantity, 0)
+
+    def test_reconcile_repairs_drift(self):
+        StockValuation.objects.update(quantity=999)
+        out = io.StringIO()
+        call_command('reconcile_valuation', '--dry-run', stdout=out)
+        self.assertIn('drifted (dry run)', out.getvalue())
+        call_command('reconcile_valuation', stdout=out)
+        self.assertConsistent()
+        call_command('reconcile_valuation', stdout=out)
+        self.assertIn('consistent', out.getvalue())
+
+    def test_single_global_row(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StockValuation.objects.create(category=None)
+        StockValuation.adjust(self.snacks.pk, 1, 10, 20)
+        self.assertEqual(StockValuation.objects.filter(category=None).count(), 1)
+        self.assertEqual(StockValuation.total().quantity, 11)
+
+
+class ReconcileStockTests(InventoryTestCase):
+    def setUp(self):
+        self.move('ENTRY', 10, unit_cost=100)
+        # Écart introduit hors registre
+        Product.objects.filter(pk=self.product.pk).update(quantity=12)
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_stock', *args, stdout=out)
+        self.product.refresh_from_db()
+        return out.getvalue()
+
+    def test_report_only(self):
+        self.assertIn('stored 12, ledger 10, drift +2', self.reconcile())
+        self.assertEqual(self.product.quantity, 12)
+
+    def test_repair_trusting_quantity_writes_adjustment(self):
+        self.reconcile('--repair')
+        adjustment = StockMovement.objects.get(movement_type='ADJUSTMENT')
+        self.assertEqual((adjustment.quantity, self.product.quantity), (2, 12))
+        self.assertEqual(StockBalance.objects.get(product=self.product).quantity, 12)
+        self.assertIn('No ledger drift', self.reconcile())
+
+    def test_repair_trusting_ledger_resets_quantity(self):
+        self.reconcile('--repair', '--trust', 'ledger')
+        self.assertEqual(self.product.quantity, 10)
+        self.assertFalse(StockMovement.objects.filter(movement_type='ADJUSTMENT').exists())
+        self.assertEqual(StockValuation.total().quantity, 10)
+
+
+class StockSnapshotTests(InventoryTestCase):
+    def setUp(self):
+        self.annex = Location.objects.create(name="Annexe")
+        self.today = timezone.localdate()
+        self.move('ENTRY', 10, days_ago=3)
+        self.move('TRANSFER', 4, days_ago=2, destination=self.annex)
+        self.move('EXIT', 3, days_ago=1)
+        self.move('ENTRY', 5, days_ago=0)
+
+    def day(self, days_ago):
+        return self.today - datetime.timedelta(days=days_ago)
+
+    def test_stock_as_of_with_and_without_snapshot(self):
+        expected = {3: 10, 2: 10, 1: 7, 0: 12}
+        for days_ago, quantity in expected.items():
+            self.assertEqual(stock_as_of(self.day(days_ago)).get(self.product.pk, 0), quantity)
+        self.assertEqual(take_snapshot(self.day(2)), 1)
+        for days_ago, quantity in expected.items():
+            self.assertEqual(stock_as_of(self.day(days_ago)).get(self.product.pk, 0), quantity)
+        self.assertEqual(stock_as_of(self.day(4)), {})
+
+    def test_location_stock_as_of(self):
+        self.assertEqual(location_stock_as_of(self.day(3), self.annex).get(self.product.pk, 0), 0)
+        self.assertEqual(location_stock_as_of(self.day(2), self.annex)[self.product.pk], 4)
+        self.assertEqual(location_stock_as_of(self.day(1), Location.default())[self.product.pk], 3)
+
+    def test_command_rejects_open_and_invalid_dates(self):
+        call_command('snapshot_stock', '--date', self.day(1).isoformat(), stdout=io.StringIO())
+        self.assertEqual(StockSnapshot.objects.get().quantity, 7)
+        for date in (self.today.isoformat(), '2024-13-45'):
+            with self.assertRaises(CommandError):
+                call_command('snapshot_stock', '--date', date, stdout=io.StringIO())
+
+
+class ArchiveMovementsTests(InventoryTestCase):
+    def setUp(self):
+        for movement_type, quantity, days_ago in (('ENTRY', 10, 40), ('EXIT', 4, 35), ('EXIT', 1, 2)):
+            self.move(movement_type, quantity, days_ago=days_ago)
+        self.today = timezone.localdate()
+
+    def test_archive_keeps_ledger_balances(self):
+        before = {days_ago: stock_as_of(self.today - datetime.timedelta(days=days_ago)) for days_ago in (36, 30, 0)}
+        call_command('archive_movements', '--keep-days', '30', stdout=io.StringIO())
+
+        self.assertEqual(StockMovement.objects.count(), 1)
+        self.assertEqual(ArchivedStockMovement.objects.count(), 2)
+        self.assertIsNone(CostLayer.objects.get().movement)
+        for days_ago, balances in before.items():
+            self.assertEqual(stock_as_of(self.today - datetime.timedelta(days=days_ago)), balances)
+        self.assertIn('No ledger drift', self.reconcile())
+
+        # Le recalcul des coûts relit l'archive
+        costs = list(ArchivedStockMovement.objects.order_by('date').values_list('total_cost', flat=True))
+        call_command('recompute_costs', stdout=io.StringIO())
+        self.assertEqual(list(ArchivedStockMovement.objects.order_by('date').values_list('total_cost', flat=True)), costs)
+        self.assertEqual(CostLayer.objects.get().remaining, 5)
+
+    def reconcile(self):
+        out = io.StringIO()
+        call_command('reconcile_stock', stdout=out)
+        return out.getvalue()
+
+    def test_invalid_cutoff(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_movements', '--before', '2024-13-45', stdout=io.StringIO())
+
+
+class StockSessionTests(InventoryTestCase):
+    def setUp(self):
+        self.fanta = Product.objects.create(category=self.category, name="Fanta", purchase_price=80, selling_price=120)
+        self.move('ENTRY', 10, unit_cost=100)
+        self.location = Location.default()
+
+    def session(self, kind):
+        return StockSession.objects.create(kind=kind, location=self.location)
+
+    def assertLedgerConsistent(self):
+        out = io.StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('No ledger drift', out.getvalue())
+        self.assertNotIn('location balances', out.getvalue())
+        self.assertEqual(StockValuation.total().quantity, sum(Product.objects.values_list('quantity', flat=True)))
+
+    def test_receiving(self):
+        session = self.session(StockSession.Kind.RECEIVING)
+        session.scan(self.product, 2, unit_cost=130)
+        session.scan(self.product, 8)
+        session.scan(self.fanta, 5)
+        self.assertEqual(session.commit(), 2)
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.product.average_cost), (20, Decimal('115')))
+        self.assertEqual(Product.objects.get(pk=self.fanta.pk).quantity, 5)
+        self.assertEqual(CostLayer.objects.filter(product=self.fanta).get().unit_cost, Decimal('80'))
+        self.assertLedgerConsistent()
+        with self.assertRaises(ValidationError):
+            session.commit()
+
+    def test_count_adjusts_to_counted_quantity(self):
+        session = self.session(StockSession.Kind.COUNT)
+        session.scan(self.product, 7)
+        session.scan(self.fanta, 0)
+        self.assertEqual(session.commit(), 1)
+
+        line = session.lines.get(product=self.product)
+        self.assertEqual((line.expected, line.difference), (10, -3))
+        adjustment = StockMovement.objects.get(movement_type='ADJUSTMENT')
+        self.assertEqual((adjustment.quantity, adjustment.total_cost), (-3, Decimal('300.00')))
+        self.assertEqual(CostLayer.objects.get(product=self.product).remaining, 7)
+        self.assertLedgerConsistent()
+
+    def test_commit_view_reports_failures(self):
+        self.client.force_login(get_user_model().objects.create_user('magasinier', password='pw'))
+        session = self.session(StockSession.Kind.COUNT)
+        session.scan(self.product, 7)
+        url = reverse('stock_session_commit', args=[session.pk])
+        with mock.patch.object(CostLayer, 'value_movements', side_effect=ValidationError("Stock insuffisant pour Coca.")):
+            response = self.client.post(url, follow=True)
+        self.assertContains(response, "Stock insuffisant pour Coca.")
+        session.refresh_from_db()
+        self.assertTrue(session.is_draft)
+
+        self.client.post(url)
+        # Double soumission d'une session validée : pas de message d'erreur
+        response = self.client.post(url, follow=True)
+        self.assertEqual(list(response.context['messages']), [])
+        self.assertEqual(StockMovement.objects.filter(movement_type='ADJUSTMENT').count(), 1)
+
+
+class ForecastingTests(InventoryTestCase):
+    def setUp(self):
+        self.idle = Product.objects.create(category=self.category, name="Fanta", purchase_price=80, selling_price=120)
+        self.move('ENTRY', 12, days_ago=9)
+        # 2 unités par jour, 5 jours sur 10 : demande 1 / jour, écart-type 1
+        for days_ago in range(1, 10, 2):
+            self.move('EXIT', 2, days_ago=days_ago)
+        # Produits créés il y a un peu moins de 10 jours : 10 jours d'historique
+        Product.objects.update(created_at=timezone.now() - datetime.timedelta(days=9, hours=23))
+
+    def test_compute_and_apply_thresholds(self):
+        forecasts = compute_forecasts(window_days=30, lead_time=4, review_days=7, service_level=0.5)
+        index = list(forecasts['product_ids']).index(self.product.pk)
+        self.assertAlmostEqual(forecasts['daily_demand'][index], 1.0)
+        self.assertAlmostEqual(forecasts['deviation'][index], 1.0)
+        self.assertAlmostEqual(forecasts['days_of_cover'][index], 2.0)
+        # Point de commande : 4 jours de demande (niveau de service 50 % : pas de stock de sécurité)
+        self.assertEqual((forecasts['reorder_point'][index], forecasts['reorder_quantity'][index]), (4, 9))
+
+        save_forecasts(forecasts, apply_thresholds=True)
+        self.assertEqual(list(ReplenishmentForecast.objects.values_list('product_id', flat=True)), [self.product.pk])
+        self.assertEqual(Product.objects.get(pk=self.product.pk).alert_threshold, 4)
+        self.assertEqual(Product.objects.get(pk=self.idle.pk).alert_threshold, self.idle.alert_threshold)
+
+
+class LocationStockTests(InventoryTestCase):
+    def setUp(self):
+        self.shop = Location.default()
+        self.store = Location.objects.create(name="Réserve")
+        self.move('ENTRY', 20, unit_cost=100)
+
+    def balances(self):
+        return dict(StockBalance.objects.filter(product=self.product).values_list('location__name', 'quantity'))
+
+    def transfer(self, quantity, **kwargs):
+        movement = StockMovement(product=self.product, movement_type='TRANSFER', quantity=quantity, location=self.shop, destination=self.store)
+        for name, value in kwargs.items():
+            setattr(movement, name, value)
+        movement.clean()
+        movement.save()
+        return movement
+
+    def test_movement_without_location_goes_to_default(self):
+        self.assertEqual(StockMovement.objects.get().location, self.shop)
+        self.assertEqual(Location.default(), self.shop)
+        self.assertEqual(self.balances(), {self.shop.name: 20})
+
+    def test_new_default_replaces_previous(self):
+        self.store.is_default = True
+        self.store.save()
+        self.shop.refresh_from_db()
+        self.assertFalse(self.shop.is_default)
+        self.assertEqual(Location.default(), self.store)
+
+    def test_transfer_moves_balance_and_keeps_total(self):
+        self.transfer(15)
+        self.product.refresh_from_db()
+        self.assertEqual(self.balances(), {self.shop.name: 5, self.store.name: 15})
+        self.assertEqual(self.product.quantity, 20)
+        self.assertEqual(StockValuation.total().quantity, 20)
+
+    def test_invalid_transfers_are_rejected(self):
+        for kwargs in ({'quantity': 25}, {'destination': None}, {'destination': self.shop}, {'quantity': 0}):
+            with self.subTest(**kwargs), self.assertRaises(ValidationError):
+                self.transfer(kwargs.pop('quantity', 5), **kwargs)
+        self.assertEqual(self.balances(), {self.shop.name: 20})
 
-# Create your tests here.
+    def test_low_stock_per_location(self):
+        self.transfer(16)
+        self.assertEqual(Product.with_location_stock(self.shop).get().location_quantity, 4)
+        self.assertIn(self.product, Product.low_stock(location=self.shop))
+        self.assertNotIn(self.product, Product.low_stock(location=self.store))
+        self.assertNotIn(self.product, Product.low_stock())
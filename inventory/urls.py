@@ -4,8 +4,10 @@ from .views import (
     CategoryCreateView, StockMovementCreateView,
     ProductDetailView, ProductUpdateView,
     CategoryDetailView, CategoryUpdateView, CategoryDeleteView,
-    StockMovementDetailView, product_detail_json,
-    export_products_csv, stock_entry_report, inventory_report
+    StockMovementDetailView, product_detail_json, stock_reservation_hold,
+    stock_session_list, stock_session_detail, stock_session_line_delete, stock_session_commit,
+    export_products_csv, product_import, stock_entry_report, inventory_report,
+    replenishment_report,
 )
 
 urlpatterns = [
@@ -17,11 +19,18 @@ urlpatterns = [
     path('mouvements/', stock_movement_list, name='stock_movement_list'),
     path('mouvements/add/', StockMovementCreateView.as_view(), name='stock_movement_add'),
     path('mouvements/<int:pk>/', StockMovementDetailView.as_view(), name='stock_movement_detail'),
+    path('sessions/', stock_session_list, name='stock_session_list'),
+    path('sessions/<int:pk>/', stock_session_detail, name='stock_session_detail'),
+    path('sessions/<int:pk>/lines/<int:line_pk>/delete/', stock_session_line_delete, name='stock_session_line_delete'),
+    path('sessions/<int:pk>/commit/', stock_session_commit, name='stock_session_commit'),
     path('products/add/', ProductCreateView.as_view(), name='product_add'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product_detail'),
     path('products/<int:pk>/edit/', ProductUpdateView.as_view(), name='product_edit'),
     path('api/products/<int:pk>/', product_detail_json, name='product_api_detail'),
+    path('api/reservations/', stock_reservation_hold, name='stock_reservation_hold'),
     path('products/export/csv/', export_products_csv, name='export_products_csv'),
+    path('products/import/', product_import, name='product_import'),
     path('products/report/entries/', stock_entry_report, name='stock_entry_report'),
     path('products/report/inventory/', inventory_report, name='inventory_report'),
+    path('products/report/replenishment/', replenishment_report, name='replenishment_report'),
 ]
@@ -1,14 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.db import models, transaction
-from django.db.models import Q, Sum, Count
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Q, Sum, Count, F, DecimalField
+from django.http import HttpResponseBadRequest, JsonResponse
 from django.utils import timezone
-import csv
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import conditional_page, etag
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.views.generic import CreateView, DetailView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from .models import Category, Product, StockMovement
+from django.core.exceptions import ValidationError
+from core.conditional import make_etag
+from core.reporting import reporting_reads
+from core.jobs import enqueue
+from .models import Category, Location, Product, StockMovement, StockSession, ReplenishmentForecast, StockReservation
+from .archive import movement_querysets
+from .forms import ProductImportForm, StockScanForm, StockSessionForm
+from .imports import import_products
+from .reports import inventory_report_context, movement_period, stock_entry_report_context
 
 # Create your views here.
 
@@ -23,12 +33,31 @@ def category_list(request):
 
 @login_required
 def stock_movement_list(request):
-    """Liste des mouvements de stock avec recherche"""
+    """Liste des mouvements de stock avec recherche (l'archive n'est lue que si la période la couvre)"""
     query = request.GET.get('search', '')
-    movements = StockMovement.objects.all().select_related('product', 'user').order_by('-date')
-    if query:
-        movements = movements.filter(Q(product__name__icontains=query) | Q(reason__icontains=query))
-    return render(request, 'inventory/stock_movement_list.html', {'movements': movements[:50], 'search_query': query})
+    start_date = request.GET.get('start_date', '')
+    end_date = request.GET.get('end_date', '')
+
+    # Sans période, seule la table chaude est consultée
+    if start_date or end_date:
+        querysets = movement_querysets(*movement_period(start_date, end_date))
+    else:
+        querysets = [StockMovement.objects.all()]
+
+    movements = []
+    for movements_qs in querysets:
+        movements_qs = movements_qs.select_related('product', 'user', 'location', 'destination').order_by('-date')
+        if query:
+            movements_qs = movements_qs.filter(Q(product__name__icontains=query) | Q(reason__icontains=query))
+        movements.extend(movements_qs[:50])
+    movements.sort(key=lambda movement: movement.date, reverse=True)
+
+    return render(request, 'inventory/stock_movement_list.html', {
+        'movements': movements[:50],
+        'search_query': query,
+        'start_date': start_date,
+        'end_date': end_date,
+    })
 
 class ProductCreateView(PermissionRequiredMixin, CreateView):
     """Vue pour créer un nouveau produit"""
@@ -70,6 +99,11 @@ class ProductDetailView(LoginRequiredMixin, DetailView):
     template_name = 'inventory/product_detail.html'
     context_object_name = 'product'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['balances'] = self.object.balances.select_related('location').order_by('location__name')
+        return context
+
 class ProductUpdateView(PermissionRequiredMixin, UpdateView):
     """Vue pour modifier un produit"""
     permission_required = 'inventory.change_product'
@@ -132,7 +166,7 @@ class CategoryCreateView(PermissionRequiredMixin, CreateView):
 class StockMovementCreateView(LoginRequiredMixin, CreateView):
     """Vue pour créer un nouveau mouvement de stock"""
     model = StockMovement
-    fields = ['product', 'movement_type', 'quantity', 'reason']
+    fields = ['product', 'movement_type', 'quantity', 'location', 'destination', 'unit_cost', 'reason']
     template_name = 'inventory/stock_movement_form.html'
     success_url = reverse_lazy('stock_movement_list')
 
@@ -146,109 +180,181 @@ class StockMovementCreateView(LoginRequiredMixin, CreateView):
         return context
 
 @login_required
+def stock_session_list(request):
+    """Sessions de réception et d'inventaire, avec création d'une nouvelle session"""
+    if request.method == 'POST':
+        form = StockSessionForm(request.POST)
+        if form.is_valid():
+            form.instance.created_by = request.user
+            session = form.save()
+            return redirect('stock_session_detail', pk=session.pk)
+    else:
+        form = StockSessionForm(initial={'location': request.user.location_id or Location.default().pk})
+    sessions = StockSession.objects.select_related('created_by', 'location').annotate(line_count=Count('lines'))[:50]
+    return render(request, 'inventory/stock_session_list.html', {'sessions': sessions, 'form': form})
+
+@login_required
+def stock_session_detail(request, pk):
+    """Saisie (scan) des lignes d'une session en brouillon"""
+    session = get_object_or_404(StockSession, pk=pk)
+    form = StockScanForm()
+    if request.method == 'POST' and session.is_draft:
+        form = StockScanForm(request.POST)
+        if form.is_valid():
+            session.scan(form.product, form.cleaned_data['quantity'], form.cleaned_data['unit_cost'])
+            return redirect('stock_session_detail', pk=session.pk)
+
+    lines = session.lines.select_related('product')
+    summary = lines.aggregate(line_count=Count('id'), total_quantity=Sum('quantity'))
+    order = '-pk' if session.is_draft else '-difference'
+    return render(request, 'inventory/stock_session_detail.html', {
+        'session': session,
+        'form': form,
+        'lines': lines.order_by(order)[:200],
+        'summary': summary,
+    })
+
+@login_required
+def stock_session_line_delete(request, pk, line_pk):
+    """Retire une ligne d'une session en brouillon"""
+    session = get_object_or_404(StockSession, pk=pk)
+    if request.method == 'POST' and session.is_draft:
+        session.lines.filter(pk=line_pk).delete()
+    return redirect('stock_session_detail', pk=session.pk)
+
+@login_required
+def stock_session_commit(request, pk):
+    """Valide une session : tous les mouvements sont écrits en une transaction"""
+    session = get_object_or_404(StockSession, pk=pk)
+    if request.method == 'POST' and session.is_draft:
+        try:
+            session.commit(user=request.user)
+        except ValidationError as error:
+            session.refresh_from_db()
+            # Validée entre-temps (double soumission) : rien à signaler
+            if session.is_draft:
+                messages.error(request, ' '.join(error.messages))
+    return redirect('stock_session_detail', pk=session.pk)
+
+@login_required
+@conditional_page
 def product_detail_json(request, pk):
-    """Retourne les détails d'un produit en JSON pour les calculs en JS"""
-    product = get_object_or_404(Product, pk=pk)
+    """
+    Retourne les détails d'un produit en JSON pour les calculs en JS. Le calcul
+    tient en une requête : l'ETag est celui du contenu, le 304 évite le transfert.
+    """
+    product = get_object_or_404(Product.with_available(), pk=pk)
     return JsonResponse({
         'id': product.id,
         'name': product.name,
         'selling_price': float(product.selling_price),
         'quantity': product.quantity,
+        'available': product.available,
     })
 
+@login_required
+def stock_reservation_hold(request):
+    """
+    Réserve la quantité d'une ligne de vente en cours de saisie (POST : token,
+    product, quantity ; 0 libère). Répond 409 si le stock disponible ne suffit pas.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': "Méthode non autorisée"}, status=405)
+    token = request.POST.get('token', '')
+    try:
+        product_id = int(request.POST.get('product', ''))
+        quantity = max(int(request.POST.get('quantity', '') or 0), 0)
+    except ValueError:
+        return JsonResponse({'error': "Paramètres invalides"}, status=400)
+    if not token or len(token) > 64:
+        return JsonResponse({'error': "Jeton de vente invalide"}, status=400)
+    if not Product.objects.filter(pk=product_id).exists():
+        return JsonResponse({'error': "Produit introuvable"}, status=404)
+    try:
+        available = StockReservation.hold(token, product_id, quantity, user=request.user)
+    except ValidationError as error:
+        return JsonResponse({'error': error.messages[0], 'reserved': False}, status=409)
+    return JsonResponse({'product': product_id, 'quantity': quantity, 'reserved': True, 'available': available})
+
 @login_required
 def export_products_csv(request):
-    """Exporte la liste des produits en CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="produits.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Nom', 'Catégorie', 'Prix Achat', 'Prix Vente', 'Stock', 'Seuil Alerte'])
-    
-    products = Product.objects.all().select_related('category')
-    for p in products:
-        writer.writerow([p.name, p.category.name, p.purchase_price, p.selling_price, p.quantity, p.alert_threshold])
-    
-    return response
+    """Exporte la liste des produits en CSV (fichier généré par le worker)"""
+    job = enqueue('inventory.products_csv', request.user, version=make_etag(Product.data_version()))
+    return redirect('job_detail', pk=job.pk)
+
+@login_required
+@permission_required('inventory.add_product', raise_exception=True)
+def product_import(request):
+    """Importe ou met à jour un catalogue produit depuis un fichier CSV / XLSX"""
+    result = None
+    if request.method == 'POST':
+        form = ProductImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_products(upload, upload.name, user=request.user)
+            except ValueError as error:
+                form.add_error('file', str(error))
+    else:
+        form = ProductImportForm()
+    return render(request, 'inventory/product_import.html', {'form': form, 'result': result, 'title': 'Importer des produits'})
+
+def _report_etag(request):
+    """ETag des rapports de stock : demandeur, paramètres, jour et version du stock"""
+    if request.GET.get('background'):
+        return None
+    return make_etag(request.user.pk, request.GET.urlencode(), timezone.localdate(), Product.data_version())
 
 @login_required
+@reporting_reads()
+@etag(_report_etag)
 def stock_entry_report(request):
     """Génère un rapport des entrées de stock sur une période donnée"""
     start_date = request.GET.get('start_date', '')
     end_date = request.GET.get('end_date', '')
-    
-    movements = StockMovement.objects.filter(movement_type=StockMovement.MovementType.ENTRY).select_related('product', 'user').order_by('date')
-    
-    if start_date:
-        movements = movements.filter(date__date__gte=start_date)
-    if end_date:
-        movements = movements.filter(date__date__lte=end_date)
-    
-    # Calcul des totaux
-    total_qty = movements.aggregate(total=Sum('quantity'))['total'] or 0
-    total_value = 0
-    for mov in movements:
-        total_value += mov.quantity * mov.product.purchase_price
-
-    context = {
-        'movements': movements,
-        'start_date': start_date,
-        'end_date': end_date,
-        'total_qty': total_qty,
-        'total_value': total_value,
-        'today': timezone.now()
-    }
-    return render(request, 'inventory/stock_entry_report.html', context)
+    if request.GET.get('background'):
+        job = enqueue('inventory.stock_entry_report', request.user, start_date=start_date, end_date=end_date)
+        return redirect('job_detail', pk=job.pk)
+    return render(request, 'inventory/stock_entry_report.html', stock_entry_report_context(start_date, end_date))
 
 @login_required
 @permission_required('inventory.add_product', raise_exception=True)
+@reporting_reads()
+def replenishment_report(request):
+    """Produits à réapprovisionner selon la dernière prévision (commande forecast_replenishment)"""
+    show_all = request.GET.get('all') == '1'
+    forecasts = ReplenishmentForecast.objects.select_related('product__category')
+    if not show_all:
+        forecasts = forecasts.filter(reorder_quantity__gt=0)
+    forecasts = forecasts.order_by(F('days_of_cover').asc(nulls_last=True), '-daily_demand')
+
+    totals = forecasts.aggregate(
+        count=Count('pk'),
+        order_value=Sum(F('reorder_quantity') * F('product__purchase_price'), output_field=DecimalField()),
+    )
+    return render(request, 'inventory/replenishment_report.html', {
+        'forecasts': forecasts[:500],
+        'totals': totals,
+        'show_all': show_all,
+        'computed_at': ReplenishmentForecast.objects.values_list('computed_at', flat=True).first(),
+    })
+
+@login_required
+@permission_required('inventory.add_product', raise_exception=True)
+@reporting_reads()
+@etag(_report_etag)
 def inventory_report(request):
     """Génère un état de l'inventaire complet à l'instant T avec regroupement par catégorie"""
-    products = Product.objects.all().select_related('category').order_by('category__name', 'name')
-    
-    # Regroupement par catégorie avec sous-totaux
-    categories_list = Category.objects.filter(products__isnull=False).distinct().order_by('name')
-    report_data = []
-    
-    for cat in categories_list:
-        cat_products = products.filter(category=cat)
-        cat_qty = 0
-        cat_purchase_value = 0
-        cat_selling_value = 0
-        for p in cat_products:
-            cat_qty += p.quantity
-            cat_purchase_value += p.quantity * p.purchase_price
-            cat_selling_value += p.quantity * p.selling_price
-        
-        report_data.append({
-            'category': cat,
-            'products': cat_products,
-            'subtotal_qty': cat_qty,
-            'subtotal_purchase_value': cat_purchase_value,
-            'subtotal_selling_value': cat_selling_value,
-        })
-
-    # Calcul des totaux globaux
-    summary = products.aggregate(
-        total_items=Count('id'),
-        total_qty=Sum('quantity'),
-    )
-    
-    # Calcul manuel de la valeur totale pour éviter les erreurs d'agrégation d'expressions complexes selon les versions de DB
-    total_purchase_value = 0
-    total_selling_value = 0
-    for p in products:
-        total_purchase_value += p.quantity * p.purchase_price
-        total_selling_value += p.quantity * p.selling_price
-
-    context = {
-        'report_data': report_data,
-        'summary': {
-            'total_items': summary['total_items'],
-            'total_qty': summary['total_qty'],
-            'total_purchase_value': total_purchase_value,
-            'total_selling_value': total_selling_value,
-        },
-        'today': timezone.now()
-    }
+    abc_filter = request.GET.get('abc', '')
+    date = request.GET.get('date', '')
+    location = request.GET.get('location', '')
+    try:
+        as_of = parse_date(date) if date else None
+    except ValueError:
+        # Format valide mais date inexistante (2024-13-45)
+        return HttpResponseBadRequest("Date invalide")
+    if request.GET.get('background'):
+        job = enqueue('inventory.inventory_report', request.user, abc=abc_filter, date=date, location=location)
+        return redirect('job_detail', pk=job.pk)
+    context = inventory_report_context(abc_filter, as_of, location)
     return render(request, 'inventory/inventory_report.html', context)
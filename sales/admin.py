@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Customer, Invoice, InvoiceItem
+from .models import Customer, DailyCollection, Invoice, InvoiceItem, Payment
 
 class InvoiceItemInline(admin.TabularInline):
     model = InvoiceItem
@@ -7,7 +7,8 @@ class InvoiceItemInline(admin.TabularInline):
 
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'phone', 'address')
+    list_display = ('name', 'email', 'phone', 'invoice_count', 'total_spent', 'balance', 'last_purchase_at', 'segment')
+    list_filter = ('segment',)
     search_fields = ('name', 'email', 'phone')
 
 @admin.register(Invoice)
@@ -23,3 +24,41 @@ class InvoiceAdmin(admin.ModelAdmin):
         if not obj.user:
             obj.user = request.user
         super().save_model(request, obj, form, change)
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ('invoice', 'amount', 'method', 'date', 'user')
+    list_filter = ('method', 'date', 'user')
+    search_fields = ('invoice__number', 'invoice__customer__name')
+    raw_id_fields = ('invoice',)
+
+    def get_readonly_fields(self, request, obj=None):
+        # Un paiement enregistré ne se modifie pas (seule sa note) : il s'annule par suppression
+        if obj is not None:
+            return ('invoice', 'amount', 'method', 'date', 'user')
+        return ()
+
+    def save_model(self, request, obj, form, change):
+        if not obj.user:
+            obj.user = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_actions(self, request):
+        # La suppression groupée contournerait Payment.delete() et la mise à jour des factures
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+@admin.register(DailyCollection)
+class DailyCollectionAdmin(admin.ModelAdmin):
+    list_display = ('day', 'user', 'method', 'amount', 'payment_count')
+    list_filter = ('method', 'user')
+    date_hierarchy = 'day'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,140 @@
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.cache import bump_version
+from inventory.models import Product, batched, update_by_value
+from .models import Customer, InvoiceItem
+
+
+def abc_classes(start, thresholds=None):
+    """
+    Classe ABC des produits vendus depuis `start` : chiffre d'affaires par produit
+    en une requête groupée triée, puis part cumulée calculée par NumPy. Un produit
+    est en A tant que les produits qui le précèdent couvrent moins du premier seuil.
+    Retourne {product_id: classe}.
+    """
+    a_share, b_share = thresholds or settings.STOCK_ABC_THRESHOLDS
+    rows = list(
+        InvoiceItem.objects.filter(invoice__date__gte=start)
+        .values('product_id')
+        .annotate(revenue=Sum('subtotal'))
+        .filter(revenue__gt=0)
+        .order_by('-revenue', 'product_id')
+        .values_list('product_id', 'revenue')
+    )
+    if not rows:
+        return {}
+    product_ids, revenue = zip(*rows)
+    revenue = np.array(revenue, dtype=np.float64)
+    share_before = (np.cumsum(revenue) - revenue) / revenue.sum()
+    classes = np.where(share_before < a_share, Product.AbcClass.A, np.where(share_before < b_share, Product.AbcClass.B, Product.AbcClass.C))
+    return dict(zip(product_ids, classes.tolist()))
+
+
+def classify_products(window_days=None, thresholds=None):
+    """
+    Enregistre la classe ABC de tous les produits (non vendus sur la fenêtre : classe C).
+    Seules les classes modifiées sont écrites, une requête par classe.
+    Retourne {classe: nombre de produits}.
+    """
+    window_days = window_days or settings.STOCK_ABC_WINDOW_DAYS
+    classes = abc_classes(timezone.now() - datetime.timedelta(days=window_days), thresholds)
+
+    current = dict(Product.objects.values_list('pk', 'abc_class'))
+    target = {pk: classes.get(pk, Product.AbcClass.C) for pk in current}
+    update_by_value(Product.objects.all(), 'abc_class', {
+        pk: abc_class for pk, abc_class in target.items() if current[pk] != abc_class
+    })
+    bump_version('inventory')
+
+    counts = dict.fromkeys(Product.AbcClass.values, 0)
+    for abc_class in target.values():
+        counts[abc_class] += 1
+    return counts
+
+
+def quintile_scores(values):
+    """
+    Score de 1 à 5 selon la part des valeurs inférieures ou égales (les ex aequo
+    ont le même score). Plus la valeur est grande, plus le score est élevé.
+    """
+    ordered = np.sort(values)
+    share = np.searchsorted(ordered, values, side='right') / len(values)
+    return np.clip(np.ceil(share * 5), 1, 5).astype(np.int64)
+
+
+def rfm_segments(recency, frequency, monetary):
+    """Segment de chaque client d'après ses scores RFM (tableaux NumPy alignés)"""
+    value = (frequency + monetary) / 2
+    Segment = Customer.Segment
+    return np.select(
+        [
+            (recency >= 4) & (value >= 4),
+            (recency >= 3) & (value >= 3),
+            recency >= 4,
+            (recency <= 2) & (value >= 3),
+            recency <= 1,
+        ],
+        [Segment.CHAMPIONS, Segment.LOYAL, Segment.PROMISING, Segment.AT_RISK, Segment.LOST],
+        default=Segment.NEEDS_ATTENTION,
+    )
+
+
+def segment_customers():
+    """
+    Calcule les scores RFM (récence du dernier achat, nombre de factures, total
+    des achats) à partir des agrégats stockés sur Customer, sans relire les
+    factures. Les clients sans facture n'ont ni score ni segment. Seules les
+    valeurs modifiées sont écrites, une requête par valeur distincte.
+    Retourne {segment: nombre de clients}.
+    """
+    rows = list(
+        Customer.objects.order_by('pk').values_list(
+            'pk', 'last_purchase_at', 'invoice_count', 'total_spent',
+            'recency_score', 'frequency_score', 'monetary_score', 'segment',
+        )
+    )
+    buyers = [row for row in rows if row[1] is not None and row[2] > 0]
+    target = {row[0]: (None, None, None, '') for row in rows}
+    if buyers:
+        pks, last, count, spent = (list(column) for column in zip(*(row[:4] for row in buyers)))
+        recency = quintile_scores(np.array([date.timestamp() for date in last], dtype=np.float64))
+        frequency = quintile_scores(np.array(count, dtype=np.float64))
+        monetary = quintile_scores(np.array(spent, dtype=np.float64))
+        segments = rfm_segments(recency, frequency, monetary)
+        target.update(zip(pks, zip(recency.tolist(), frequency.tolist(), monetary.tolist(), segments.tolist())))
+
+    for index, field in enumerate(('recency_score', 'frequency_score', 'monetary_score', 'segment')):
+        update_by_value(Customer.objects.all(), field, {
+            row[0]: target[row[0]][index] for row in rows if row[4 + index] != target[row[0]][index]
+        })
+    bump_version('sales')
+
+    counts = dict.fromkeys(Customer.Segment.values, 0)
+    for _, _, _, segment in target.values():
+        if segment:
+            counts[segment] += 1
+    return counts
+
+
+def reconcile_customer_aggregates(batch_size=500):
+    """
+    Compare les agrégats stockés aux factures (une requête groupée) et recalcule
+    ceux des clients en écart. Retourne le nombre de clients corrigés.
+    """
+    expected = Customer.expected_aggregates()
+    drifted = [
+        pk for pk, count, spent, balance, last in Customer.objects.values_list(
+            'pk', 'invoice_count', 'total_spent', 'balance', 'last_purchase_at'
+        )
+        if expected.get(pk, (0, 0, 0, None)) != (count, spent, balance, last)
+    ]
+    for pks in batched(drifted, batch_size):
+        Customer.rebuild_aggregates(Customer.objects.filter(pk__in=pks))
+    if drifted:
+        bump_version('sales')
+    return len(drifted)
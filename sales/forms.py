@@ -1,15 +1,35 @@
 from django import forms
 from django.forms import inlineformset_factory
-from .models import Invoice, InvoiceItem
+from .models import Invoice, InvoiceItem, Payment
 
 class InvoiceForm(forms.ModelForm):
+    # Le montant payé et le statut découlent des paiements : la saisie crée un Payment
+    payment_amount = forms.DecimalField(max_digits=12, decimal_places=2, min_value=0, required=False, label="Montant encaissé")
+    payment_method = forms.ChoiceField(choices=Payment.Method.choices, initial=Payment.Method.CASH, label="Mode de paiement")
+    # Identifie la vente en cours de saisie pour ses réservations de stock (StockReservation)
+    reservation_token = forms.CharField(max_length=64, required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = Invoice
-        fields = ['customer', 'total_amount', 'paid_amount', 'status']
+        fields = ['customer', 'total_amount']
         widgets = {
             'total_amount': forms.NumberInput(attrs={'readonly': 'readonly'}),
         }
 
+class PaymentForm(forms.ModelForm):
+    class Meta:
+        model = Payment
+        fields = ['amount', 'method', 'note']
+        widgets = {
+            'amount': forms.NumberInput(attrs={'step': '0.01', 'min': '0.01'}),
+        }
+
+    def clean_amount(self):
+        amount = self.cleaned_data['amount']
+        if amount <= 0:
+            raise forms.ValidationError("Le montant doit être positif.")
+        return amount
+
 class InvoiceItemForm(forms.ModelForm):
     class Meta:
         model = InvoiceItem
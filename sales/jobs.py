@@ -0,0 +1,26 @@
+import csv
+import io
+
+from core.jobs import register
+from core.reporting import reporting_reads
+from .models import Invoice
+
+
+@register('sales.invoices_csv', "Export des factures (CSV)")
+@reporting_reads()
+def invoices_csv(job):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['Numéro', 'Date', 'Client', 'Statut', 'Total', 'Payé', 'Reste'])
+    invoices = Invoice.objects.filter(user=job.user).select_related('customer').order_by('date')
+    for inv in invoices.iterator(chunk_size=2000):
+        writer.writerow([
+            inv.number,
+            inv.date.strftime('%Y-%m-%d'),
+            inv.customer.name if inv.customer else '',
+            inv.get_status_display(),
+            inv.total_amount,
+            inv.paid_amount,
+            inv.remaining,
+        ])
+    return 'factures.csv', output.getvalue()
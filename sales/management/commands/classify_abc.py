@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+from sales.classification import classify_products
+
+
+class Command(BaseCommand):
+    help = 'Classifies products as A/B/C by their cumulative share of sales revenue over a rolling window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window-days', type=int, help='Days of sales analysed (default STOCK_ABC_WINDOW_DAYS)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        counts = classify_products(window_days=options['window_days'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Classified {sum(counts.values())} product(s): '
+            + ', '.join(f'{abc_class}={count}' for abc_class, count in counts.items())
+            + f' in {time.monotonic() - started:.1f}s'
+        ))
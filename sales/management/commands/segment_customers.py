@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from sales.classification import reconcile_customer_aggregates, segment_customers
+
+
+class Command(BaseCommand):
+    help = 'Scores customers on recency, frequency and monetary value (RFM) from their stored aggregates and assigns a segment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Recompute stored aggregates from invoices first, fixing any drift')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['reconcile']:
+            fixed = reconcile_customer_aggregates()
+            self.stdout.write(f'Reconciled aggregates: {fixed} customer(s) corrected')
+        counts = segment_customers()
+        self.stdout.write(self.style.SUCCESS(
+            f'Segmented {sum(counts.values())} customer(s): '
+            + ', '.join(f'{segment}={count}' for segment, count in counts.items())
+            + f' in {time.monotonic() - started:.1f}s'
+        ))
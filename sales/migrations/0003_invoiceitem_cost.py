@@ -0,0 +1,35 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:41
+
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery
+
+
+def backfill_item_costs(apps, schema_editor):
+    # Les coûts historiques sont inconnus : on retient le prix d'achat actuel du produit
+    InvoiceItem = apps.get_model('sales', 'InvoiceItem')
+    Product = apps.get_model('inventory', 'Product')
+    purchase_price = Product.objects.filter(pk=OuterRef('product_id')).values('purchase_price')[:1]
+    InvoiceItem.objects.filter(product__isnull=False).update(unit_cost=Subquery(purchase_price))
+    InvoiceItem.objects.filter(unit_cost__isnull=False).update(total_cost=F('unit_cost') * F('quantity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_cost_layers'),
+        ('sales', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='total_cost',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=12, null=True, verbose_name='Coût de revient'),
+        ),
+        migrations.AddField(
+            model_name='invoiceitem',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, editable=False, max_digits=12, null=True, verbose_name='Coût unitaire'),
+        ),
+        migrations.RunPython(backfill_item_costs, migrations.RunPython.noop),
+    ]
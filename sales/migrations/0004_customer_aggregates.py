@@ -0,0 +1,73 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:08
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_aggregates(apps, schema_editor):
+    Customer = apps.get_model('sales', 'Customer')
+    Invoice = apps.get_model('sales', 'Invoice')
+    invoices = Invoice.objects.filter(customer_id=OuterRef('pk')).values('customer_id').order_by()
+
+    def aggregate(expression):
+        return Subquery(invoices.annotate(value=expression).values('value'))
+
+    zero = Value(0, output_field=DecimalField())
+    Customer.objects.update(
+        invoice_count=Coalesce(aggregate(Count('id')), 0),
+        total_spent=Coalesce(aggregate(Sum('total_amount')), zero),
+        balance=Coalesce(aggregate(Sum(F('total_amount') - F('paid_amount'))), zero),
+        last_purchase_at=aggregate(Max('date')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0003_invoiceitem_cost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='balance',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Solde dû'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='frequency_score',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, verbose_name='Score fréquence'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='invoice_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Nombre de factures'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='last_purchase_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True, verbose_name='Dernier achat'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='monetary_score',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, verbose_name='Score montant'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='recency_score',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, verbose_name='Score récence'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='segment',
+            field=models.CharField(blank=True, choices=[('CHAMPIONS', 'Meilleurs clients'), ('LOYAL', 'Fidèles'), ('PROMISING', 'Prometteurs'), ('NEEDS_ATTENTION', 'À relancer'), ('AT_RISK', 'À risque'), ('LOST', 'Perdus')], db_index=True, editable=False, max_length=20, verbose_name='Segment'),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=14, verbose_name='Total des achats'),
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
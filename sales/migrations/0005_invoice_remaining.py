@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:10
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def populate_remaining(apps, schema_editor):
+    Invoice = apps.get_model('sales', 'Invoice')
+    Invoice.objects.update(remaining=F('total_amount') - F('paid_amount'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_customer_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='remaining',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Reste à payer'),
+        ),
+        migrations.RunPython(populate_remaining, migrations.RunPython.noop),
+    ]
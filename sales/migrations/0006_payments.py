@@ -0,0 +1,92 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+from django.utils import timezone
+
+
+
+def populate_payments(apps, schema_editor):
+    Invoice = apps.get_model('sales', 'Invoice')
+    Payment = apps.get_model('sales', 'Payment')
+    DailyCollection = apps.get_model('sales', 'DailyCollection')
+
+    # Le montant payé saisi à la main devient un paiement unique à la date de la facture
+    payments, collections = [], {}
+    invoices = Invoice.objects.filter(paid_amount__gt=0).values_list('pk', 'paid_amount', 'date', 'user_id')
+    for pk, paid_amount, date, user_id in invoices.iterator():
+        payments.append(Payment(invoice_id=pk, amount=paid_amount, method='CASH', date=date, user_id=user_id,
+                                note="Reprise du montant payé saisi sur la facture"))
+        key = (timezone.localdate(date), user_id)
+        amount, count = collections.get(key, (0, 0))
+        collections[key] = (amount + paid_amount, count + 1)
+    Payment.objects.bulk_create(payments, batch_size=2000)
+    DailyCollection.objects.bulk_create([
+        DailyCollection(day=day, user_id=user_id, method='CASH', amount=amount, payment_count=count)
+        for (day, user_id), (amount, count) in collections.items()
+    ], batch_size=2000)
+
+    Invoice.objects.update(status=Case(
+        When(LessThanOrEqual(F('paid_amount'), 0), then=Value('UNPAID')),
+        When(GreaterThanOrEqual(F('paid_amount'), F('total_amount')), then=Value('PAID')),
+        default=Value('PARTIAL'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_invoice_remaining'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='invoice',
+            name='status',
+            field=models.CharField(choices=[('PAID', 'Payée'), ('UNPAID', 'Impayée'), ('PARTIAL', 'Partiellement payée')], default='UNPAID', editable=False, max_length=20, verbose_name='Statut'),
+        ),
+        migrations.AlterField(
+            model_name='invoice',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Montant payé'),
+        ),
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Montant')),
+                ('method', models.CharField(choices=[('CASH', 'Espèces'), ('MOBILE_MONEY', 'Mobile money'), ('CARD', 'Carte bancaire'), ('TRANSFER', 'Virement')], default='CASH', max_length=20, verbose_name='Mode de paiement')),
+                ('date', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Date')),
+                ('note', models.CharField(blank=True, max_length=200, verbose_name='Note')),
+                ('invoice', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='sales.invoice', verbose_name='Facture')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Encaissé par')),
+            ],
+            options={
+                'verbose_name': 'Paiement',
+                'verbose_name_plural': 'Paiements',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCollection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('method', models.CharField(choices=[('CASH', 'Espèces'), ('MOBILE_MONEY', 'Mobile money'), ('CARD', 'Carte bancaire'), ('TRANSFER', 'Virement')], max_length=20, verbose_name='Mode de paiement')),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Montant encaissé')),
+                ('payment_count', models.IntegerField(default=0, verbose_name='Nombre de paiements')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Encaissé par')),
+            ],
+            options={
+                'verbose_name': 'Encaissement journalier',
+                'verbose_name_plural': 'Encaissements journaliers',
+                'constraints': [models.UniqueConstraint(fields=('day', 'user', 'method'), name='unique_daily_collection')],
+            },
+        ),
+        migrations.RunPython(populate_payments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_locations'),
+        ('sales', '0007_invoice_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='location',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='invoices', to='inventory.location', verbose_name='Emplacement'),
+        ),
+    ]
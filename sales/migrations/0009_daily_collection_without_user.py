@@ -0,0 +1,32 @@
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_unattributed(apps, schema_editor):
+    """Regroupe les lignes sans vendeur en double (même jour et mode) avant la contrainte"""
+    DailyCollection = apps.get_model('sales', 'DailyCollection')
+    duplicates = (
+        DailyCollection.objects.filter(user=None).values('day', 'method')
+        .annotate(rows=Count('pk'), total=Sum('amount'), payments=Sum('payment_count')).filter(rows__gt=1)
+    )
+    for group in duplicates:
+        rows = DailyCollection.objects.filter(user=None, day=group['day'], method=group['method']).order_by('pk')
+        kept = rows.first()
+        rows.exclude(pk=kept.pk).delete()
+        kept.amount, kept.payment_count = group['total'], group['payments']
+        kept.save(update_fields=['amount', 'payment_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0008_invoice_location'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_unattributed, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailycollection',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('day', 'method'), name='unique_daily_collection_without_user'),
+        ),
+    ]
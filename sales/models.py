@@ -1,16 +1,41 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
-from django.db.models import Sum
-from inventory.models import Product, StockMovement
+from django.db.models import Case, Count, F, Max, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+from django.utils import timezone
+from core.conditional import table_state
+from inventory.models import Location, Product, StockMovement
 import datetime
+from decimal import Decimal
 
 class Customer(models.Model):
+    class Segment(models.TextChoices):
+        CHAMPIONS = "CHAMPIONS", "Meilleurs clients"
+        LOYAL = "LOYAL", "Fidèles"
+        PROMISING = "PROMISING", "Prometteurs"
+        NEEDS_ATTENTION = "NEEDS_ATTENTION", "À relancer"
+        AT_RISK = "AT_RISK", "À risque"
+        LOST = "LOST", "Perdus"
+
     name = models.CharField(max_length=200, verbose_name="Nom")
     email = models.EmailField(blank=True, null=True, verbose_name="Email")
     phone = models.CharField(max_length=20, blank=True, null=True, verbose_name="Téléphone")
     address = models.TextField(blank=True, null=True, verbose_name="Adresse")
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
 
+    # Agrégats tenus à jour à chaque écriture de facture (voir apply_invoice_change)
+    invoice_count = models.IntegerField(default=0, editable=False, verbose_name="Nombre de factures")
+    total_spent = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, db_index=True, verbose_name="Total des achats")
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0, editable=False, db_index=True, verbose_name="Solde dû")
+    last_purchase_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True, verbose_name="Dernier achat")
+
+    # Segmentation RFM recalculée en masse (commande segment_customers), scores de 1 à 5
+    recency_score = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, verbose_name="Score récence")
+    frequency_score = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, verbose_name="Score fréquence")
+    monetary_score = models.PositiveSmallIntegerField(null=True, blank=True, editable=False, verbose_name="Score montant")
+    segment = models.CharField(max_length=20, choices=Segment.choices, blank=True, editable=False, db_index=True, verbose_name="Segment")
+
     class Meta:
         verbose_name = "Client"
         verbose_name_plural = "Clients"
@@ -18,6 +43,69 @@ class Customer(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def apply_invoice_change(cls, previous, current):
+        """
+        Répercute le passage d'une facture de l'état `previous` à l'état `current`
+        (tuples Invoice.AGGREGATE_FIELDS, None pour une facture inexistante).
+        """
+        deltas = {}
+        for state, sign in ((previous, -1), (current, 1)):
+            if state is None or state[0] is None:
+                continue
+            customer_id, total_amount, paid_amount, date = state
+            delta = deltas.setdefault(customer_id, [0, 0, 0])
+            delta[0] += sign
+            delta[1] += sign * total_amount
+            delta[2] += sign * (total_amount - paid_amount)
+        for customer_id, (count, spent, balance) in deltas.items():
+            if count or spent or balance:
+                cls.objects.filter(pk=customer_id).update(
+                    invoice_count=F('invoice_count') + count,
+                    total_spent=F('total_spent') + spent,
+                    balance=F('balance') + balance,
+                )
+
+        if current is not None and current[0] is not None:
+            cls.objects.filter(pk=current[0]).filter(
+                Q(last_purchase_at__isnull=True) | Q(last_purchase_at__lt=current[3])
+            ).update(last_purchase_at=current[3])
+        if previous is not None and previous[0] is not None and (current is None or current[0] != previous[0]):
+            # Facture retirée du client : son dernier achat est relu
+            cls.objects.filter(pk=previous[0]).update(
+                last_purchase_at=Invoice.objects.filter(customer_id=previous[0]).values('customer_id').annotate(last=Max('date')).values('last')
+            )
+
+    @classmethod
+    def expected_aggregates(cls):
+        """
+        Recalcule les agrégats depuis la table Invoice en une requête groupée.
+        Retourne {customer_id: (nombre, total, solde dû, dernier achat)}.
+        """
+        rows = Invoice.objects.filter(customer__isnull=False).values('customer_id').annotate(
+            count=Count('id'),
+            spent=Sum('total_amount'),
+            balance=Sum('remaining'),
+            last=Max('date'),
+        ).order_by()
+        return {row['customer_id']: (row['count'], row['spent'], row['balance'], row['last']) for row in rows}
+
+    @classmethod
+    def rebuild_aggregates(cls, queryset=None):
+        """Recalcule les agrégats stockés des clients de `queryset` (une requête UPDATE corrélée)"""
+        invoices = Invoice.objects.filter(customer_id=OuterRef('pk')).values('customer_id').order_by()
+
+        def aggregate(expression):
+            return Subquery(invoices.annotate(value=expression).values('value'))
+
+        zero = Value(0, output_field=models.DecimalField())
+        return (cls.objects.all() if queryset is None else queryset).update(
+            invoice_count=Coalesce(aggregate(Count('id')), 0),
+            total_spent=Coalesce(aggregate(Sum('total_amount')), zero),
+            balance=Coalesce(aggregate(Sum('remaining')), zero),
+            last_purchase_at=aggregate(Max('date')),
+        )
+
 class Invoice(models.Model):
     class Status(models.TextChoices):
         PAID = "PAID", "Payée"
@@ -27,16 +115,42 @@ class Invoice(models.Model):
     number = models.CharField(max_length=50, unique=True, editable=False, verbose_name="Numéro de facture")
     customer = models.ForeignKey(Customer, on_delete=models.SET_NULL, null=True, verbose_name="Client")
     date = models.DateTimeField(auto_now_add=True, verbose_name="Date")
-    status = models.CharField(max_length=20, choices=Status.choices, default=Status.UNPAID, verbose_name="Statut")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.UNPAID, editable=False, verbose_name="Statut")
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Montant total")
-    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name="Montant payé")
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, verbose_name="Montant payé")
+    # Reste à payer stocké (total - payé) pour filtrer et regrouper les créances sur une colonne indexée
+    remaining = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False, db_index=True, verbose_name="Reste à payer")
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Vendeur")
+    # Emplacement du vendeur à la création : sorties, corrections et annulations y sont imputées
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, null=True, blank=True, editable=False, related_name='invoices', verbose_name="Emplacement")
+    # Dernière modification (y compris paiements), pour les jetons de version des GET conditionnels
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Modifiée le")
+
+    # Champs dont dépendent les agrégats du client (voir Customer.apply_invoice_change)
+    AGGREGATE_FIELDS = ('customer_id', 'total_amount', 'paid_amount', 'date')
 
     class Meta:
         verbose_name = "Facture"
         verbose_name_plural = "Factures"
 
+    def aggregate_state(self):
+        return tuple(getattr(self, field) for field in self.AGGREGATE_FIELDS)
+
     def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                # État enregistré, verrouillé jusqu'à la fin de la transaction
+                previous = Invoice.objects.select_for_update().filter(pk=self.pk).values_list(*self.AGGREGATE_FIELDS).first()
+            if previous is not None:
+                # Le montant payé n'évolue que par les paiements (Payment.save / delete)
+                self.paid_amount = previous[2]
+            self._save_invoice(*args, **kwargs)
+            current = self.aggregate_state()
+            if previous != current:
+                Customer.apply_invoice_change(previous, current)
+
+    def _save_invoice(self, *args, **kwargs):
         if not self.number:
             year = datetime.date.today().year
             last_invoice = Invoice.objects.filter(number__startswith=str(year)).order_by('id').last()
@@ -49,6 +163,8 @@ class Invoice(models.Model):
             else:
                 new_num = 1
             self.number = f"{year}-{new_num}"
+        self.remaining = self.total_amount - self.paid_amount
+        self.status = self.status_for(self.total_amount, self.paid_amount)
         super().save(*args, **kwargs)
     
     def __str__(self):
@@ -62,12 +178,54 @@ class Invoice(models.Model):
     def remaining_amount(self):
         return self.total_amount - self.paid_amount
 
+    @classmethod
+    def data_version(cls, user):
+        """Jeton de version des factures d'un vendeur (nombre, dernière facture, dernière modification)"""
+        return table_state(cls.objects.filter(user=user), 'updated_at')
+
+    @classmethod
+    def status_for(cls, total_amount, paid_amount):
+        """Statut découlant des montants (même règle que status_expression)"""
+        if paid_amount <= 0:
+            return cls.Status.UNPAID
+        if paid_amount >= total_amount:
+            return cls.Status.PAID
+        return cls.Status.PARTIAL
+
+    @classmethod
+    def status_expression(cls, paid_amount):
+        """Statut calculé en base pour un montant payé exprimé en SQL"""
+        return Case(
+            When(LessThanOrEqual(paid_amount, 0), then=Value(cls.Status.UNPAID)),
+            When(GreaterThanOrEqual(paid_amount, F('total_amount')), then=Value(cls.Status.PAID)),
+            default=Value(cls.Status.PARTIAL),
+        )
+
+    def apply_payment(self, amount):
+        """
+        Ajoute `amount` (négatif pour une annulation) au montant payé par une mise
+        à jour atomique en base, recalcule le statut et le solde du client, puis
+        recharge les montants de l'instance.
+        """
+        paid_amount = F('paid_amount') + amount
+        Invoice.objects.filter(pk=self.pk).update(
+            paid_amount=paid_amount,
+            remaining=F('remaining') - amount,
+            status=self.status_expression(paid_amount),
+            updated_at=timezone.now(),
+        )
+        if self.customer_id:
+            Customer.objects.filter(pk=self.customer_id).update(balance=F('balance') - amount)
+        self.refresh_from_db(fields=['paid_amount', 'remaining', 'status'])
+
 class InvoiceItem(models.Model):
     invoice = models.ForeignKey(Invoice, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, verbose_name="Produit")
     quantity = models.IntegerField(verbose_name="Quantité")
     unit_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Prix unitaire")
     subtotal = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Sous-total")
+    unit_cost = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True, editable=False, verbose_name="Coût unitaire")
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, editable=False, verbose_name="Coût de revient")
 
     class Meta:
         verbose_name = "Ligne de facture"
@@ -86,19 +244,27 @@ class InvoiceItem(models.Model):
                     product=self.product,
                     movement_type='ADJUSTMENT',
                     quantity=-diff, # Si diff > 0 (augmentation vente), mouvement négatif pour le stock
+                    location_id=self.invoice.location_id,
                     reason=f"Correction Vente - Facture {self.invoice.number}",
                     user=self.invoice.user
                 )
+                # Le coût unitaire capturé à la vente reste la référence de la ligne
+                if self.unit_cost is not None:
+                    self.total_cost = (self.unit_cost * self.quantity).quantize(Decimal('0.01'))
         else:
             # Nouvelle ligne
             if self.product:
-                StockMovement.objects.create(
+                movement = StockMovement.objects.create(
                     product=self.product,
                     movement_type='EXIT',
                     quantity=self.quantity,
+                    location_id=self.invoice.location_id,
                     reason=f"Vente - Facture {self.invoice.number}",
                     user=self.invoice.user
                 )
+                # Instantané du coût de revient au moment de la vente
+                self.unit_cost = movement.unit_cost
+                self.total_cost = movement.total_cost
         
         super().save(*args, **kwargs)
         self.update_invoice_total()
@@ -110,6 +276,7 @@ class InvoiceItem(models.Model):
                 product=self.product,
                 movement_type='ENTRY',
                 quantity=self.quantity,
+                location_id=self.invoice.location_id,
                 reason=f"Annulation Ligne - Facture {self.invoice.number}",
                 user=self.invoice.user
             )
@@ -128,3 +295,94 @@ class InvoiceItem(models.Model):
         
     def __str__(self):
         return f"{self.quantity} x {self.product.name if self.product else 'Produit inconnu'}"
+
+
+class Payment(models.Model):
+    """Encaissement sur une facture : chaque écriture met à jour le montant payé de la facture"""
+
+    class Method(models.TextChoices):
+        CASH = "CASH", "Espèces"
+        MOBILE_MONEY = "MOBILE_MONEY", "Mobile money"
+        CARD = "CARD", "Carte bancaire"
+        TRANSFER = "TRANSFER", "Virement"
+
+    # Une facture encaissée ne peut plus être supprimée : annuler d'abord ses paiements
+    invoice = models.ForeignKey(Invoice, on_delete=models.PROTECT, related_name='payments', verbose_name="Facture")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Montant")
+    method = models.CharField(max_length=20, choices=Method.choices, default=Method.CASH, verbose_name="Mode de paiement")
+    date = models.DateTimeField(default=timezone.now, db_index=True, verbose_name="Date")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Encaissé par")
+    note = models.CharField(max_length=200, blank=True, verbose_name="Note")
+
+    class Meta:
+        verbose_name = "Paiement"
+        verbose_name_plural = "Paiements"
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.amount} FCFA - Facture {self.invoice.number}"
+
+    def save(self, *args, **kwargs):
+        # Seule la création répercute le montant : un paiement saisi s'annule puis se ressaisit
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                self.invoice.apply_payment(self.amount)
+                DailyCollection.record(self, 1)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.invoice.apply_payment(-self.amount)
+            DailyCollection.record(self, -1)
+        return result
+
+
+class DailyCollection(models.Model):
+    """Cumul journalier des encaissements par vendeur et mode de paiement, tenu à jour par Payment"""
+    day = models.DateField(verbose_name="Jour")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, verbose_name="Encaissé par")
+    method = models.CharField(max_length=20, choices=Payment.Method.choices, verbose_name="Mode de paiement")
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Montant encaissé")
+    payment_count = models.IntegerField(default=0, verbose_name="Nombre de paiements")
+
+    class Meta:
+        verbose_name = "Encaissement journalier"
+        verbose_name_plural = "Encaissements journaliers"
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'user', 'method'], name='unique_daily_collection'),
+            # NULL est distinct de NULL pour la contrainte ci-dessus : une seule ligne
+            # sans vendeur (supprimé) par jour et mode de paiement
+            models.UniqueConstraint(fields=['day', 'method'], condition=Q(user__isnull=True), name='unique_daily_collection_without_user'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.get_method_display()} : {self.amount} FCFA"
+
+    @classmethod
+    def record(cls, payment, sign):
+        """Ajoute (sign=1) ou retire (sign=-1) un paiement du cumul de son jour"""
+        key = {'day': timezone.localdate(payment.date), 'user_id': payment.user_id, 'method': payment.method}
+        changes = {'amount': F('amount') + sign * payment.amount, 'payment_count': F('payment_count') + sign}
+        if cls.objects.filter(**key).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(**key, amount=sign * payment.amount, payment_count=sign)
+        except IntegrityError:
+            # Ligne du jour créée entre-temps par un autre encaissement
+            cls.objects.filter(**key).update(**changes)
+
+    @classmethod
+    def detach_user(cls, user_id):
+        """
+        Avant la suppression d'un vendeur : ses cumuls passent sans vendeur, reportés
+        sur la ligne sans vendeur de même jour et mode quand elle existe déjà.
+        """
+        for row in cls.objects.filter(user_id=user_id):
+            merged = cls.objects.filter(day=row.day, user=None, method=row.method).update(
+                amount=F('amount') + row.amount, payment_count=F('payment_count') + row.payment_count,
+            )
+            if merged:
+                row.delete()
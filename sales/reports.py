@@ -0,0 +1,143 @@
+import datetime
+
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
+from django.utils import timezone
+
+from .models import DailyCollection, Invoice, InvoiceItem, Payment
+
+# Axes de regroupement du rapport de marge : (libellé, clé de regroupement, libellé de ligne)
+MARGIN_GROUPS = {
+    'product': ("Produit", F('product_id'), F('product__name')),
+    'category': ("Catégorie", F('product__category_id'), F('product__category__name')),
+    'seller': ("Vendeur", F('invoice__user_id'), F('invoice__user__username')),
+    'month': ("Mois", TruncMonth('invoice__date'), TruncMonth('invoice__date')),
+    'day': ("Jour", TruncDate('invoice__date'), TruncDate('invoice__date')),
+}
+
+PERIOD_GROUPS = ('month', 'day')
+
+
+def _margin_aggregates():
+    zero = Value(0, output_field=DecimalField())
+    return {
+        'quantity': Sum('quantity'),
+        'revenue': Coalesce(Sum('subtotal'), zero),
+        'cost': Coalesce(Sum('total_cost'), zero),
+    }
+
+
+def _with_rate(row):
+    row['margin'] = row['revenue'] - row['cost']
+    row['margin_rate'] = row['margin'] * 100 / row['revenue'] if row['revenue'] else None
+    return row
+
+
+def margin_report(items=None, group_by='product'):
+    """
+    Marge brute par axe (produit, catégorie, vendeur, mois, jour) à partir du coût
+    capturé sur chaque ligne de facture : une seule requête groupée plus les totaux.
+    """
+    if items is None:
+        items = InvoiceItem.objects.all()
+    label, key, row_label = MARGIN_GROUPS[group_by]
+
+    rows = (
+        items.annotate(group_key=key, group_label=row_label)
+        .values('group_key', 'group_label')
+        .annotate(**_margin_aggregates())
+        .order_by('group_key' if group_by in PERIOD_GROUPS else '-revenue')
+    )
+    totals = items.aggregate(**_margin_aggregates())
+    totals['quantity'] = totals['quantity'] or 0
+
+    return {
+        'group_by': group_by,
+        'group_label': label,
+        'rows': [_with_rate(row) for row in rows],
+        'totals': _with_rate(totals),
+    }
+
+
+# Tranches d'ancienneté des créances : (clé, libellé, âge minimal en jours, âge maximal inclus)
+AGING_BUCKETS = (
+    ('current', "0–30 jours", 0, 30),
+    ('days_60', "31–60 jours", 31, 60),
+    ('days_90', "61–90 jours", 61, 90),
+    ('older', "Plus de 90 jours", 91, None),
+)
+
+# Axes de regroupement de la balance âgée : (libellé, clé de regroupement, libellé de ligne)
+AGING_GROUPS = {
+    'customer': ("Client", F('customer_id'), F('customer__name')),
+    'seller': ("Vendeur", F('user_id'), F('user__username')),
+}
+
+
+def _aging_aggregates(as_of):
+    zero = Value(0, output_field=DecimalField())
+    aggregates = {
+        'invoice_count': Count('id'),
+        'total': Coalesce(Sum('remaining'), zero),
+    }
+    for key, label, min_days, max_days in AGING_BUCKETS:
+        # Âge en jours révolus : une facture de `min_days` jours a été émise au plus tard à as_of - min_days
+        bucket = Q(date__lte=as_of - datetime.timedelta(days=min_days))
+        if max_days is not None:
+            bucket &= Q(date__gt=as_of - datetime.timedelta(days=max_days + 1))
+        aggregates[key] = Coalesce(Sum('remaining', filter=bucket), zero)
+    return aggregates
+
+
+def receivables_aging(invoices=None, group_by='customer', as_of=None):
+    """
+    Balance âgée des créances par client ou par vendeur : les factures avec un
+    reste à payer (colonne indexée) sont réparties par tranche d'ancienneté avec
+    une agrégation conditionnelle, en une seule requête groupée plus les totaux.
+    """
+    if invoices is None:
+        invoices = Invoice.objects.all()
+    as_of = as_of or timezone.now()
+    label, key, row_label = AGING_GROUPS[group_by]
+    invoices = invoices.filter(remaining__gt=0, date__lte=as_of)
+
+    rows = (
+        invoices.annotate(group_key=key, group_label=row_label)
+        .values('group_key', 'group_label')
+        .annotate(**_aging_aggregates(as_of))
+        .order_by('-total', 'group_key')
+    )
+    return {
+        'group_by': group_by,
+        'group_label': label,
+        'as_of': as_of,
+        'buckets': [(bucket_key, bucket_label) for bucket_key, bucket_label, *_ in AGING_BUCKETS],
+        'rows': rows,
+        'totals': invoices.aggregate(**_aging_aggregates(as_of)),
+    }
+
+
+def _collection_aggregates():
+    zero = Value(0, output_field=DecimalField())
+    aggregates = {
+        'collected': Coalesce(Sum('amount'), zero),
+        'payments': Coalesce(Sum('payment_count'), 0),
+    }
+    for method in Payment.Method.values:
+        aggregates[method.lower()] = Coalesce(Sum('amount', filter=Q(method=method)), zero)
+    return aggregates
+
+
+def collection_report(collections=None):
+    """
+    Encaissements par jour et par mode de paiement, lus dans le cumul journalier
+    DailyCollection (quelques lignes par jour) plutôt que dans les paiements.
+    """
+    if collections is None:
+        collections = DailyCollection.objects.all()
+    rows = collections.values('day').annotate(**_collection_aggregates()).order_by('-day')
+    return {
+        'methods': [(method.lower(), label) for method, label in Payment.Method.choices],
+        'rows': rows,
+        'totals': collections.aggregate(**_collection_aggregates()),
+    }
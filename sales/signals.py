@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from core.cache import bump_version
+from core.events import publish
+from core.metrics import INVOICES_COMMITTED, count_on_commit
+from .models import Customer, DailyCollection, Invoice, InvoiceItem
+
+
+def invalidate_sales_fragments(sender, **kwargs):
+    """Invalide les fragments de templates dépendant des ventes"""
+    bump_version('sales')
+
+
+for model in (Customer, Invoice, InvoiceItem):
+    post_save.connect(invalidate_sales_fragments, sender=model)
+    post_delete.connect(invalidate_sales_fragments, sender=model)
+
+
+@receiver(post_delete, sender=Invoice)
+def remove_invoice_from_customer(sender, instance, **kwargs):
+    """Retire la facture supprimée des agrégats de son client"""
+    Customer.apply_invoice_change(instance.aggregate_state(), None)
+
+
+@receiver(post_save, sender=Invoice)
+def publish_new_sale(sender, instance, created, **kwargs):
+    """Annonce la nouvelle vente au flux temps réel"""
+    if created:
+        publish(
+            'sale',
+            invoice_id=instance.pk,
+            number=instance.number,
+            customer=instance.customer.name if instance.customer else '',
+            total_amount=str(instance.total_amount),
+            date=instance.date.isoformat(),
+            user_id=instance.user_id,
+        )
+
+
+@receiver(post_save, sender=Invoice)
+def count_new_invoice(sender, instance, created, **kwargs):
+    """Compte la facture pour /metrics une fois la transaction validée"""
+    if created:
+        count_on_commit(INVOICES_COMMITTED)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def detach_daily_collections(sender, instance, **kwargs):
+    """Regroupe les encaissements journaliers du vendeur supprimé avec ceux sans vendeur"""
+    DailyCollection.detach_user(instance.pk)
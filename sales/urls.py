@@ -4,7 +4,9 @@ from .views import (
     CustomerCreateView, InvoiceCreateView,
     CustomerDetailView, CustomerUpdateView,
     InvoiceDetailView, InvoiceUpdateView,
-    download_invoice_pdf, export_invoices_csv, vendeur_bilan
+    download_invoice_pdf, export_invoices_csv, vendeur_bilan,
+    margin_report_view, receivables_report_view, collection_report_view,
+    payment_add, payment_delete
 )
 
 urlpatterns = [
@@ -20,10 +22,15 @@ urlpatterns = [
     path('factures/<int:pk>/', InvoiceDetailView.as_view(), name='invoice_detail'),
     path('factures/<int:pk>/edit/', InvoiceUpdateView.as_view(), name='invoice_edit'),
     path('factures/<int:pk>/pdf/', download_invoice_pdf, name='invoice_pdf'),
+    path('factures/<int:pk>/paiements/add/', payment_add, name='payment_add'),
+    path('factures/<int:pk>/paiements/<int:payment_pk>/delete/', payment_delete, name='payment_delete'),
     path('factures/bilan/', vendeur_bilan, name='vendeur_bilan'),
     path('factures/export/csv/', export_invoices_csv, name='export_invoices_csv'),
     path('ventes/', sales_list, name='sales_list'),
     
     # Stats
     path('statistiques/', statistics, name='statistics'),
+    path('statistiques/marges/', margin_report_view, name='margin_report'),
+    path('statistiques/creances/', receivables_report_view, name='receivables_report'),
+    path('statistiques/encaissements/', collection_report_view, name='collection_report'),
 ]
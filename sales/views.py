@@ -1,35 +1,72 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.db import transaction, models
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum, Count, F, Max, Q
 from django.db.models.functions import TruncMonth
-from django.http import HttpResponse
-from django.contrib.auth.decorators import login_required
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import CreateView, DetailView, UpdateView
 from django.urls import reverse_lazy
+from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import etag
 import io
-import csv
 import datetime
+import uuid
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.platypus import Table, TableStyle
 
-from .models import Customer, Invoice, InvoiceItem
-from .forms import InvoiceForm, InvoiceItemFormSet
-from inventory.models import Product
+from .models import Customer, DailyCollection, Invoice, InvoiceItem, Payment
+from .forms import InvoiceForm, InvoiceItemFormSet, PaymentForm
+from .reports import AGING_GROUPS, MARGIN_GROUPS, collection_report, margin_report, receivables_aging
+from core.conditional import make_etag, table_state
+from core.reporting import reporting_reads
+from core.jobs import enqueue
+from core.thumbnails import thumbnail_path
+from inventory.models import Product, StockReservation
 
 # Create your views here.
 
+# Tris proposés sur la liste des clients (colonnes indexées, agrégats stockés)
+CUSTOMER_SORTS = {
+    'name': ('name',),
+    'spent': ('-total_spent', 'name'),
+    'balance': ('-balance', 'name'),
+    'recent': (F('last_purchase_at').desc(nulls_last=True), 'name'),
+}
+
 @login_required
 def customer_list(request):
-    """Liste des clients avec recherche"""
+    """Liste des clients avec recherche, filtre par segment RFM et tri par valeur"""
     query = request.GET.get('search', '')
     customers = Customer.objects.all()
     if query:
         customers = customers.filter(Q(name__icontains=query) | Q(phone__icontains=query))
-    return render(request, 'sales/customer_list.html', {'customers': customers, 'search_query': query})
+
+    segment_filter = request.GET.get('segment', '')
+    if segment_filter in Customer.Segment.values:
+        customers = customers.filter(segment=segment_filter)
+    else:
+        segment_filter = ''
+    if request.GET.get('debt'):
+        customers = customers.filter(balance__gt=0)
+
+    sort = request.GET.get('sort', 'name')
+    if sort not in CUSTOMER_SORTS:
+        sort = 'name'
+    customers = customers.order_by(*CUSTOMER_SORTS[sort])
+
+    return render(request, 'sales/customer_list.html', {
+        'customers': customers,
+        'search_query': query,
+        'segment_filter': segment_filter,
+        'debt_only': bool(request.GET.get('debt')),
+        'sort': sort,
+        'segments': Customer.Segment.choices,
+    })
 
 @login_required
 def invoice_list(request):
@@ -92,7 +129,19 @@ def sales_list(request):
     """Liste des ventes (même que factures mais vue différente)"""
     return invoice_list(request) # On peut réutiliser la logique
 
+def _statistics_etag(request):
+    """ETag des statistiques : vendeur, jour (fenêtre de 6 mois) et versions des données comptées"""
+    return make_etag(
+        request.user.pk,
+        timezone.localdate(),
+        Invoice.data_version(request.user),
+        table_state(Customer.objects.all()),
+        Product.data_version(),
+    )
+
 @login_required
+@reporting_reads()
+@etag(_statistics_etag)
 def statistics(request):
     """Page des statistiques avec graphiques"""
     # 6 derniers mois
@@ -124,6 +173,12 @@ class CustomerDetailView(LoginRequiredMixin, DetailView):
     template_name = 'sales/customer_detail.html'
     context_object_name = 'customer'
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Les totaux viennent des agrégats stockés : seules les dernières factures sont lues
+        context['invoices'] = self.object.invoice_set.order_by('-date')[:20]
+        return context
+
 class CustomerUpdateView(LoginRequiredMixin, UpdateView):
     """Vue pour modifier un client"""
     model = Customer
@@ -145,6 +200,51 @@ class InvoiceDetailView(LoginRequiredMixin, DetailView):
     def get_queryset(self):
         return Invoice.objects.filter(user=self.request.user)
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['payments'] = self.object.payments.select_related('user')
+        context['payment_form'] = kwargs.get('payment_form') or PaymentForm(initial={'amount': self.object.remaining or None})
+        return context
+
+def _stock_needed(items):
+    """
+    Quantités à sortir du stock par produit pour un formset de lignes valide :
+    quantité des nouvelles lignes, écart pour les lignes modifiées, retour en
+    stock (négatif) pour les lignes supprimées.
+    """
+    needed = {}
+    for item_form in items.forms:
+        product = item_form.cleaned_data.get('product')
+        if product is None:
+            continue
+        initial = item_form.initial.get('quantity', 0) if item_form.instance.pk else 0
+        quantity = 0 if items.can_delete and item_form.cleaned_data.get('DELETE') else item_form.cleaned_data.get('quantity') or 0
+        needed[product.pk] = needed.get(product.pk, 0) + quantity - initial
+    return needed
+
+def _commit_stock(form, items):
+    """
+    Convertit les réservations de la vente en sorties : vérifie le stock disponible
+    sous verrou et rattache les lignes aux produits verrouillés, pour que leurs
+    mouvements partent de la quantité à jour. Retourne False si le stock manque.
+    """
+    try:
+        products = StockReservation.commit(form.cleaned_data.get('reservation_token'), _stock_needed(items))
+    except ValidationError as error:
+        form.add_error(None, error)
+        return False
+    for item_form in items.forms:
+        product = item_form.cleaned_data.get('product')
+        if product is not None:
+            item_form.instance.product = products[product.pk]
+    return True
+
+def _record_payment(invoice, form, user):
+    """Enregistre l'encaissement saisi dans le formulaire de facture, s'il y en a un"""
+    amount = form.cleaned_data.get('payment_amount')
+    if amount:
+        Payment.objects.create(invoice=invoice, amount=amount, method=form.cleaned_data['payment_method'], user=user)
+
 class InvoiceUpdateView(LoginRequiredMixin, UpdateView):
     """Vue pour modifier une facture avec ses articles"""
     model = Invoice
@@ -164,14 +264,26 @@ class InvoiceUpdateView(LoginRequiredMixin, UpdateView):
             context['items'] = InvoiceItemFormSet(instance=self.object)
         return context
 
+    def get_initial(self):
+        return {**super().get_initial(), 'reservation_token': uuid.uuid4().hex}
+
     def form_valid(self, form):
         context = self.get_context_data()
         items = context['items']
-        with transaction.atomic():
-            self.object = form.save()
-            if items.is_valid():
-                items.instance = self.object
-                items.save()
+        try:
+            with StockReservation.atomic():
+                self.object = form.save()
+                if items.is_valid():
+                    if not _commit_stock(form, items):
+                        transaction.set_rollback(True)
+                        return self.render_to_response(self.get_context_data(form=form))
+                    items.instance = self.object
+                    items.save()
+                _record_payment(self.object, form, self.request.user)
+        except ValidationError as error:
+            # Base verrouillée par une autre vente au-delà du délai d'attente
+            form.add_error(None, error)
+            return self.render_to_response(self.get_context_data(form=form))
         return super().form_valid(form)
 
 class CustomerCreateView(LoginRequiredMixin, CreateView):
@@ -202,19 +314,54 @@ class InvoiceCreateView(LoginRequiredMixin, CreateView):
             context['items'] = InvoiceItemFormSet()
         return context
 
+    def get_initial(self):
+        return {**super().get_initial(), 'reservation_token': uuid.uuid4().hex}
+
     def form_valid(self, form):
         context = self.get_context_data()
         items = context['items']
-        with transaction.atomic():
-            form.instance.user = self.request.user
-            self.object = form.save()
-            if items.is_valid():
+        try:
+            with StockReservation.atomic():
+                form.instance.user = self.request.user
+                form.instance.location_id = self.request.user.location_id
+                self.object = form.save()
+                if not items.is_valid() or not _commit_stock(form, items):
+                    # Annule la facture créée ci-dessus
+                    transaction.set_rollback(True)
+                    return self.render_to_response(self.get_context_data(form=form))
                 items.instance = self.object
                 items.save()
-            else:
-                return self.render_to_response(self.get_context_data(form=form))
+                _record_payment(self.object, form, self.request.user)
+        except ValidationError as error:
+            # Base verrouillée par une autre vente au-delà du délai d'attente
+            form.add_error(None, error)
+            return self.render_to_response(self.get_context_data(form=form))
         return super().form_valid(form)
 
+@login_required
+def payment_add(request, pk):
+    """Enregistre un paiement sur une facture du vendeur"""
+    invoice = get_object_or_404(Invoice, pk=pk, user=request.user)
+    if request.method != 'POST':
+        return redirect('invoice_detail', pk=pk)
+    form = PaymentForm(request.POST)
+    if not form.is_valid():
+        view = InvoiceDetailView(request=request, kwargs={'pk': pk}, object=invoice)
+        return render(request, InvoiceDetailView.template_name, view.get_context_data(payment_form=form))
+    payment = form.save(commit=False)
+    payment.invoice = invoice
+    payment.user = request.user
+    payment.save()
+    return redirect('invoice_detail', pk=pk)
+
+@login_required
+def payment_delete(request, pk, payment_pk):
+    """Annule un paiement : le montant payé de la facture est diminué d'autant"""
+    payment = get_object_or_404(Payment, pk=payment_pk, invoice_id=pk, invoice__user=request.user)
+    if request.method == 'POST':
+        payment.delete()
+    return redirect('invoice_detail', pk=pk)
+
 @login_required
 def download_invoice_pdf(request, pk):
     """Génère et télécharge la facture au format PDF (sécurisé)"""
@@ -241,7 +388,7 @@ def download_invoice_pdf(request, pk):
     # Logo et Infos Boutique (à gauche)
     if store.logo:
         try:
-            p.drawImage(store.logo.path, 50, height - 85, height=50, preserveAspectRatio=True, mask='auto')
+            p.drawImage(thumbnail_path(store.logo, 'logo'), 50, height - 85, height=50, preserveAspectRatio=True, mask='auto')
             y = height - 105
         except Exception:
             y = height - 50
@@ -321,28 +468,22 @@ def download_invoice_pdf(request, pk):
 
 @login_required
 def export_invoices_csv(request):
-    """Exporte la liste des factures en CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="factures.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Numéro', 'Date', 'Client', 'Statut', 'Total', 'Payé', 'Reste'])
-    
-    invoices = Invoice.objects.filter(user=request.user).select_related('customer')
-    for inv in invoices:
-        writer.writerow([
-            inv.number, 
-            inv.date.strftime('%Y-%m-%d'), 
-            inv.customer.name, 
-            inv.get_status_display(), 
-            inv.total_amount, 
-            inv.paid_amount, 
-            inv.remaining_amount
-        ])
-    
-    return response
+    """Exporte la liste des factures en CSV (fichier généré par le worker)"""
+    version = make_etag(Invoice.data_version(request.user), Customer.objects.aggregate(last_id=Max('pk'))['last_id'])
+    job = enqueue('sales.invoices_csv', request.user, version=version)
+    return redirect('job_detail', pk=job.pk)
+
+
+def _parse_period(start_date, end_date):
+    """
+    Bornes du filtre de période des rapports : None si absente ou mal formée (ignorée),
+    ValueError pour un format valide mais une date inexistante (2024-13-45)
+    """
+    return [parse_date(value) if value else None for value in (start_date, end_date)]
+
 
 @login_required
+@reporting_reads()
 def vendeur_bilan(request):
     """Génère une vue de bilan de vente pour l'utilisateur connecté"""
     # Filtre de base : seulement les factures de l'utilisateur connecté
@@ -352,12 +493,16 @@ def vendeur_bilan(request):
     start_date = request.GET.get('start_date', '')
     end_date = request.GET.get('end_date', '')
     status = request.GET.get('status', '')
+    try:
+        start, end = _parse_period(start_date, end_date)
+    except ValueError:
+        return HttpResponseBadRequest("Date invalide")
 
     # Filtrage par date
-    if start_date:
-        invoices = invoices.filter(date__date__gte=start_date)
-    if end_date:
-        invoices = invoices.filter(date__date__lte=end_date)
+    if start:
+        invoices = invoices.filter(date__date__gte=start)
+    if end:
+        invoices = invoices.filter(date__date__lte=end)
     
     # Filtrage par statut
     if status and status != 'ALL':
@@ -374,6 +519,14 @@ def vendeur_bilan(request):
     paid_val = summary['paid'] or 0
     remaining_val = total_val - paid_val
 
+    # Paiements reçus sur la période (toutes factures confondues), lus dans le cumul journalier
+    collections = DailyCollection.objects.filter(user=request.user)
+    if start:
+        collections = collections.filter(day__gte=start)
+    if end:
+        collections = collections.filter(day__lte=end)
+    collected_val = collections.aggregate(total=Sum('amount'))['total'] or 0
+
     context = {
         'invoices': invoices,
         'start_date': start_date,
@@ -382,8 +535,91 @@ def vendeur_bilan(request):
             'count': summary['count'],
             'total': total_val,
             'paid': paid_val,
-            'remaining': remaining_val
+            'remaining': remaining_val,
+            'collected': collected_val,
         },
         'today': timezone.now()
     }
     return render(request, 'sales/vendeur_bilan.html', context)
+
+
+@login_required
+@permission_required('inventory.add_product', raise_exception=True)
+@reporting_reads()
+def margin_report_view(request):
+    """Rapport de marge brute par produit, catégorie, vendeur ou période"""
+    group_by = request.GET.get('group', 'product')
+    if group_by not in MARGIN_GROUPS:
+        group_by = 'product'
+    start_date = request.GET.get('start_date', '')
+    end_date = request.GET.get('end_date', '')
+    try:
+        start, end = _parse_period(start_date, end_date)
+    except ValueError:
+        return HttpResponseBadRequest("Date invalide")
+
+    items = InvoiceItem.objects.all()
+    if start:
+        items = items.filter(invoice__date__date__gte=start)
+    if end:
+        items = items.filter(invoice__date__date__lte=end)
+
+    context = {
+        'report': margin_report(items, group_by),
+        'groups': [(key, label) for key, (label, *_) in MARGIN_GROUPS.items()],
+        'start_date': start_date,
+        'end_date': end_date,
+        'title': 'Rapport de Marge',
+    }
+    return render(request, 'sales/margin_report.html', context)
+
+
+# Nombre maximal de lignes affichées dans la balance âgée (les plus gros encours d'abord)
+AGING_MAX_ROWS = 200
+
+
+@login_required
+@permission_required('inventory.add_product', raise_exception=True)
+@reporting_reads()
+def receivables_report_view(request):
+    """Balance âgée des créances par client ou par vendeur"""
+    group_by = request.GET.get('group', 'customer')
+    if group_by not in AGING_GROUPS:
+        group_by = 'customer'
+
+    report = receivables_aging(group_by=group_by)
+    report['rows'] = report['rows'][:AGING_MAX_ROWS]
+    context = {
+        'report': report,
+        'groups': [(key, label) for key, (label, *_) in AGING_GROUPS.items()],
+        'max_rows': AGING_MAX_ROWS,
+        'title': 'Balance Âgée des Créances',
+    }
+    return render(request, 'sales/receivables_report.html', context)
+
+
+@login_required
+@permission_required('inventory.add_product', raise_exception=True)
+@reporting_reads()
+def collection_report_view(request):
+    """Encaissements journaliers par mode de paiement"""
+    start_date = request.GET.get('start_date', '')
+    end_date = request.GET.get('end_date', '')
+    try:
+        start, end = _parse_period(start_date, end_date)
+    except ValueError:
+        return HttpResponseBadRequest("Date invalide")
+
+    collections = DailyCollection.objects.all()
+    if start:
+        collections = collections.filter(day__gte=start)
+    if end:
+        collections = collections.filter(day__lte=end)
+
+    context = {
+        'report': collection_report(collections),
+        'start_date': start_date,
+        'end_date': end_date,
+        'title': 'Encaissements',
+    }
+    return render(request, 'sales/collection_report.html', context)
@@ -0,0 +1,74 @@
+// Mises à jour en direct (flux SSE /events/) des pages qui le demandent via
+// [data-live-updates] : niveaux de stock, alertes et ventes récentes.
+(function () {
+    const script = document.currentScript;
+    if (!window.EventSource || !document.querySelector('[data-live-updates]')) {
+        return;
+    }
+
+    const LOW_BADGE = '<span class="status-badge status-disabled" style="color:#ef4444; border-color: rgba(239,68,68,0.2); background: rgba(239,68,68,0.1);">• Stock Faible</span>';
+    const ACTIVE_BADGE = '<span class="status-badge status-active">• Actif</span>';
+    const RECENT_SALES_MAX = 5;
+
+    function updateStock(data) {
+        document.querySelectorAll('[data-stock-for="' + data.product_id + '"]').forEach(function (el) {
+            el.textContent = data.quantity;
+        });
+        document.querySelectorAll('[data-status-for="' + data.product_id + '"]').forEach(function (el) {
+            el.innerHTML = data.low_stock ? LOW_BADGE : ACTIVE_BADGE;
+        });
+    }
+
+    function updateLowStockCount(data) {
+        document.querySelectorAll('[data-low-stock-count]').forEach(function (el) {
+            const count = Math.max(0, parseInt(el.textContent, 10) + (data.low_stock ? 1 : -1));
+            el.textContent = count;
+            if (el.hasAttribute('data-hide-empty')) {
+                el.style.display = count > 0 ? '' : 'none';
+            }
+        });
+    }
+
+    function paragraph(text, style) {
+        const p = document.createElement('p');
+        p.style.cssText = style;
+        p.textContent = text;
+        return p;
+    }
+
+    function addSale(data) {
+        const body = document.querySelector('[data-recent-sales]');
+        if (!body || String(data.user_id) !== body.dataset.userId) {
+            return;
+        }
+        const empty = body.querySelector('[data-empty]');
+        if (empty) {
+            empty.remove();
+        }
+        const row = document.createElement('tr');
+        row.style.borderBottom = '1px solid var(--border-color)';
+        const left = document.createElement('td');
+        left.style.padding = '12px 0';
+        left.append(
+            paragraph(data.customer, 'font-weight: 600; font-size: 0.95rem;'),
+            paragraph('Facture #' + data.number, 'color: var(--text-secondary); font-size: 0.8rem;')
+        );
+        const right = document.createElement('td');
+        right.style.cssText = 'padding: 12px 0; text-align: right;';
+        right.append(
+            paragraph('+' + data.total_amount + ' FCFA', 'font-weight: 600; color: #10b981;'),
+            paragraph(new Date(data.date).toLocaleDateString('fr-FR'), 'color: var(--text-secondary); font-size: 0.8rem;')
+        );
+        row.append(left, right);
+        body.prepend(row);
+        while (body.rows.length > RECENT_SALES_MAX) {
+            body.deleteRow(-1);
+        }
+    }
+
+    // Le navigateur se reconnecte seul en renvoyant Last-Event-ID
+    const source = new EventSource(script.dataset.url);
+    source.addEventListener('stock', function (event) { updateStock(JSON.parse(event.data)); });
+    source.addEventListener('low_stock', function (event) { updateLowStockCount(JSON.parse(event.data)); });
+    source.addEventListener('sale', function (event) { addSale(JSON.parse(event.data)); });
+})();
@@ -0,0 +1,28 @@
+const themeToggle = document.getElementById('theme-toggle');
+const themeIcon = document.getElementById('theme-icon');
+const themeText = document.getElementById('theme-text');
+
+function updateThemeUI(theme) {
+    console.log('Updating UI for theme:', theme);
+    if (theme === 'light') {
+        themeIcon.className = 'fas fa-sun';
+        themeText.innerText = 'Mode Clair';
+    } else {
+        themeIcon.className = 'fas fa-moon';
+        themeText.innerText = 'Mode Sombre';
+    }
+}
+
+// Initialize UI based on current state
+const initialTheme = document.documentElement.getAttribute('data-theme') || 'dark';
+updateThemeUI(initialTheme);
+
+themeToggle.addEventListener('click', () => {
+    const currentTheme = document.documentElement.getAttribute('data-theme') || 'dark';
+    const newTheme = currentTheme === 'dark' ? 'light' : 'dark';
+    
+    console.log('Switching to theme:', newTheme);
+    document.documentElement.setAttribute('data-theme', newTheme);
+    localStorage.setItem('theme', newTheme);
+    updateThemeUI(newTheme);
+});
@@ -5,11 +5,11 @@ from .models import User
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
-        ('Informations supplémentaires', {'fields': ('role', 'phone')}), 
+        ('Informations supplémentaires', {'fields': ('role', 'phone', 'location')}), 
     )
     add_fieldsets = UserAdmin.add_fieldsets + (
-        ('Informations supplémentaires', {'fields': ('role', 'phone', 'email')}),
+        ('Informations supplémentaires', {'fields': ('role', 'phone', 'email', 'location')}),
     )
-    list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'is_staff')
-    list_filter = ('role', 'is_staff', 'is_superuser', 'groups')
+    list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'location', 'is_staff')
+    list_filter = ('role', 'location', 'is_staff', 'is_superuser', 'groups')
     search_fields = ('username', 'first_name', 'last_name', 'email')
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from core.cache import get_versions
+
+USER_KEY = 'auth-user:{}:{}'
+PERMISSIONS_KEY = 'auth-permissions:{}:{}'
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend dont l'utilisateur de la session (relu à chaque requête par
+    AuthenticationMiddleware) et les permissions sont lus en cache. Les clés
+    portent la version 'auth', incrémentée à toute modification d'un utilisateur,
+    de ses groupes ou des permissions (voir users.signals) : un changement de
+    mot de passe ou de rôle est pris en compte dès la requête suivante.
+    """
+
+    def get_user(self, user_id):
+        key = USER_KEY.format(user_id, get_versions()['auth'])
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if user is not None and self.user_can_authenticate(user) else None
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return super().get_all_permissions(user_obj, obj)
+        if not hasattr(user_obj, '_perm_cache'):
+            key = PERMISSIONS_KEY.format(user_obj.pk, get_versions()['auth'])
+            permissions = cache.get(key)
+            if permissions is None:
+                permissions = super().get_all_permissions(user_obj)
+                cache.set(key, permissions, settings.AUTH_USER_CACHE_TIMEOUT)
+            user_obj._perm_cache = permissions
+        return user_obj._perm_cache
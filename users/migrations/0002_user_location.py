@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_locations'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='location',
+            field=models.ForeignKey(blank=True, help_text='Point de vente : les ventes sortent de ce stock et les alertes de stock bas le concernent.', limit_choices_to={'is_active': True}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='inventory.location', verbose_name='Emplacement'),
+        ),
+    ]
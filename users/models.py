@@ -8,6 +8,9 @@ class User(AbstractUser):
     
     role = models.CharField(max_length=50, choices=Role.choices, default=Role.SELLER)
     phone = models.CharField(max_length=20, blank=True, null=True)
+    location = models.ForeignKey('inventory.Location', on_delete=models.SET_NULL, null=True, blank=True, related_name='users',
+                                 limit_choices_to={'is_active': True}, verbose_name="Emplacement",
+                                 help_text="Point de vente : les ventes sortent de ce stock et les alertes de stock bas le concernent.")
 
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
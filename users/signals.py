@@ -0,0 +1,20 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from core.cache import bump_version
+from .models import User
+
+
+def invalidate_auth_cache(sender, update_fields=None, **kwargs):
+    """Invalide les utilisateurs et permissions en cache (mot de passe, rôle, groupes, droits)"""
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        # Connexion (update_last_login) : rien de ce qui est en cache n'en dépend
+        return
+    bump_version('auth')
+
+
+for model in (User, Group):
+    post_save.connect(invalidate_auth_cache, sender=model)
+    post_delete.connect(invalidate_auth_cache, sender=model)
+
+for through in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+    m2m_changed.connect(invalidate_auth_cache, sender=through)
@@ -1,3 +1,30 @@
+from django.contrib.auth.models import update_last_login
 from django.test import TestCase
 
-# Create your tests here.
+from core.cache import get_versions
+from .backends import CachedModelBackend
+from .models import User
+
+
+class AuthCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('vendeur', password='pw')
+        self.backend = CachedModelBackend()
+
+    def test_login_keeps_auth_version(self):
+        version = get_versions()['auth']
+        update_last_login(None, self.user)
+        self.assertEqual(get_versions()['auth'], version)
+
+    def test_deactivation_is_seen_by_cached_backend(self):
+        self.assertEqual(self.backend.get_user(self.user.pk), self.user)
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_permissions_follow_role_changes(self):
+        self.assertEqual(self.backend.get_all_permissions(self.user), set())
+        self.user.is_superuser = True
+        self.user.save()
+        user = self.backend.get_user(self.user.pk)
+        self.assertIn('inventory.add_product', self.backend.get_all_permissions(user))